@@ -1,24 +1,260 @@
-from flask import Flask, render_template, jsonify, request, send_from_directory
+from flask import Flask, Response, g, redirect, render_template, jsonify, request, send_from_directory, url_for
+import base64
+import binascii
+import copy
+import cProfile
+import functools
+import gzip
+import hashlib
+import http.client
+import io
 import json
+import logging
 import os
+import pstats
 import uuid
 import re
+import shutil
+import socket
+import sqlite3
+import threading
+import time
+import tracemalloc
+from bisect import bisect_left, bisect_right
+from collections import Counter, OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, wait
+from contextlib import contextmanager
 from datetime import datetime
+from queue import Empty, Queue
 from werkzeug.utils import secure_filename
+import urllib.error
 import urllib.request
 import urllib.parse
 
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
 app = Flask(__name__)
 
 DATA_FILE = os.path.join(os.path.dirname(__file__), 'data', 'tags.json')
 GALLERY_FILE = os.path.join(os.path.dirname(__file__), 'data', 'gallery.json')
 CONFIG_FILE = os.path.join(os.path.dirname(__file__), 'data', 'config.json')
+DB_FILE = os.path.join(os.path.dirname(__file__), 'data', 'library.db')
+JOBS_DB_FILE = os.path.join(os.path.dirname(__file__), 'data', 'jobs.db')
+LLM_CACHE_FILE = os.path.join(os.path.dirname(__file__), 'data', 'llm_cache.db')
+TRANSLATION_MEMORY_FILE = os.path.join(os.path.dirname(__file__), 'data', 'translations.db')
 UPLOAD_FOLDER = os.path.join(os.path.dirname(__file__), 'static', 'uploads')
+UPLOAD_LOCK_FILE = os.path.join(os.path.dirname(__file__), 'data', 'uploads.lock')
+UPLOAD_CHUNK_SIZE = 64 * 1024
+THUMBNAIL_FOLDER = os.path.join(os.path.dirname(__file__), 'data', 'thumbs')
+THUMBNAIL_WIDTHS = (320, 640, 960)
+THUMBNAIL_CACHE_MAX_BYTES = 256 * 1024 * 1024
+PROFILE_FOLDER = os.path.join(os.path.dirname(__file__), 'data', 'profiles')
+PROFILE_TRACEMALLOC_FRAMES = 10
+PROFILE_JOB_WAIT = 5  # seconds a profiled job waits for its request's profile to finish
+PROFILE_MAX_SPANS = 1000
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
 
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max
 
+# ============ Logging and Metrics ============
+
+logger = logging.getLogger('ai_tag_manager')
+
+class StructuredFormatter(logging.Formatter):
+    """One line per record: the message followed by its ``fields`` as key=value pairs,
+    or a JSON object per line with ``json=True``"""
+
+    def __init__(self, json_lines=False):
+        super().__init__()
+        self.json_lines = json_lines
+
+    @staticmethod
+    def _value(value):
+        # Quote strings that would not read back as one token; containers as JSON
+        if isinstance(value, (dict, list, tuple)) or \
+                (isinstance(value, str) and (not value or any(c in value for c in ' ="\n'))):
+            return json.dumps(value, ensure_ascii=False, default=str)
+        return value
+
+    def format(self, record):
+        fields = getattr(record, 'fields', {})
+        if self.json_lines:
+            entry = {"time": self.formatTime(record), "level": record.levelname, "message": record.getMessage()}
+            entry.update(fields)
+            if record.exc_info:
+                entry['exception'] = self.formatException(record.exc_info)
+            return json.dumps(entry, ensure_ascii=False, default=str)
+        line = f"{self.formatTime(record)} {record.levelname:<7} {record.getMessage()}"
+        if fields:
+            line += ' ' + ' '.join(f"{k}={self._value(v)}" for k, v in fields.items() if v is not None)
+        if record.exc_info:
+            line += '\n' + self.formatException(record.exc_info)
+        return line
+
+def log_fields(**fields):
+    """``extra=`` argument attaching structured fields to a log record"""
+    return {'fields': fields}
+
+def configure_logging(options):
+    """Set up the app logger from the optional ``logging`` section of config.json
+    ({"level": "INFO", "format": "text" | "json"}); LOG_LEVEL and LOG_FORMAT override it"""
+    level = os.environ.get('LOG_LEVEL') or options.get('level', 'INFO')
+    json_lines = (os.environ.get('LOG_FORMAT') or options.get('format', 'text')) == 'json'
+    handler = logging.StreamHandler()
+    handler.setFormatter(StructuredFormatter(json_lines))
+    logger.handlers = [handler]
+    logger.setLevel(level.upper())
+    logger.propagate = False
+
+
+class Metric:
+    """A Prometheus counter or histogram with labels, safe to update from any thread"""
+
+    def __init__(self, name, help_text, kind, labels=(), buckets=None):
+        self.name = name
+        self.help_text = help_text
+        self.kind = kind
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets) if buckets else ()
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels.get(label, '')) for label in self.labels)
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                series = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    @staticmethod
+    def _format_labels(pairs):
+        if not pairs:
+            return ''
+        escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+        return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + '}'
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            values = {key: (list(v[0]), v[1]) if self.kind == 'histogram' else v for key, v in self._values.items()}
+        for key, value in sorted(values.items()):
+            pairs = list(zip(self.labels, key))
+            if self.kind != 'histogram':
+                lines.append(f"{self.name}{self._format_labels(pairs)} {value}")
+                continue
+            counts, total = value
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append(f"{self.name}_bucket{self._format_labels(pairs + [('le', le)])} {cumulative}")
+            lines.append(f"{self.name}_sum{self._format_labels(pairs)} {total}")
+            lines.append(f"{self.name}_count{self._format_labels(pairs)} {cumulative}")
+        return '\n'.join(lines)
+
+
+class MetricsRegistry:
+    """Metrics of this process in the Prometheus text format.
+
+    Besides counters and histograms updated by the code, ``collect(fn)`` adds
+    values read at scrape time; ``fn`` returns (name, help, kind, labels dict, value)
+    tuples. With several worker processes each one reports its own numbers.
+    """
+
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def counter(self, name, help_text, labels=()):
+        metric = Metric(name, help_text, 'counter', labels)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help_text, labels=(), buckets=None):
+        metric = Metric(name, help_text, 'histogram', labels, buckets or DEFAULT_BUCKETS)
+        self._metrics.append(metric)
+        return metric
+
+    def collect(self, fn):
+        self._collectors.append(fn)
+        return fn
+
+    def render(self):
+        blocks = [metric.render() for metric in self._metrics]
+        collected = {}
+        for fn in self._collectors:
+            try:
+                samples = fn()
+            except Exception:
+                logger.exception("Metrics collector failed", extra=log_fields(collector=fn.__name__))
+                continue
+            for name, help_text, kind, labels, value in samples:
+                metric = collected.get(name)
+                if metric is None:
+                    metric = collected[name] = Metric(name, help_text, kind, sorted(labels))
+                metric._values[metric._key(labels)] = value
+        blocks.extend(metric.render() for metric in collected.values())
+        return '\n'.join(blocks) + '\n'
+
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+LLM_BUCKETS = (0.25, 0.5, 1, 2, 5, 10, 20, 30, 60, 120)
+
+metrics = MetricsRegistry()
+HTTP_REQUESTS = metrics.counter('http_requests_total', 'HTTP requests by route and status',
+                                ('method', 'route', 'status'))
+HTTP_DURATION = metrics.histogram('http_request_duration_seconds', 'Time to build the HTTP response',
+                                  ('method', 'route'))
+LLM_REQUESTS = metrics.counter('llm_requests_total', 'LLM provider calls by outcome',
+                               ('provider', 'model', 'outcome'))
+LLM_DURATION = metrics.histogram('llm_request_duration_seconds', 'Duration of LLM provider calls',
+                                 ('provider', 'model'), LLM_BUCKETS)
+LLM_TOKENS = metrics.counter('llm_tokens_total', 'Tokens reported by LLM providers',
+                             ('provider', 'model', 'direction'))
+TRANSLATION_REQUESTS = metrics.counter('translation_requests_total', 'Google Translate calls by outcome',
+                                       ('outcome',))
+TRANSLATION_DURATION = metrics.histogram('translation_request_duration_seconds', 'Duration of Google Translate calls')
+TRANSLATION_LOOKUPS = metrics.counter('translation_memory_lookups_total', 'Translation memory lookups',
+                                      ('result',))
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    started = g.pop('request_started', None)
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        HTTP_REQUESTS.inc(method=request.method, route=route, status=response.status_code)
+        HTTP_DURATION.observe(time.perf_counter() - started, method=request.method, route=route)
+    return response
+
 def init_app_data():
     """Initialize application data directories and default files"""
     # Create data directory if not exists
@@ -126,6 +362,9 @@ def init_app_data():
                 "api_key": "",
                 "base_url": "https://api.openai.com/v1",
                 "model": "gpt-3.5-turbo"
+            },
+            "storage": {
+                "backend": "json"
             }
         }
         with open(CONFIG_FILE, 'w', encoding='utf-8') as f:
@@ -134,49 +373,1116 @@ def init_app_data():
 
     print("✓ Application initialization complete!")
 
+_id_lock = threading.Lock()
+_last_id = ''
+
+def new_id():
+    """Timestamp-based record ID that stays unique even when generated within the same microsecond"""
+    global _last_id
+    with _id_lock:
+        candidate = datetime.now().strftime('%Y%m%d%H%M%S%f')
+        if candidate <= _last_id:
+            candidate = str(int(_last_id) + 1)
+        _last_id = candidate
+        return candidate
+
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-def load_data():
-    """Load tags data from JSON file"""
-    if not os.path.exists(DATA_FILE):
+# ============ Data Store ============
+
+TAG_SORT_FIELDS = ('created_at', 'name_en', 'name_zh')
+
+def encode_cursor(key):
+    """Opaque pagination cursor for the sort key of the last returned record"""
+    return base64.urlsafe_b64encode(json.dumps(list(key)).encode('utf-8')).decode('ascii')
+
+def decode_cursor(cursor, key_types=None):
+    """Inverse of encode_cursor; raises ValueError for malformed cursors.
+
+    With ``key_types`` the key must also have one value of each given type,
+    so a cursor from another sort order is rejected instead of failing to
+    compare.
+    """
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    except (ValueError, UnicodeError, binascii.Error) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+    if not isinstance(key, list):
+        raise ValueError(f"Invalid cursor: {cursor}")
+    if key_types is not None and (len(key) != len(key_types) or not all(
+            isinstance(value, kind) and not isinstance(value, bool) for value, kind in zip(key, key_types))):
+        raise ValueError(f"Invalid cursor for this sort order: {cursor}")
+    return tuple(key)
+
+def paginate(keys, rows, cursor, limit, descending=False, key_types=None):
+    """Slice one page out of ``rows`` sorted ascending by the unique ``keys``.
+
+    Returns (page, next cursor or None). Cursors are keyset-based, so pages
+    stay consistent while records are added or removed; ``key_types`` is
+    passed to decode_cursor.
+    """
+    if descending:
+        end = bisect_left(keys, decode_cursor(cursor, key_types)) if cursor else len(keys)
+        start = max(0, end - limit) if limit else 0
+        page, page_keys, has_more = rows[start:end][::-1], keys[start:end][::-1], start > 0
+    else:
+        start = bisect_right(keys, decode_cursor(cursor, key_types)) if cursor else 0
+        end = start + limit if limit else len(keys)
+        page, page_keys, has_more = rows[start:end], keys[start:end], end < len(keys)
+    return page, encode_cursor(page_keys[-1]) if has_more and page_keys else None
+
+def parse_sort(sort):
+    """Split "-field" into (field, descending); None sorts by library order"""
+    if not sort:
+        return None, False
+    descending = sort.startswith('-')
+    return sort.lstrip('-'), descending
+
+
+class FileLock:
+    """Advisory lock file shared between worker processes.
+
+    Acquisitions nest, and callers serialize threads with their own lock, so
+    one process never blocks on a lock it already holds. On platforms without
+    fcntl this degrades to a no-op and only single-process use is safe.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._fd = None
+        self._depth = 0
+
+    def acquire(self, shared=False, blocking=True):
+        if self._depth == 0 and fcntl is not None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            flags = fcntl.LOCK_SH if shared else fcntl.LOCK_EX
+            try:
+                fcntl.flock(fd, flags if blocking else flags | fcntl.LOCK_NB)
+            except BlockingIOError:
+                os.close(fd)
+                return False
+            self._fd = fd
+        self._depth += 1
+        return True
+
+    def release(self):
+        self._depth -= 1
+        if self._depth == 0 and self._fd is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+            self._fd = None
+
+    @contextmanager
+    def shared(self):
+        self.acquire(shared=True)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+class JsonDocumentStore:
+    """Keep a parsed JSON document in memory and persist mutations to disk.
+
+    The cached document is revalidated against the file's (inode, mtime, size)
+    on every read, so edits made outside the app, or by another worker
+    process, are still picked up. Every change bumps ``generation``.
+    Documents returned by ``get()`` are shared and must be treated as read-only;
+    all writes go through the store's mutation methods.
+
+    Writes hold an exclusive lock file (``<path>.lock``) across
+    reload -> apply -> persist, so several worker processes can share the data
+    directory without overwriting each other's changes. Snapshots are written
+    to a per-process temp file and renamed into place.
+
+    With ``journal=True`` each mutation is appended (and fsynced) to a journal
+    next to the snapshot instead of rewriting the whole file. Loading replays
+    the journal onto the snapshot, and a background thread periodically folds
+    the journal into a fresh snapshot that is swapped in atomically. When
+    another worker only appended to the journal, just the new tail is replayed.
+    """
+
+    def __init__(self, path, journal=False, compact_threshold=1000, compact_interval=60):
+        self.path = path
+        self.generation = 0
+        self.journal_path = f"{os.path.splitext(path)[0]}.journal" if journal else None
+        self.compact_threshold = compact_threshold
+        self.compact_interval = compact_interval
+        self._data = None
+        self._index = None
+        self._signature = None
+        self._lock = threading.RLock()
+        self._file_lock = FileLock(f"{path}.lock")
+        self._compact_lock = threading.Lock()
+        self._compact_file_lock = FileLock(f"{path}.compact.lock")
+        self._journal = None
+        self._journal_ops = 0
+        self._journal_offset = 0
+        self._compact_event = threading.Event()
+        self._compactor = None
+        self._views = {}
+        self._views_generation = None
+
+    @property
+    def _compacting_path(self):
+        return f"{self.journal_path}.compacting"
+
+    @property
+    def _tmp_path(self):
+        return f"{self.path}.{os.getpid()}.tmp"
+
+    def default_document(self):
+        return {}
+
+    def normalize(self, data):
+        """Ensure the top-level keys exist so later mutations never resize the dict"""
+        for key, value in self.default_document().items():
+            data.setdefault(key, value)
+        return data
+
+    def document_ids(self, data):
+        """Keys of every record in ``data``, used to make journal replay idempotent"""
+        return set()
+
+    def build_index(self, data):
+        """Lookup indexes for a whole document that was (re)loaded or replaced"""
+        return None
+
+    def _install(self, data):
+        """Make ``data`` the cached document. Its indexes are built first and published
+        in one assignment, so lock-free readers never see them empty or half-built."""
+        self._index = self.build_index(data)
+        self._data = data
+
+    @staticmethod
+    def _file_signature(path):
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+    def _stat_signature(self):
+        if self.journal_path:
+            return (self._file_signature(self.path), self._file_signature(self.journal_path))
+        return self._file_signature(self.path)
+
+    def _load_from_disk(self, repair):
+        if os.path.exists(self.path):
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = self.normalize(json.load(f))
+        else:
+            data = self.default_document()
+        if self.journal_path:
+            # A leftover .compacting journal means a compaction was interrupted;
+            # its ops may already be in the snapshot, so replay is idempotent.
+            known_ids = self.document_ids(data)
+            self._journal_ops, _ = self._replay(data, self._compacting_path, known_ids, 0, repair)
+            count, self._journal_offset = self._replay(data, self.journal_path, known_ids, 0, repair)
+            self._journal_ops += count
+        return data
+
+    def _replay(self, data, path, known_ids, offset, repair):
+        """Apply the ops in ``path`` from byte ``offset``; returns (op count, end offset)"""
+        if not os.path.exists(path):
+            return 0, 0
+        count = 0
+        with open(path, 'rb+' if repair else 'rb') as f:
+            f.seek(offset)
+            for line in f:
+                try:
+                    op = json.loads(line) if line.endswith(b'\n') else None
+                except ValueError:
+                    op = None
+                if op is None:
+                    # Torn final line from a crash mid-append. Only cut it off
+                    # while holding the write lock: otherwise it may be another
+                    # worker's append in progress.
+                    if repair:
+                        f.truncate(offset)
+                    break
+                self.apply(data, op, known_ids)
+                offset += len(line)
+                count += 1
+        return count, offset
+
+    def _journal_tail_only(self, signature):
+        """True if only the journal grew since the last load, so replaying its tail is enough"""
+        if not self.journal_path or self._data is None:
+            return False
+        snapshot, journal = signature
+        cached_snapshot, cached_journal = self._signature
+        return (snapshot == cached_snapshot and journal is not None
+                and (cached_journal is None or journal[0] == cached_journal[0])
+                and journal[2] >= self._journal_offset)
+
+    def _ensure_fresh(self, repair=False):
+        """Bring the cached document up to date with the files. Caller holds the lock."""
+        signature = self._stat_signature()
+        if self._data is not None and signature == self._signature:
+            return
+        if self._journal_tail_only(signature):
+            count, self._journal_offset = self._replay(
+                self._data, self.journal_path, None, self._journal_offset, repair)
+            self._journal_ops += count
+        else:
+            self._close_journal()
+            self._install(self.normalize(self._load_from_disk(repair)))
+        self._signature = signature
+        self.generation += 1
+        self._start_compactor()
+
+    def get(self):
+        """Return the cached document, reloading it first if the file changed on disk"""
+        data = self._data
+        if data is not None and self._stat_signature() == self._signature:
+            return data
+        with self._lock, self._file_lock.shared():
+            self._ensure_fresh()
+            return self._data
+
+    @property
+    def version(self):
+        """Data version derived from the files, so every worker reports the same one for the same data"""
+        self.get()
+        return hashlib.sha1(repr(self._signature).encode('utf-8')).hexdigest()[:16]
+
+    def _cached_view(self, key, build):
+        """Memoize ``build(document)`` until the next change"""
+        self.get()
+        if self._views_generation != self.generation:
+            self._views = {}
+            self._views_generation = self.generation
+        view = self._views.get(key)
+        if view is None:
+            view = self._views[key] = build(self._data)
+        return view
+
+    def _write_temp_snapshot(self, data):
+        """Write the whole document to a fsynced per-process temp file and return its path"""
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = self._tmp_path
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        return tmp_path
+
+    def _write_snapshot(self, data):
+        """Write the whole document and atomically rename it into place"""
+        os.replace(self._write_temp_snapshot(data), self.path)
+
+    def _append_journal(self, op):
+        if self._journal is None:
+            self._journal = open(self.journal_path, 'ab')
+        if os.fstat(self._journal.fileno()).st_size > self._journal_offset:
+            # Everything up to the offset has been replayed under the write lock, so
+            # the rest is a torn line that a lock-free read skipped but did not cut off
+            self._journal.truncate(self._journal_offset)
+        self._journal.write((json.dumps(op, ensure_ascii=False) + '\n').encode('utf-8'))
+        self._journal.flush()
+        os.fsync(self._journal.fileno())
+        self._journal_offset = self._journal.tell()
+        self._journal_ops += 1
+        if self._journal_ops >= self.compact_threshold:
+            self._compact_event.set()
+
+    def _close_journal(self):
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+
+    def _reset_journal(self):
+        """Drop all journal files once their ops are contained in the snapshot"""
+        self._close_journal()
+        for path in (self.journal_path, self._compacting_path):
+            if os.path.exists(path):
+                os.remove(path)
+        self._journal_ops = 0
+        self._journal_offset = 0
+
+    def _persist(self, op):
+        if self.journal_path and op['op'] != 'replace':
+            self._append_journal(op)
+        else:
+            self._write_snapshot(self._data)
+            if self.journal_path:
+                self._reset_journal()
+        self._signature = self._stat_signature()
+
+    def commit(self, op):
+        """Apply a mutation to the cached document and persist it; returns the op's result"""
+        with self._lock, self._file_lock:
+            self._ensure_fresh(repair=True)
+            if op['op'] == 'replace':
+                self._install(self.normalize(op['data']))
+                result = None
+            else:
+                result = self.apply(self._data, op)
+            self._persist(op)
+            self.generation += 1
+            return result
+
+    def apply(self, data, op, known_ids=None):
+        """Apply ``op`` to ``data``. During replay ``known_ids`` skips records that already exist."""
+        raise NotImplementedError
+
+    def save(self, data):
+        """Replace the whole document"""
+        with self._compact_lock, self._compact_file_lock:
+            return self.commit({'op': 'replace', 'data': data})
+
+    def compact(self, blocking=True):
+        """Fold the journal into a new snapshot without blocking writers during serialization"""
+        if not self.journal_path:
+            return
+        with self._compact_lock:
+            if not self._compact_file_lock.acquire(blocking=blocking):
+                return  # another worker is compacting
+            try:
+                self._compact()
+            finally:
+                self._compact_file_lock.release()
+
+    def _compact(self):
+        with self._lock, self._file_lock:
+            self._ensure_fresh(repair=True)
+            if not self._journal_ops:
+                return
+            snapshot = {k: list(v) if isinstance(v, list) else v for k, v in self._data.items()}
+            self._close_journal()
+            if os.path.exists(self._compacting_path):
+                # Leftover from an interrupted compaction: merge rather than overwrite it
+                if os.path.exists(self.journal_path):
+                    with open(self.journal_path, 'rb') as src, open(self._compacting_path, 'ab') as dst:
+                        shutil.copyfileobj(src, dst)
+                        dst.flush()
+                        os.fsync(dst.fileno())
+                    os.remove(self.journal_path)
+            else:
+                os.replace(self.journal_path, self._compacting_path)
+            self._journal_ops = 0
+            self._journal_offset = 0
+            self._signature = self._stat_signature()
+
+        tmp_path = self._write_temp_snapshot(snapshot)
+
+        with self._lock, self._file_lock:
+            os.replace(tmp_path, self.path)
+            os.remove(self._compacting_path)
+            # Other workers may have appended to the new journal meanwhile; keep
+            # the journal part of the signature so their ops are replayed later.
+            self._signature = (self._file_signature(self.path), self._signature[1])
+
+    def _start_compactor(self):
+        if self.journal_path and self._compactor is None:
+            self._compactor = threading.Thread(target=self._compaction_loop, daemon=True)
+            self._compactor.start()
+
+    def _compaction_loop(self):
+        while True:
+            self._compact_event.wait(self.compact_interval)
+            self._compact_event.clear()
+            try:
+                self.compact(blocking=False)
+            except Exception as e:
+                logger.error("Journal compaction failed", extra=log_fields(path=self.path, error=str(e)))
+
+
+class TagIndex:
+    """Hash indexes over one tag document: id -> tag, lowercased name_en -> tag ids,
+    name_zh -> tag ids and id -> category. Each tag also gets a sequence number in
+    list order, so ``find`` returns the first match like a scan would."""
+
+    def __init__(self, data):
+        self.tags_by_id = {}
+        self.tag_seq = {}
+        self.next_seq = 0
+        self.tags_by_name_en = {}
+        self.tags_by_name_zh = {}
+        for tag in data['tags']:
+            self.add_tag(tag)
+        self.reindex_categories(data)
+
+    def reindex_categories(self, data):
+        self.categories_by_id = {c['id']: c for c in reversed(data['categories'])}
+
+    # Name index values are tuples, replaced rather than mutated, so lookups from
+    # other threads never see a container change size under them.
+    @staticmethod
+    def _add(index, key, tag_id):
+        ids = index.get(key, ())
+        if tag_id not in ids:
+            index[key] = ids + (tag_id,)
+
+    @staticmethod
+    def _remove(index, key, tag_id):
+        ids = tuple(i for i in index.get(key, ()) if i != tag_id)
+        if ids:
+            index[key] = ids
+        else:
+            index.pop(key, None)
+
+    def add_tag(self, tag, seq=None):
+        tag_id = tag['id']
+        if tag_id in self.tags_by_id and seq is None:
+            return  # duplicate ID: the first occurrence stays indexed, as a scan would find it
+        self.tags_by_id[tag_id] = tag
+        if seq is None:
+            seq = self.next_seq
+            self.next_seq += 1
+        self.tag_seq[tag_id] = seq
+        self._add(self.tags_by_name_en, tag.get('name_en', '').lower(), tag_id)
+        self._add(self.tags_by_name_zh, tag.get('name_zh', ''), tag_id)
+
+    def remove_tag(self, tag_id):
+        """Drop a tag; returns its sequence number, or None if it was not indexed"""
+        tag = self.tags_by_id.pop(tag_id, None)
+        if tag is None:
+            return None
+        self._remove(self.tags_by_name_en, tag.get('name_en', '').lower(), tag_id)
+        self._remove(self.tags_by_name_zh, tag.get('name_zh', ''), tag_id)
+        return self.tag_seq.pop(tag_id)
+
+    def find(self, name_en=None, name_zh=None):
+        candidates = ()
+        if name_en is not None:
+            candidates += self.tags_by_name_en.get(name_en.lower(), ())
+        if name_zh is not None:
+            candidates += self.tags_by_name_zh.get(name_zh, ())
+        if not candidates:
+            return None
+        seq = self.tag_seq
+        first = min(candidates, key=lambda tag_id: seq.get(tag_id, float('inf')))
+        return self.tags_by_id.get(first)
+
+
+class TagStore(JsonDocumentStore):
+    """Categories and tags (data/tags.json).
+
+    A TagIndex is maintained alongside the cached document so name lookups
+    are O(1) instead of scanning the library. When the whole document is
+    loaded or replaced, the new index is built before it is published.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._index = TagIndex(self.default_document())
+
+    def default_document(self):
         return {"categories": [], "tags": []}
-    with open(DATA_FILE, 'r', encoding='utf-8') as f:
-        return json.load(f)
 
-def save_data(data):
-    """Save tags data to JSON file"""
-    with open(DATA_FILE, 'w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    def document_ids(self, data):
+        return {('category', c['id']) for c in data['categories']} | {('tag', t['id']) for t in data['tags']}
+
+    def build_index(self, data):
+        return TagIndex(data)
+
+    def apply(self, data, op, known_ids=None):
+        kind = op['op']
+        # Indexes track the live document; a document being rebuilt from disk
+        # is reindexed once it has been fully loaded.
+        indexed = data is self._data
+        if kind == 'add_tags':
+            tags = op['tags']
+            if known_ids is not None:
+                tags = [t for t in tags if ('tag', t['id']) not in known_ids]
+                known_ids.update(('tag', t['id']) for t in tags)
+            data['tags'].extend(tags)
+            if indexed:
+                for tag in tags:
+                    self._index.add_tag(tag)
+            return op['tags']
+        if kind == 'update_tag':
+            for i, tag in enumerate(data['tags']):
+                if tag['id'] == op['tag']['id']:
+                    data['tags'][i] = op['tag']
+                    if indexed:
+                        self._index.add_tag(op['tag'], seq=self._index.remove_tag(tag['id']))
+                    return op['tag']
+            return None
+        if kind == 'delete_tag':
+            data['tags'] = [t for t in data['tags'] if t['id'] != op['id']]
+            if indexed:
+                self._index.remove_tag(op['id'])
+            return None
+        if kind == 'add_category':
+            key = ('category', op['category']['id'])
+            if known_ids is None or key not in known_ids:
+                data['categories'].append(op['category'])
+                if known_ids is not None:
+                    known_ids.add(key)
+            result = op['category']
+        elif kind == 'update_category':
+            result = None
+            for i, cat in enumerate(data['categories']):
+                if cat['id'] == op['category']['id']:
+                    data['categories'][i] = result = op['category']
+                    break
+        elif kind == 'delete_category':
+            data['categories'] = [c for c in data['categories'] if c['id'] != op['id']]
+            result = None
+        else:
+            raise ValueError(f"Unknown tag store operation: {kind}")
+        if indexed:
+            self._index.reindex_categories(data)
+        return result
 
-def load_gallery():
-    """Load gallery data from JSON file"""
-    if not os.path.exists(GALLERY_FILE):
+    def get_categories(self):
+        return self.get()['categories']
+
+    def category_matcher(self):
+        """The CategoryMatcher for the current categories, rebuilt only after a change"""
+        return self._cached_view(('category_matcher',), lambda data: category_matcher(data['categories']))
+
+    def get_category(self, cat_id):
+        self.get()
+        return self._index.categories_by_id.get(cat_id)
+
+    def get_tag(self, tag_id):
+        self.get()
+        return self._index.tags_by_id.get(tag_id)
+
+    def find_tag(self, name_en=None, name_zh=None):
+        """First tag whose English name matches case-insensitively or whose Chinese name matches exactly"""
+        self.get()
+        return self._index.find(name_en, name_zh)
+
+    def list_tags(self, limit=None):
+        tags = self.get()['tags']
+        return tags[:limit] if limit is not None else tags
+
+    def tag_counts(self):
+        """Total number of tags and the number per category ID"""
+        return self._cached_view('counts', lambda data: (
+            len(data['tags']), dict(Counter(t.get('category_id') for t in data['tags']))
+        ))
+
+    def query_tags(self, category_id=None, sort=None, cursor=None, limit=None):
+        """One page of tags, optionally filtered by category and sorted by ``sort``
+        ("field" or "-field"), or by ID (creation order) without one.
+        Returns (tags, total matching, next cursor or None)."""
+        field, descending = parse_sort(sort)
+
+        # Keys end with the tag ID rather than the list position, so a cursor
+        # still points at the same place after records before it are deleted
+        def sort_key(tag):
+            if not field:
+                return (str(tag['id']),)
+            value = tag.get(field) or ''
+            return (value.lower() if field == 'name_en' else value, str(tag['id']))
+
+        def build(data):
+            rows = sorted(((sort_key(t), t) for t in data['tags']
+                           if category_id is None or t.get('category_id') == category_id),
+                          key=lambda row: row[0])
+            return [row[0] for row in rows], [row[1] for row in rows]
+
+        keys, tags = self._cached_view(('tags', category_id, field), build)
+        page, next_cursor = paginate(keys, tags, cursor, limit, descending, (str, str) if field else (str,))
+        return page, len(keys), next_cursor
+
+    def add_tag(self, tag):
+        return self.add_tags([tag])[0]
+
+    def add_tags(self, tags):
+        return self.commit({'op': 'add_tags', 'tags': tags})
+
+    def update_tag(self, tag):
+        return self.commit({'op': 'update_tag', 'tag': tag})
+
+    def delete_tag(self, tag_id):
+        return self.commit({'op': 'delete_tag', 'id': tag_id})
+
+    def add_category(self, category):
+        return self.commit({'op': 'add_category', 'category': category})
+
+    def update_category(self, category):
+        return self.commit({'op': 'update_category', 'category': category})
+
+    def delete_category(self, cat_id):
+        return self.commit({'op': 'delete_category', 'id': cat_id})
+
+
+GALLERY_TEXT_FIELDS = ('title', 'positive_prompt', 'negative_prompt')
+
+def item_matches_text(item, needle):
+    """True if the lowercased ``needle`` occurs in the item's title or prompts"""
+    return any(needle in (item.get(field) or '').lower() for field in GALLERY_TEXT_FIELDS)
+
+
+class GalleryStore(JsonDocumentStore):
+    """Gallery items (data/gallery.json), newest first"""
+
+    def default_document(self):
         return {"items": []}
-    with open(GALLERY_FILE, 'r', encoding='utf-8') as f:
-        return json.load(f)
 
-def save_gallery(data):
-    """Save gallery data to JSON file"""
-    with open(GALLERY_FILE, 'w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    def document_ids(self, data):
+        return {item['id'] for item in data['items']}
+
+    def apply(self, data, op, known_ids=None):
+        kind = op['op']
+        if kind == 'add_item':
+            if known_ids is None or op['item']['id'] not in known_ids:
+                data['items'].insert(0, op['item'])
+                if known_ids is not None:
+                    known_ids.add(op['item']['id'])
+            return op['item']
+        if kind == 'update_item':
+            for i, item in enumerate(data['items']):
+                if item['id'] == op['item']['id']:
+                    data['items'][i] = op['item']
+                    return op['item']
+            return None
+        if kind == 'delete_item':
+            removed = next((item for item in data['items'] if item['id'] == op['id']), None)
+            data['items'] = [item for item in data['items'] if item['id'] != op['id']]
+            return removed
+        raise ValueError(f"Unknown gallery store operation: {kind}")
+
+    def get_item(self, item_id):
+        return next((item for item in self.get()['items'] if item['id'] == item_id), None)
+
+    def query_items(self, text=None, cursor=None, limit=None):
+        """One page of items, newest first by (created_at, id), optionally filtered by a
+        case-insensitive substring of the title or prompts. Returns (items, total, next cursor)."""
+        needle = text.lower() if text else None
+
+        def build(data):
+            rows = sorted(
+                (((item.get('created_at') or ''), item['id']), item) for item in data['items']
+                if needle is None or item_matches_text(item, needle)
+            )
+            return [row[0] for row in rows], [row[1] for row in rows]
+
+        keys, items = self._cached_view(('items', needle), build)
+        page, next_cursor = paginate(keys, items, cursor, limit, descending=True, key_types=(str, str))
+        return page, len(keys), next_cursor
+
+    def image_refs(self, image):
+        """Number of items whose image is ``image``"""
+        refs = self._cached_view(('image_refs',), lambda data: Counter(item.get('image') for item in data['items']))
+        return refs[image]
+
+    def add_item(self, item):
+        return self.commit({'op': 'add_item', 'item': item})
+
+    def update_item(self, item):
+        return self.commit({'op': 'update_item', 'item': item})
+
+    def delete_item(self, item_id):
+        return self.commit({'op': 'delete_item', 'id': item_id})
+
+
+
+def thread_local_sqlite(local, path, schema):
+    """Return this thread's connection to ``path`` (WAL, autocommit), creating it and
+    the ``schema`` on first use. ``local`` is the caller's threading.local()."""
+    conn = getattr(local, 'conn', None)
+    if conn is None:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        conn = sqlite3.connect(path, timeout=10, isolation_level=None)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.executescript(schema)
+        local.conn = conn
+    return conn
+
+
+class SqliteStore:
+    """Shared connection handling for the SQLite backend.
+
+    Each thread gets its own connection to the database. Every write bumps a
+    per-store generation counter in the ``meta`` table inside the same
+    transaction, so other connections (and processes) can tell when their
+    cached document is stale.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value INTEGER NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS categories (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            id TEXT NOT NULL UNIQUE,
+            name_en TEXT,
+            name_zh TEXT,
+            data TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS tags (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            id TEXT NOT NULL UNIQUE,
+            name_en TEXT,
+            name_zh TEXT,
+            category_id TEXT,
+            created_at TEXT,
+            data TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_tags_category_id ON tags (category_id);
+        CREATE INDEX IF NOT EXISTS idx_tags_name_en_lower ON tags (lower(name_en));
+        CREATE INDEX IF NOT EXISTS idx_tags_name_zh ON tags (name_zh);
+        CREATE TABLE IF NOT EXISTS gallery_items (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            id TEXT NOT NULL UNIQUE,
+            image TEXT,
+            created_at TEXT,
+            data TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_gallery_items_created_at ON gallery_items (created_at, id);
+        CREATE INDEX IF NOT EXISTS idx_gallery_items_image ON gallery_items (image);
+    """
+
+    generation_key = None
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._document = None
+        self._document_generation = None
+
+    def _conn(self):
+        return thread_local_sqlite(self._local, self.path, self.SCHEMA)
+
+    def _generation(self, conn):
+        row = conn.execute("SELECT value FROM meta WHERE key = ?", (self.generation_key,)).fetchone()
+        return row[0] if row else 0
+
+    @property
+    def generation(self):
+        return self._generation(self._conn())
+
+    @property
+    def version(self):
+        """Data version shared by every connection to this database file"""
+        return f"{os.stat(self.path).st_ino:x}-{self.generation}"
+
+    @contextmanager
+    def _write(self):
+        """Run the block in an IMMEDIATE transaction and bump the generation on success"""
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield conn
+            conn.execute(
+                "INSERT INTO meta (key, value) VALUES (?, 1) "
+                "ON CONFLICT(key) DO UPDATE SET value = value + 1",
+                (self.generation_key,)
+            )
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+
+    def get(self):
+        """Return the whole document, rebuilt from the database only when the generation changed"""
+        conn = self._conn()
+        generation = self._generation(conn)
+        if self._document is not None and self._document_generation == generation:
+            return self._document
+        conn.execute('BEGIN')
+        try:
+            generation = self._generation(conn)
+            document = self.build_document(conn)
+        finally:
+            conn.execute('COMMIT')
+        self._document = document
+        self._document_generation = generation
+        return document
 
-def load_config():
-    """Load configuration from JSON file"""
-    default_config = {
+    def build_document(self, conn):
+        raise NotImplementedError
+
+    @staticmethod
+    def _rows(cursor):
+        return [json.loads(row[0]) for row in cursor]
+
+    @staticmethod
+    def _one(cursor):
+        row = cursor.fetchone()
+        return json.loads(row[0]) if row else None
+
+
+class SqliteTagStore(SqliteStore):
+    """Categories and tags in SQLite, with the same interface as TagStore"""
+
+    generation_key = 'tags_generation'
+
+    def __init__(self, path):
+        super().__init__(path)
+        self._matcher = None
+
+    def build_document(self, conn):
+        return {
+            "categories": self._rows(conn.execute("SELECT data FROM categories ORDER BY seq")),
+            "tags": self._rows(conn.execute("SELECT data FROM tags ORDER BY seq"))
+        }
+
+    @staticmethod
+    def _tag_row(tag):
+        return (tag['id'], tag.get('name_en'), tag.get('name_zh'), tag.get('category_id'),
+                tag.get('created_at'), json.dumps(tag, ensure_ascii=False))
+
+    @staticmethod
+    def _category_row(category):
+        return (category['id'], category.get('name_en'), category.get('name_zh'),
+                json.dumps(category, ensure_ascii=False))
+
+    def get_categories(self):
+        return self._rows(self._conn().execute("SELECT data FROM categories ORDER BY seq"))
+
+    def category_matcher(self):
+        """The CategoryMatcher for the current categories, rebuilt only after a change"""
+        generation = self.generation
+        cached = self._matcher
+        if cached is None or cached[0] != generation:
+            cached = self._matcher = (generation, category_matcher(self.get_categories()))
+        return cached[1]
+
+    def get_category(self, cat_id):
+        return self._one(self._conn().execute("SELECT data FROM categories WHERE id = ?", (cat_id,)))
+
+    def get_tag(self, tag_id):
+        return self._one(self._conn().execute("SELECT data FROM tags WHERE id = ?", (tag_id,)))
+
+    def find_tag(self, name_en=None, name_zh=None):
+        """First tag whose English name matches case-insensitively or whose Chinese name matches exactly"""
+        clauses, params = [], []
+        if name_en is not None:
+            clauses.append("lower(name_en) = lower(?)")
+            params.append(name_en)
+        if name_zh is not None:
+            clauses.append("name_zh = ?")
+            params.append(name_zh)
+        if not clauses:
+            return None
+        sql = f"SELECT data FROM tags WHERE {' OR '.join(clauses)} ORDER BY seq LIMIT 1"
+        return self._one(self._conn().execute(sql, params))
+
+    def list_tags(self, limit=None):
+        return self._rows(self._conn().execute("SELECT data FROM tags ORDER BY seq LIMIT ?",
+                                               (-1 if limit is None else limit,)))
+
+    SORT_EXPRESSIONS = {
+        'created_at': "COALESCE(created_at, '')",
+        'name_en': "lower(COALESCE(name_en, ''))",
+        'name_zh': "COALESCE(name_zh, '')"
+    }
+
+    def tag_counts(self):
+        """Total number of tags and the number per category ID"""
+        counts = dict(self._conn().execute("SELECT category_id, COUNT(*) FROM tags GROUP BY category_id"))
+        return sum(counts.values()), counts
+
+    def query_tags(self, category_id=None, sort=None, cursor=None, limit=None):
+        """One page of tags, optionally filtered by category and sorted by ``sort``
+        ("field" or "-field"). Returns (tags, total matching, next cursor or None)."""
+        field, descending = parse_sort(sort)
+        conn = self._conn()
+        where, params = [], []
+        if category_id is not None:
+            where.append("category_id = ?")
+            params.append(category_id)
+        total = conn.execute(
+            f"SELECT COUNT(*) FROM tags {'WHERE ' + ' AND '.join(where) if where else ''}", params
+        ).fetchone()[0]
+
+        key_columns = [self.SORT_EXPRESSIONS[field], 'seq'] if field else ['seq']
+        if cursor:
+            key = decode_cursor(cursor, (str, int) if field else (int,))
+            where.append(f"({', '.join(key_columns)}) {'<' if descending else '>'} ({', '.join('?' * len(key))})")
+            params.extend(key)
+        direction = 'DESC' if descending else 'ASC'
+        order = ', '.join(f"{column} {direction}" for column in key_columns)
+        rows = conn.execute(
+            f"SELECT data, {', '.join(key_columns)} FROM tags {'WHERE ' + ' AND '.join(where) if where else ''} "
+            f"ORDER BY {order} LIMIT ?",
+            params + [limit + 1 if limit else -1]
+        ).fetchall()
+        has_more = bool(limit) and len(rows) > limit
+        rows = rows[:limit] if limit else rows
+        next_cursor = encode_cursor(rows[-1][1:]) if has_more else None
+        return [json.loads(row[0]) for row in rows], total, next_cursor
+
+    def add_tag(self, tag):
+        return self.add_tags([tag])[0]
+
+    def add_tags(self, tags):
+        with self._write() as conn:
+            conn.executemany(
+                "INSERT INTO tags (id, name_en, name_zh, category_id, created_at, data) VALUES (?, ?, ?, ?, ?, ?)",
+                [self._tag_row(tag) for tag in tags]
+            )
+        return tags
+
+    def update_tag(self, tag):
+        with self._write() as conn:
+            row = self._tag_row(tag)
+            cursor = conn.execute(
+                "UPDATE tags SET name_en = ?, name_zh = ?, category_id = ?, created_at = ?, data = ? WHERE id = ?",
+                row[1:] + row[:1]
+            )
+        return tag if cursor.rowcount else None
+
+    def delete_tag(self, tag_id):
+        with self._write() as conn:
+            conn.execute("DELETE FROM tags WHERE id = ?", (tag_id,))
+
+    def add_category(self, category):
+        with self._write() as conn:
+            conn.execute("INSERT INTO categories (id, name_en, name_zh, data) VALUES (?, ?, ?, ?)",
+                         self._category_row(category))
+        return category
+
+    def update_category(self, category):
+        with self._write() as conn:
+            row = self._category_row(category)
+            cursor = conn.execute("UPDATE categories SET name_en = ?, name_zh = ?, data = ? WHERE id = ?",
+                                  row[1:] + row[:1])
+        return category if cursor.rowcount else None
+
+    def delete_category(self, cat_id):
+        with self._write() as conn:
+            conn.execute("DELETE FROM categories WHERE id = ?", (cat_id,))
+
+    def save(self, data):
+        """Replace all categories and tags"""
+        with self._write() as conn:
+            conn.execute("DELETE FROM categories")
+            conn.execute("DELETE FROM tags")
+            conn.executemany("INSERT INTO categories (id, name_en, name_zh, data) VALUES (?, ?, ?, ?)",
+                             [self._category_row(c) for c in data.get('categories', [])])
+            conn.executemany("INSERT INTO tags (id, name_en, name_zh, category_id, created_at, data) "
+                             "VALUES (?, ?, ?, ?, ?, ?)",
+                             [self._tag_row(t) for t in data.get('tags', [])])
+
+
+class SqliteGalleryStore(SqliteStore):
+    """Gallery items in SQLite, with the same interface as GalleryStore"""
+
+    generation_key = 'gallery_generation'
+
+    def build_document(self, conn):
+        return {"items": self._rows(conn.execute("SELECT data FROM gallery_items ORDER BY seq DESC"))}
+
+    @staticmethod
+    def _item_row(item):
+        # created_at is never NULL so (created_at, id) comparisons can use the index
+        return (item['id'], item.get('image'), item.get('created_at') or '', json.dumps(item, ensure_ascii=False))
+
+    def get_item(self, item_id):
+        return self._one(self._conn().execute("SELECT data FROM gallery_items WHERE id = ?", (item_id,)))
+
+    def query_items(self, text=None, cursor=None, limit=None):
+        """One page of items, newest first by (created_at, id), optionally filtered by a
+        case-insensitive substring of the title or prompts. Returns (items, total, next cursor)."""
+        conn = self._conn()
+        where, params = [], []
+        if text:
+            where.append('(' + ' OR '.join(
+                f"instr(lower(COALESCE(json_extract(data, '$.{field}'), '')), ?) > 0"
+                for field in GALLERY_TEXT_FIELDS
+            ) + ')')
+            params.extend([text.lower()] * len(GALLERY_TEXT_FIELDS))
+        total = conn.execute(
+            f"SELECT COUNT(*) FROM gallery_items {'WHERE ' + ' AND '.join(where) if where else ''}", params
+        ).fetchone()[0]
+        if cursor:
+            key = decode_cursor(cursor, (str, str))
+            where.append("(created_at, id) < (?, ?)")
+            params.extend(key)
+        rows = conn.execute(
+            f"SELECT data, created_at, id FROM gallery_items "
+            f"{'WHERE ' + ' AND '.join(where) if where else ''} "
+            f"ORDER BY created_at DESC, id DESC LIMIT ?",
+            params + [limit + 1 if limit else -1]
+        ).fetchall()
+        has_more = bool(limit) and len(rows) > limit
+        rows = rows[:limit] if limit else rows
+        next_cursor = encode_cursor(rows[-1][1:]) if has_more else None
+        return [json.loads(row[0]) for row in rows], total, next_cursor
+
+    def image_refs(self, image):
+        """Number of items whose image is ``image``"""
+        return self._conn().execute("SELECT COUNT(*) FROM gallery_items WHERE image = ?", (image,)).fetchone()[0]
+
+    def add_item(self, item):
+        with self._write() as conn:
+            conn.execute("INSERT INTO gallery_items (id, image, created_at, data) VALUES (?, ?, ?, ?)",
+                         self._item_row(item))
+        return item
+
+    def update_item(self, item):
+        with self._write() as conn:
+            row = self._item_row(item)
+            cursor = conn.execute("UPDATE gallery_items SET image = ?, created_at = ?, data = ? WHERE id = ?",
+                                  row[1:] + row[:1])
+        return item if cursor.rowcount else None
+
+    def delete_item(self, item_id):
+        with self._write() as conn:
+            removed = self._one(conn.execute("SELECT data FROM gallery_items WHERE id = ?", (item_id,)))
+            conn.execute("DELETE FROM gallery_items WHERE id = ?", (item_id,))
+        return removed
+
+    def save(self, data):
+        """Replace all gallery items (stored oldest first so that seq DESC is newest first)"""
+        with self._write() as conn:
+            conn.execute("DELETE FROM gallery_items")
+            conn.executemany("INSERT INTO gallery_items (id, image, created_at, data) VALUES (?, ?, ?, ?)",
+                             [self._item_row(item) for item in reversed(data.get('items', []))])
+
+
+class ConfigStore:
+    """config.json held in memory.
+
+    Like JsonDocumentStore, the parsed config is revalidated against the file's
+    (inode, mtime, size) on every read, so edits made by hand or by another
+    worker process are picked up without parsing the file on every call.
+    ``update()`` applies a change under a lock file and writes it atomically.
+    ``view()`` memoizes objects derived from the config until it changes.
+    The config returned by ``get()`` is shared and must be treated as read-only.
+    """
+
+    DEFAULTS = {
         "llm": {
             "enabled": False,
             "provider": "openai",  # openai, claude, gemini, ollama
             "api_key": "",
             "base_url": "https://api.openai.com/v1",
             "model": "gpt-3.5-turbo"
+        },
+        "storage": {
+            "backend": "json"  # json, journal, sqlite
         }
     }
-    if not os.path.exists(CONFIG_FILE):
-        return default_config
-    try:
-        with open(CONFIG_FILE, 'r', encoding='utf-8') as f:
-            config = json.load(f)
+
+    def __init__(self, path):
+        self.path = path
+        self.generation = 0
+        self._data = None
+        self._signature = None
+        self._lock = threading.RLock()
+        self._file_lock = FileLock(f"{path}.lock")
+        self._views = {}
+        self._views_generation = None
+
+    def _load_from_disk(self):
+        default_config = copy.deepcopy(self.DEFAULTS)
+        if not os.path.exists(self.path):
+            return default_config
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                config = json.load(f)
             # Merge with default config to ensure all keys exist
             for key in default_config:
                 if key not in config:
@@ -185,39 +1491,1085 @@ def load_config():
             if 'provider' not in config.get('llm', {}):
                 config['llm']['provider'] = 'openai'
             return config
-    except:
-        return default_config
+        except:
+            return default_config
+
+    def get(self):
+        """The current config, reloaded only if the file changed"""
+        signature = JsonDocumentStore._file_signature(self.path)
+        with self._lock:
+            if self._data is None or signature != self._signature:
+                self._data = self._load_from_disk()
+                self._signature = signature
+                self.generation += 1
+            return self._data
+
+    def save(self, config):
+        """Replace the config (atomically, so other workers never read a partial file)"""
+        with self._lock:
+            self._file_lock.acquire()
+            try:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                tmp_path = f"{self.path}.{os.getpid()}.tmp"
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(config, f, ensure_ascii=False, indent=2)
+                os.replace(tmp_path, self.path)
+                self._data = config
+                self._signature = JsonDocumentStore._file_signature(self.path)
+                self.generation += 1
+            finally:
+                self._file_lock.release()
+
+    def update(self, mutate):
+        """Apply ``mutate(config)`` to a copy of the latest config and save it"""
+        with self._lock:
+            self._file_lock.acquire()
+            try:
+                config = copy.deepcopy(self.get())
+                mutate(config)
+                self.save(config)
+                return config
+            finally:
+                self._file_lock.release()
+
+    def view(self, key, build):
+        """Memoize ``build(config)`` until the config changes"""
+        with self._lock:
+            config = self.get()
+            if self._views_generation != self.generation:
+                self._views = {}
+                self._views_generation = self.generation
+            view = self._views.get(key)
+            if view is None:
+                view = self._views[key] = build(config)
+            return view
+
+config_store = ConfigStore(CONFIG_FILE)
+configure_logging(config_store.get().get('logging', {}))
+
+def load_config():
+    """Current configuration (cached; treat the returned dict as read-only)"""
+    return config_store.get()
 
 def save_config(config):
     """Save configuration to JSON file"""
-    os.makedirs(os.path.dirname(CONFIG_FILE), exist_ok=True)
-    with open(CONFIG_FILE, 'w', encoding='utf-8') as f:
-        json.dump(config, f, ensure_ascii=False, indent=2)
+    config_store.save(config)
+
+def create_stores():
+    """Create the tag and gallery stores for the storage backend selected in config.json"""
+    storage = load_config().get('storage', {})
+    backend = storage.get('backend', 'json')
+    if backend == 'sqlite':
+        db_path = storage.get('sqlite_path') or DB_FILE
+        return SqliteTagStore(db_path), SqliteGalleryStore(db_path)
+    options = {
+        'journal': backend == 'journal',
+        'compact_threshold': storage.get('compact_threshold', 1000),
+        'compact_interval': storage.get('compact_interval', 60)
+    }
+    return TagStore(DATA_FILE, **options), GalleryStore(GALLERY_FILE, **options)
+
+tag_store, gallery_store = create_stores()
+
+# ============ Profiling ============
+
+class Profile:
+    """One profiled request or job: cProfile stats, an optional tracemalloc
+    snapshot, and the timing spans (see ``profiled_span``) entered while it ran"""
+
+    def __init__(self, label, memory=False, parent=None):
+        self.id = f"{datetime.now():%Y%m%d%H%M%S%f}-{uuid.uuid4().hex[:6]}"
+        self.label = label
+        self.memory = memory
+        self.parent = parent
+        self.children = []
+        self.spans = []
+        self.dropped_spans = 0
+        self._depth = 0
+        self._profiler = cProfile.Profile()
+        self._started = None
+        self._owns_tracemalloc = False
+
+    def start(self):
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start(PROFILE_TRACEMALLOC_FRAMES)
+            self._owns_tracemalloc = True
+        self._started = time.perf_counter()
+        self._profiler.enable()
+
+    def stop(self):
+        """Stop profiling; returns (seconds, tracemalloc snapshot or None)"""
+        self._profiler.disable()
+        seconds = time.perf_counter() - self._started
+        snapshot = tracemalloc.take_snapshot() if self.memory and tracemalloc.is_tracing() else None
+        if self._owns_tracemalloc:
+            tracemalloc.stop()
+        return seconds, snapshot
+
+    @contextmanager
+    def span(self, name):
+        start = time.perf_counter()
+        self._depth += 1
+        try:
+            yield
+        finally:
+            self._depth -= 1
+            if len(self.spans) < PROFILE_MAX_SPANS:
+                self.spans.append({"name": name, "depth": self._depth, "start": round(start - self._started, 6),
+                                   "seconds": round(time.perf_counter() - start, 6)})
+            else:
+                self.dropped_spans += 1
+
+
+class Profiler:
+    """Profiles selected requests with cProfile (and tracemalloc on request).
+
+    A request is profiled when it carries ``X-Profile: 1`` (``X-Profile: memory``
+    adds tracemalloc), or when its route was armed with ``arm(route, count)``
+    for the next ``count`` requests. Background jobs started by a profiled
+    request are profiled as separate child profiles. Only one profile runs at
+    a time per process; requests arriving meanwhile are not profiled.
+    Results are written to ``folder`` as ``<id>.json`` (summary and spans),
+    ``<id>.pstats`` and ``<id>.tracemalloc``; the newest ``keep`` are kept.
+    """
+
+    ID_PATTERN = re.compile(r'^\d{20}-[0-9a-f]{6}$')
+    TOP = 20
+
+    def __init__(self, folder, keep=50):
+        self.folder = folder
+        self.keep = keep
+        self._armed = {}
+        self._lock = threading.Lock()
+        self._slot = threading.Lock()
+
+    def arm(self, route, count, memory=False):
+        with self._lock:
+            self._armed[route] = {"remaining": count, "memory": memory}
+
+    def disarm(self):
+        with self._lock:
+            self._armed.clear()
+
+    def armed(self):
+        with self._lock:
+            return {route: dict(options) for route, options in self._armed.items()}
+
+    def claim(self, route, header=None):
+        """Whether to profile a request to ``route``: None, or whether to trace memory"""
+        if header:
+            return header.strip().lower() == 'memory'
+        with self._lock:
+            options = self._armed.get(route)
+            if options is None:
+                return None
+            options['remaining'] -= 1
+            if options['remaining'] <= 0:
+                del self._armed[route]
+            return options['memory']
+
+    def begin(self, profile, wait=0):
+        """Start ``profile`` in the calling thread; False if another profile is running"""
+        acquired = self._slot.acquire(timeout=wait) if wait else self._slot.acquire(blocking=False)
+        if not acquired:
+            return False
+        _profile_local.profile = profile
+        profile.start()
+        return True
+
+    def end(self, profile, **details):
+        """Stop ``profile`` and write its results"""
+        try:
+            seconds, snapshot = profile.stop()
+        finally:
+            _profile_local.profile = None
+            self._slot.release()
+        os.makedirs(self.folder, exist_ok=True)
+        base = os.path.join(self.folder, profile.id)
+        profile._profiler.dump_stats(f"{base}.pstats")
+        stats = pstats.Stats(profile._profiler).stats
+        top = sorted(stats.items(), key=lambda item: item[1][3], reverse=True)[:self.TOP]
+        summary = {
+            "id": profile.id,
+            "label": profile.label,
+            "parent": profile.parent,
+            "children": profile.children,
+            "created_at": datetime.now().isoformat(),
+            "seconds": round(seconds, 6),
+            "memory": snapshot is not None,
+            "spans": sorted(profile.spans, key=lambda span: span['start']),
+            "dropped_spans": profile.dropped_spans,
+            "top": [{"function": f"{path}:{line}({name})", "calls": calls, "tottime": round(tottime, 6),
+                     "cumtime": round(cumtime, 6)}
+                    for (path, line, name), (_, calls, tottime, cumtime, _) in top],
+            **details
+        }
+        if snapshot is not None:
+            snapshot.dump(f"{base}.tracemalloc")
+            summary["allocations"] = [{"line": str(stat.traceback[0]), "size": stat.size, "count": stat.count}
+                                      for stat in snapshot.statistics('lineno')[:self.TOP]]
+        tmp_path = f"{base}.json.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, f"{base}.json")
+        self.prune()
+        logger.info("Profile saved", extra=log_fields(id=profile.id, label=profile.label, seconds=round(seconds, 3)))
+        return summary
+
+    def wrap_job(self, fn, kind, parent):
+        """Profile a background job started by a profiled request, as a child of ``parent``"""
+        child = Profile(f"job:{kind}", memory=parent.memory, parent=parent.id)
+        parent.children.append(child.id)
+
+        def run(*args, **kwargs):
+            # The request that queued the job usually finishes first; wait for it briefly
+            if not self.begin(child, wait=PROFILE_JOB_WAIT):
+                return fn(*args, **kwargs)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.end(child)
+        return run
+
+    def list(self):
+        if not os.path.isdir(self.folder):
+            return []
+        summaries = []
+        for name in sorted(os.listdir(self.folder), reverse=True):
+            if name.endswith('.json'):
+                summary = self.get(name[:-5])
+                if summary:
+                    summaries.append({k: summary.get(k) for k in
+                                      ('id', 'label', 'parent', 'created_at', 'seconds', 'memory', 'status')})
+        return summaries
+
+    def get(self, profile_id):
+        path = self.path(profile_id, 'json')
+        if path is None:
+            return None
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def path(self, profile_id, kind):
+        """Path of a stored result file (json, pstats or tracemalloc), or None"""
+        if not self.ID_PATTERN.match(profile_id):
+            return None
+        path = os.path.join(self.folder, f"{profile_id}.{kind}")
+        return path if os.path.exists(path) else None
+
+    def prune(self):
+        ids = sorted((name[:-5] for name in os.listdir(self.folder) if name.endswith('.json')), reverse=True)
+        for profile_id in ids[self.keep:]:
+            for kind in ('json', 'pstats', 'tracemalloc'):
+                try:
+                    os.remove(os.path.join(self.folder, f"{profile_id}.{kind}"))
+                except FileNotFoundError:
+                    pass
+
+
+_profile_local = threading.local()
+PROFILING_ENABLED = load_config().get('profiling', {}).get('enabled', False)
+profiler = Profiler(PROFILE_FOLDER, keep=load_config().get('profiling', {}).get('keep', 50))
+
+def profiled_span(name):
+    """Record calls to the decorated function as timing spans of the current profile.
+    Unless profiling is enabled in config.json the function is returned unwrapped."""
+    def decorate(fn):
+        if not PROFILING_ENABLED:
+            return fn
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            profile = getattr(_profile_local, 'profile', None)
+            if profile is None:
+                return fn(*args, **kwargs)
+            with profile.span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+# The stores are defined before profiling is configured, so their methods are wrapped here
+if PROFILING_ENABLED:
+    for span_name, owner, attribute in (
+            ('load_data', JsonDocumentStore, '_load_from_disk'),
+            ('load_data', SqliteStore, 'get'),
+            ('save_data', JsonDocumentStore, 'commit'),
+            *(('save_data', SqliteTagStore, method) for method in (
+                'add_tag', 'add_tags', 'update_tag', 'delete_tag',
+                'add_category', 'update_category', 'delete_category', 'save')),
+            *(('save_data', SqliteGalleryStore, method) for method in (
+                'add_item', 'update_item', 'delete_item', 'save'))):
+        setattr(owner, attribute, profiled_span(span_name)(getattr(owner, attribute)))
+
+@app.before_request
+def start_profile():
+    if not PROFILING_ENABLED or request.url_rule is None:
+        return
+    memory = profiler.claim(request.url_rule.rule, request.headers.get('X-Profile'))
+    if memory is None:
+        return
+    profile = Profile(f"{request.method} {request.url_rule.rule}", memory=memory)
+    if profiler.begin(profile):
+        g.profile = profile
+
+@app.after_request
+def finish_profile(response):
+    profile = g.pop('profile', None)
+    if profile is not None:
+        profiler.end(profile, path=request.path, status=response.status_code)
+        response.headers['X-Profile-Id'] = profile.id
+    return response
+
+@app.teardown_request
+def abandon_profile(exc=None):
+    # after_request is skipped when the view raised
+    profile = g.pop('profile', None)
+    if profile is not None:
+        profiler.end(profile, path=request.path, status=500, error=str(exc))
+
+
+@profiled_span('load_data')
+def load_data():
+    """Load tags data (cached; treat the returned document as read-only)"""
+    return tag_store.get()
+
+@profiled_span('save_data')
+def save_data(data):
+    """Replace the whole tags document"""
+    tag_store.save(data)
+
+def load_gallery():
+    """Load gallery data (cached; treat the returned document as read-only)"""
+    return gallery_store.get()
+
+def save_gallery(data):
+    """Replace the whole gallery document"""
+    gallery_store.save(data)
+
+# ============ HTTP Client ============
+
+class RequestCanceller:
+    """Lets another thread abort a request sent through HTTPConnectionPool.
+
+    ``cancel`` shuts down the socket of the request in flight, which makes a
+    blocked read return at once; the connection is then closed instead of
+    going back to the pool. A request started after ``cancel`` fails right away.
+    """
+
+    def __init__(self):
+        self.cancelled = False
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def attach(self, conn):
+        """Track ``conn`` for the request about to be sent; False if already cancelled"""
+        with self._lock:
+            self._conn = conn
+            return not self.cancelled
+
+    def detach(self):
+        with self._lock:
+            self._conn = None
+
+    def cancel(self):
+        with self._lock:
+            self.cancelled = True
+            sock = self._conn.sock if self._conn is not None else None
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+
+class HTTPConnectionPool:
+    """Keep-alive HTTP(S) connections to one origin, shared across requests and threads.
+
+    Idle connections are kept (up to ``max_idle``) and reused, which saves a
+    TCP and TLS handshake on every call. ``connect_timeout`` bounds setting up
+    a connection and ``read_timeout`` every socket read after that. Proxies
+    from the environment (HTTPS_PROXY etc.) are honoured like urllib does.
+    Failures are raised as urllib.error.HTTPError / URLError, so callers
+    handle them as they would with urlopen.
+    """
+
+    def __init__(self, scheme, host, port, connect_timeout=10, read_timeout=60, max_idle=8, ssl_context=None):
+        self.scheme = scheme
+        self.host = host
+        self.port = port
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.max_idle = max_idle
+        self.ssl_context = ssl_context
+        self._idle = []
+        self._lock = threading.Lock()
+        proxy = urllib.request.getproxies().get(scheme)
+        self._proxy = urllib.parse.urlsplit(proxy) if proxy and not urllib.request.proxy_bypass(host) else None
+
+    def _new_connection(self):
+        host, port = self.host, self.port
+        if self._proxy:
+            host, port = self._proxy.hostname, self._proxy.port or 80
+        if self.scheme == 'https':
+            conn = http.client.HTTPSConnection(host, port, timeout=self.connect_timeout, context=self.ssl_context)
+        else:
+            conn = http.client.HTTPConnection(host, port, timeout=self.connect_timeout)
+        if self._proxy and self.scheme == 'https':
+            headers = {}
+            if self._proxy.username:
+                credentials = f"{urllib.parse.unquote(self._proxy.username)}:{urllib.parse.unquote(self._proxy.password or '')}"
+                headers['Proxy-Authorization'] = 'Basic ' + base64.b64encode(credentials.encode('utf-8')).decode('ascii')
+            conn.set_tunnel(self.host, self.port, headers=headers)
+        return conn
+
+    def _acquire(self):
+        with self._lock:
+            if self._idle:
+                return self._idle.pop(), True
+        return self._new_connection(), False
+
+    def _release(self, conn, response):
+        # Only a connection whose response was read to the end can be reused
+        if not response.isclosed() or conn.sock is None:
+            conn.close()
+            return
+        with self._lock:
+            if len(self._idle) < self.max_idle:
+                self._idle.append(conn)
+                return
+        conn.close()
+
+    def _finish(self, conn, response, cancel):
+        if cancel is not None:
+            cancel.detach()
+            if cancel.cancelled:
+                conn.close()  # its socket may have been shut down
+                return
+        self._release(conn, response)
+
+    @contextmanager
+    def request(self, method, path, body=None, headers=None, cancel=None):
+        """Send a request and yield the http.client response. The connection goes
+        back to the pool once the body has been read completely. ``cancel`` is an
+        optional RequestCanceller for aborting the request from another thread."""
+        url = f"{self.scheme}://{self.host}:{self.port}{path}"
+        # Plain HTTP through a proxy sends the absolute URL instead of tunnelling
+        target = url if self._proxy and self.scheme == 'http' else path
+        for attempt in range(2):
+            conn, reused = self._acquire()
+            if cancel is not None and not cancel.attach(conn):
+                self._finish(conn, None, cancel)
+                raise urllib.error.URLError('request cancelled')
+            try:
+                if conn.sock is None:
+                    conn.connect()
+                conn.sock.settimeout(self.read_timeout)
+                conn.request(method, target, body=body, headers=headers or {})
+                response = conn.getresponse()
+                break
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError) as e:
+                conn.close()
+                # The server dropped an idle keep-alive connection; retry once on a new one
+                if reused and attempt == 0 and not (cancel is not None and cancel.cancelled):
+                    continue
+                raise urllib.error.URLError(e)
+            except (OSError, http.client.HTTPException) as e:
+                conn.close()
+                raise urllib.error.URLError(e)
+            finally:
+                if cancel is not None and conn.sock is None:
+                    cancel.detach()
+
+        if response.status >= 400:
+            error_body = response.read()
+            self._finish(conn, response, cancel)
+            raise urllib.error.HTTPError(url, response.status, response.reason, response.headers,
+                                         io.BytesIO(error_body))
+        try:
+            yield response
+        finally:
+            self._finish(conn, response, cancel)
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+
+_http_pools = {}
+_http_pools_lock = threading.Lock()
+
+def http_pool_for(url, connect_timeout=10, read_timeout=60):
+    """The shared connection pool for the origin of ``url``"""
+    parts = urllib.parse.urlsplit(url)
+    port = parts.port or (443 if parts.scheme == 'https' else 80)
+    key = (parts.scheme, parts.hostname, port, connect_timeout, read_timeout)
+    with _http_pools_lock:
+        pool = _http_pools.get(key)
+        if pool is None:
+            pool = _http_pools[key] = HTTPConnectionPool(parts.scheme, parts.hostname, port,
+                                                         connect_timeout=connect_timeout, read_timeout=read_timeout)
+        return pool
+
+def retire_http_pools(keep):
+    """Close and forget every pool that is not in ``keep``"""
+    with _http_pools_lock:
+        stale = [pool for pool in _http_pools.values() if pool not in keep]
+        for key in [key for key, pool in _http_pools.items() if pool not in keep]:
+            del _http_pools[key]
+    for pool in stale:
+        pool.close()
+
+def http_request(method, url, body=None, headers=None, connect_timeout=10, read_timeout=60, cancel=None):
+    """Send a request through the shared pool for the URL's origin; a context manager yielding the response"""
+    parts = urllib.parse.urlsplit(url)
+    path = (parts.path or '/') + (f"?{parts.query}" if parts.query else '')
+    return http_pool_for(url, connect_timeout, read_timeout).request(method, path, body=body, headers=headers,
+                                                                     cancel=cancel)
+
+
+# ============ LLM Response Cache ============
+
+class LLMResponseCache:
+    """Cache successful LLM responses, keyed by a hash of the provider, base URL
+    and the request payload (model, messages and generation parameters).
+
+    Recently used entries are kept in an in-memory LRU in front of a SQLite
+    table that survives restarts and is shared by worker processes. Entries
+    expire after ``ttl`` seconds; the disk tier is trimmed to ``max_bytes`` by
+    dropping the least recently used entries. Hit/miss counters are per process.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS responses (
+            key TEXT PRIMARY KEY,
+            content TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            created_at REAL NOT NULL,
+            last_used REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_responses_last_used ON responses (last_used);
+    """
+
+    PRUNE_EVERY = 100
+
+    def __init__(self, path, ttl=7 * 24 * 3600, max_entries=256, max_bytes=64 * 1024 * 1024):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._memory = OrderedDict()  # key -> (content, created_at)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._puts = 0
+        self.stats = Counter(memory_hits=0, disk_hits=0, misses=0, stores=0, bypassed=0, rejected=0)
+
+    def _conn(self):
+        return thread_local_sqlite(self._local, self.path, self.SCHEMA)
+
+    @staticmethod
+    def make_key(provider, base_url, payload):
+        """Stable hash of everything that determines the response; streaming does not"""
+        payload = {k: v for k, v in payload.items() if k != 'stream'}
+        material = json.dumps([provider, base_url, payload], sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+    def _remember(self, key, content, created_at):
+        # Called with self._lock held
+        self._memory[key] = (content, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, key):
+        """Return the cached content for ``key``, or None"""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and now - entry[1] < self.ttl:
+                self._memory.move_to_end(key)
+                self.stats['memory_hits'] += 1
+                return entry[0]
+            self._memory.pop(key, None)
+
+        conn = self._conn()
+        row = conn.execute("SELECT content, created_at FROM responses WHERE key = ? AND created_at > ?",
+                           (key, now - self.ttl)).fetchone()
+        with self._lock:
+            if row is None:
+                self.stats['misses'] += 1
+                return None
+            self.stats['disk_hits'] += 1
+            self._remember(key, row[0], row[1])
+        conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+        return row[0]
+
+    def put(self, key, content):
+        now = time.time()
+        with self._lock:
+            self._remember(key, content, now)
+            self.stats['stores'] += 1
+            self._puts += 1
+            prune = self._puts % self.PRUNE_EVERY == 0
+        conn = self._conn()
+        conn.execute("INSERT OR REPLACE INTO responses (key, content, size, created_at, last_used) "
+                     "VALUES (?, ?, ?, ?, ?)", (key, content, len(content.encode('utf-8')), now, now))
+        if prune:
+            self.prune()
+
+    def prune(self):
+        """Drop expired entries, then the least recently used ones above max_bytes"""
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.execute("DELETE FROM responses WHERE created_at <= ?", (time.time() - self.ttl,))
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+            if total > self.max_bytes:
+                excess = total - self.max_bytes
+                for key, size in conn.execute("SELECT key, size FROM responses ORDER BY last_used").fetchall():
+                    if excess <= 0:
+                        break
+                    conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    excess -= size
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+
+    def discard(self, key):
+        """Evict an entry the caller could not use"""
+        with self._lock:
+            self._memory.pop(key, None)
+            self.stats['rejected'] += 1
+        self._conn().execute("DELETE FROM responses WHERE key = ?", (key,))
+
+    def record_bypass(self):
+        with self._lock:
+            self.stats['bypassed'] += 1
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+        self._conn().execute("DELETE FROM responses")
+
+    def info(self):
+        """Counters plus the current size of both tiers"""
+        entries, size = self._conn().execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        with self._lock:
+            stats = dict(self.stats)
+            stats['memory_entries'] = len(self._memory)
+        lookups = stats['memory_hits'] + stats['disk_hits'] + stats['misses']
+        stats['hit_rate'] = round((stats['memory_hits'] + stats['disk_hits']) / lookups, 4) if lookups else None
+        stats.update(disk_entries=entries, disk_bytes=size, ttl=self.ttl,
+                     max_entries=self.max_entries, max_bytes=self.max_bytes)
+        return stats
+
+
+def create_llm_cache():
+    """Create the LLM response cache from the optional ``llm_cache`` section of config.json"""
+    options = load_config().get('llm_cache', {})
+    if not options.get('enabled', True):
+        return None
+    return LLMResponseCache(LLM_CACHE_FILE, ttl=options.get('ttl', 7 * 24 * 3600),
+                            max_entries=options.get('max_entries', 256),
+                            max_bytes=options.get('max_mb', 64) * 1024 * 1024)
+
+llm_cache = create_llm_cache()
+
+def llm_cache_allowed(endpoint, data=None):
+    """Whether an endpoint may use cached LLM responses: not when it is listed in
+    ``llm_cache.bypass`` in config.json, or when the request sends ``"no_cache": true``"""
+    if data and data.get('no_cache'):
+        return False
+    return endpoint not in load_config().get('llm_cache', {}).get('bypass', [])
+
 
 def is_llm_configured():
     """Check if LLM service is properly configured"""
-    config = load_config()
-    llm = config.get('llm', {})
-    return llm.get('enabled', False) and llm.get('api_key', '').strip() != ''
+    return llm_client()['configured']
 
-def call_llm_api(messages, config=None):
-    """Call LLM API - supports OpenAI, Claude, Gemini, and Ollama"""
-    if config is None:
-        config = load_config()
+def llm_client():
+    """The configured providers with their connection pools, rebuilt only when config.json changes"""
+    return config_store.view('llm_client', build_llm_client)
 
+def build_llm_client(config):
     llm = config.get('llm', {})
+    providers = llm_providers(llm)
+    pools = [http_pool_for(provider.get('base_url', 'https://api.openai.com/v1'),
+                           provider.get('connect_timeout', 10), provider.get('read_timeout', 60))
+             for provider in providers]
+    # Connections and health records of providers that were removed or changed are dropped
+    retire_http_pools(pools)
+    llm_router.forget([llm_provider_name(provider) for provider in providers])
+    return {
+        "llm": llm,
+        "providers": providers,
+        "routing": llm.get('routing', {}),
+        "configured": llm.get('enabled', False) and any(
+            provider.get('api_key', '').strip() != '' or provider.get('provider') == 'ollama'
+            for provider in providers
+        )
+    }
+
+def read_llm_stream(response, parse_chunk, on_token, sse=True, usage=None):
+    """Read a streamed LLM response line by line (SSE ``data:`` lines, or NDJSON when
+    ``sse`` is False), pass each text fragment to ``on_token`` and return the full text.
+    Token counts reported in the stream are collected into ``usage``."""
+    parts = []
+    for raw_line in response:
+        line = raw_line.decode('utf-8').strip()
+        if sse:
+            if not line.startswith('data:'):
+                continue
+            line = line[5:].strip()
+            if line == '[DONE]':
+                continue  # read on to the end so the connection can be reused
+        if not line:
+            continue
+        event = json.loads(line)
+        if usage is not None:
+            usage.update(llm_usage(event))
+        text = parse_chunk(event)
+        if text:
+            parts.append(text)
+            on_token(text)
+    return ''.join(parts)
+
+def llm_usage(event):
+    """Token counts in a provider response or stream event, as {"input": n, "output": n}.
+    Later stream events carry running totals, so updating a dict with each result is enough."""
+    usage = {}
+    reported = event.get('usage') or (event.get('message') or {}).get('usage') or {}  # OpenAI, Claude
+    metadata = event.get('usageMetadata') or {}  # Gemini
+    for direction, keys in (('input', ('prompt_tokens', 'input_tokens', 'promptTokenCount', 'prompt_eval_count')),
+                            ('output', ('completion_tokens', 'output_tokens', 'candidatesTokenCount', 'eval_count'))):
+        for key in keys:
+            value = reported.get(key, metadata.get(key, event.get(key)))  # Ollama reports at the top level
+            if isinstance(value, int):
+                usage[direction] = value
+                break
+    return usage
+
+def parse_claude_stream_event(event):
+    if event.get('type') == 'error':
+        raise ValueError(event.get('error', {}).get('message', 'stream error'))
+    if event.get('type') == 'content_block_delta':
+        return event['delta'].get('text')
+    return None
+
+def parse_ollama_stream_chunk(chunk):
+    if chunk.get('error'):
+        raise ValueError(chunk['error'])
+    return chunk.get('message', {}).get('content')
+
+# ============ LLM Routing ============
+
+def llm_providers(llm):
+    """The provider blocks to route between: ``llm.providers`` if set, else the ``llm`` block itself"""
+    return llm.get('providers') or [llm]
+
+def llm_provider_name(provider):
+    return provider.get('name') or f"{provider.get('provider', 'openai')}:{provider.get('model', '')}"
+
+
+class LLMAttemptAbandoned(Exception):
+    """Raised into a hedged attempt that lost the race, to stop reading its stream"""
+
+
+class LLMAttemptSkipped(Exception):
+    """Raised when a provider's circuit breaker turns an attempt away"""
+
+
+class ProviderHealth:
+    """Latency and failure record of one provider, used by LLMRouter"""
+
+    def __init__(self, samples=100):
+        self.ewma = None  # seconds until the response headers arrived
+        self.latencies = deque(maxlen=samples)
+        self.failures = 0  # consecutive
+        self.opened_at = None  # when the circuit breaker opened
+        self.trial = False  # a half-open trial call is in flight
+        self.calls = 0
+        self.errors = 0
+
+    def percentile(self, q):
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class LLMRouter:
+    """Chooses which of several configured LLM providers answers a call.
+
+    Policies (``llm.routing.policy`` in config.json):
+
+    - ``failover``: providers in the configured order, moving on when one fails
+    - ``latency``: like failover, but ordered by a moving average of response latency
+    - ``hedge``: call the first provider; if it has not answered within its p95
+      latency (or ``hedge_delay`` until enough samples exist), call the next one
+      as well and take whichever answers first
+
+    A circuit breaker takes a provider out of rotation after ``failure_threshold``
+    consecutive failures for ``cooldown`` seconds. After that it is half-open:
+    the first caller claims a single trial call and everyone else keeps skipping
+    the provider until the trial has succeeded (closing the breaker) or failed
+    (opening it again). If every provider's breaker is open, the one that
+    opened first gets its trial early; callers arriving during that trial fail.
+    Hedged attempts that lose the race are cancelled, closing their connection.
+    A stream that has already passed text to ``on_token`` is not retried elsewhere.
+    Health is kept per process.
+    """
+
+    POLICIES = ('failover', 'latency', 'hedge')
+    EWMA_ALPHA = 0.3
+    MIN_SAMPLES = 20
+
+    def __init__(self, max_workers=32):
+        self._health = {}
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='llm-hedge')
+
+    def _get(self, name):
+        # Called with self._lock held
+        health = self._health.get(name)
+        if health is None:
+            health = self._health[name] = ProviderHealth()
+        return health
+
+    def record_success(self, name, latency, trial=False):
+        with self._lock:
+            health = self._get(name)
+            health.calls += 1
+            health.ewma = latency if health.ewma is None else \
+                self.EWMA_ALPHA * latency + (1 - self.EWMA_ALPHA) * health.ewma
+            health.latencies.append(latency)
+            health.failures = 0
+            health.opened_at = None
+            if trial:
+                health.trial = False
+
+    def record_failure(self, name, threshold, trial=False):
+        with self._lock:
+            health = self._get(name)
+            health.calls += 1
+            health.errors += 1
+            health.failures += 1
+            if health.failures >= threshold:
+                health.opened_at = time.time()
+            if trial:
+                health.trial = False
+
+    def _breaker(self, health, cooldown, now):
+        # Called with self._lock held
+        if health.opened_at is None:
+            return 'closed'
+        if health.trial:
+            return 'trial'
+        return 'half-open' if now - health.opened_at >= cooldown else 'open'
+
+    def order(self, requests_, routing):
+        """Providers to try, best first, leaving out those whose breaker is open.
+        Returns (providers, early) where ``early`` lets the first one's trial start before its cooldown."""
+        cooldown = routing.get('cooldown', 30)
+        now = time.time()
+        with self._lock:
+            health = {req['name']: self._get(req['name']) for req in requests_}
+            state = {name: self._breaker(h, cooldown, now) for name, h in health.items()}
+        available = [req for req in requests_ if state[req['name']] in ('closed', 'half-open')]
+        if not available:
+            waiting = [req for req in requests_ if state[req['name']] == 'open']
+            if not waiting:
+                return [], False
+            return [min(waiting, key=lambda req: health[req['name']].opened_at)], True
+        if routing.get('policy') == 'latency':
+            # Providers without measurements go first so they get measured
+            available.sort(key=lambda req: health[req['name']].ewma or 0)
+        return available, False
+
+    def admit(self, name, routing, early=False):
+        """Whether a call to ``name`` may go ahead now: 'closed', 'trial' when this caller
+        claimed the half-open trial (``early``: even before the cooldown), or None"""
+        with self._lock:
+            health = self._get(name)
+            state = self._breaker(health, routing.get('cooldown', 30), time.time())
+            if state == 'closed':
+                return 'closed'
+            if state == 'half-open' or (state == 'open' and early):
+                health.trial = True
+                return 'trial'
+            return None
+
+    def end_trial(self, name):
+        """Give up a claimed trial without a verdict (the attempt was abandoned)"""
+        with self._lock:
+            self._get(name).trial = False
+
+    def hedge_delay(self, name, routing):
+        with self._lock:
+            health = self._get(name)
+            if len(health.latencies) >= self.MIN_SAMPLES:
+                return health.percentile(routing.get('hedge_percentile', 0.95))
+        return routing.get('hedge_delay', 2.0)
+
+    def _attempt(self, req, on_token, routing, on_response=None, cancel=None, early=False):
+        breaker = self.admit(req['name'], routing, early)
+        if breaker is None:
+            raise LLMAttemptSkipped(req['name'])
+        trial = breaker == 'trial'
+        start = time.perf_counter()
+        answered = []
+
+        def response_started():
+            answered.append(time.perf_counter() - start)
+            if on_response:
+                on_response()
+
+        try:
+            result = send_llm_request(req, on_token, response_started, cancel)
+        except BaseException as e:
+            if trial:
+                self.end_trial(req['name'])
+            if isinstance(e, LLMAttemptAbandoned):
+                return {"success": False, "error": "abandoned", "abandoned": True}
+            raise
+        if result['success']:
+            self.record_success(req['name'], answered[0] if answered else time.perf_counter() - start, trial)
+        else:
+            self.record_failure(req['name'], routing.get('failure_threshold', 3), trial)
+        result['provider'] = req['name']
+        return result
+
+    def call(self, requests_, on_token=None, routing=None):
+        """Send the request to one or more providers according to ``routing``"""
+        routing = routing or {}
+        ordered, early = self.order(requests_, routing)
+        if routing.get('policy') == 'hedge' and len(ordered) > 1:
+            return self._hedged(ordered, on_token, routing)
+
+        errors = []
+        streamed = []
+        emit = None
+        if on_token:
+            def emit(text):
+                streamed.append(True)
+                on_token(text)
+        for req in ordered:
+            try:
+                result = self._attempt(req, emit, routing, early=early)
+            except LLMAttemptSkipped:
+                continue  # another caller holds its half-open trial
+            if result['success'] or streamed:
+                return result
+            errors.append(result)
+        return self._failure(errors)
+
+    def _hedged(self, ordered, on_token, routing):
+        events = Queue()
+        # Attempts are told apart by their position in ``ordered``: two configured
+        # providers may share a name
+        pending = list(enumerate(ordered))
+        winner = []  # the attempt whose tokens reach on_token
+        claim_lock = threading.Lock()
+        cancels = {}  # attempt index -> RequestCanceller of that attempt
+
+        def cancel_others(index):
+            for other, cancel in list(cancels.items()):
+                if other != index:
+                    cancel.cancel()
+
+        def run(index, req):
+            emit = None
+            if on_token:
+                def emit(text):
+                    with claim_lock:
+                        if not winner:
+                            winner.append(index)
+                            cancel_others(index)
+                    if winner[0] != index:
+                        raise LLMAttemptAbandoned()
+                    on_token(text)
+            try:
+                result = self._attempt(req, emit, routing,
+                                       on_response=lambda: events.put(('answered', index, req, None)),
+                                       cancel=cancels[index])
+            except LLMAttemptSkipped:
+                result = {"success": False, "error": "circuit open", "skipped": True, "provider": req['name']}
+            except Exception as e:
+                result = {"success": False, "error": str(e), "provider": req['name']}
+            events.put(('done', index, req, result))
+
+        def launch():
+            index, req = pending.pop(0)
+            cancels[index] = RequestCanceller()
+            self._pool.submit(run, index, req)
+            return req
+
+        latest = launch()
+        running, answered, errors = 1, False, []
+        while running:
+            timeout = self.hedge_delay(latest['name'], routing) if pending and not answered else None
+            try:
+                kind, index, req, result = events.get(timeout=timeout)
+            except Empty:
+                logger.info("LLM hedge", extra=log_fields(waiting_for=latest['name'], also_calling=pending[0][1]['name']))
+                latest = launch()
+                running += 1
+                continue
+            if kind == 'answered':
+                answered = True
+                continue
+            running -= 1
+            if result['success'] or (winner and winner[0] == index):
+                # Stop the attempts still running so they give their connections back
+                with claim_lock:
+                    cancel_others(index)
+                return result
+            if not result.get('abandoned') and not result.get('skipped'):
+                errors.append(result)
+            if pending and not winner:
+                answered = False
+                latest = launch()
+                running += 1
+        return self._failure(errors)
+
+    @staticmethod
+    def _failure(errors):
+        if len(errors) == 1:
+            return errors[0]
+        message = '; '.join(f"{e.get('provider')}: {e.get('error')}" for e in errors) or '没有可用的 LLM 服务'
+        return {"success": False, "error": message}
+
+    def forget(self, keep):
+        """Drop the health of providers that are no longer configured"""
+        with self._lock:
+            for name in set(self._health) - set(keep):
+                del self._health[name]
+
+    def info(self):
+        now = time.time()
+        with self._lock:
+            return {
+                name: {
+                    "calls": health.calls,
+                    "errors": health.errors,
+                    "consecutive_failures": health.failures,
+                    "circuit": 'closed' if health.opened_at is None else ('half-open' if health.trial else 'open'),
+                    "opened_seconds_ago": None if health.opened_at is None else round(now - health.opened_at, 1),
+                    "latency_ewma": None if health.ewma is None else round(health.ewma, 4),
+                    "latency_p95": round(health.percentile(0.95), 4) if health.latencies else None
+                }
+                for name, health in self._health.items()
+            }
+
+llm_router = LLMRouter()
+
+def build_llm_request(llm, messages, stream=False):
+    """Build the HTTP request for one provider block (OpenAI, Claude, Gemini or Ollama)"""
     api_key = llm.get('api_key', '')
     base_url = llm.get('base_url', 'https://api.openai.com/v1').rstrip('/')
     model = llm.get('model', 'gpt-3.5-turbo')
     provider = llm.get('provider', 'openai')
 
-    # Debug info
-    print("=" * 50)
-    print("LLM API Request Debug Info:")
-    print(f"Provider: {provider}")
-    print(f"Model: {model}")
-    print(f"Base URL: {base_url}")
-
     # 根据提供商设置请求格式
     if provider == 'claude':
         # Claude API 格式
@@ -239,6 +2591,8 @@ def call_llm_api(messages, config=None):
         }
         if system_content:
             payload["system"] = system_content
+        if stream:
+            payload["stream"] = True
 
         headers = {
             "Content-Type": "application/json",
@@ -246,13 +2600,20 @@ def call_llm_api(messages, config=None):
             "anthropic-version": "2023-06-01"
         }
         response_parser = lambda r: r['content'][0]['text']
+        stream_parser = parse_claude_stream_event
 
     elif provider == 'gemini':
         # Gemini API 格式
         # URL: https://generativelanguage.googleapis.com/v1beta/models/{model}:generateContent?key={api_key}
-        url = f"{base_url}/models/{model}:generateContent"
-        if api_key:
-            url += f"?key={api_key}"
+        if stream:
+            # Streaming: https://.../models/{model}:streamGenerateContent?alt=sse
+            url = f"{base_url}/models/{model}:streamGenerateContent?alt=sse"
+            if api_key:
+                url += f"&key={api_key}"
+        else:
+            url = f"{base_url}/models/{model}:generateContent"
+            if api_key:
+                url += f"?key={api_key}"
 
         # 转换消息格式为 Gemini 格式
         contents = []
@@ -282,6 +2643,9 @@ def call_llm_api(messages, config=None):
             "Content-Type": "application/json"
         }
         response_parser = lambda r: r['candidates'][0]['content']['parts'][0]['text']
+        stream_parser = lambda r: ''.join(
+            part.get('text', '') for part in r.get('candidates', [{}])[0].get('content', {}).get('parts', [])
+        )
 
     elif provider == 'ollama':
         # Ollama API 格式
@@ -290,7 +2654,7 @@ def call_llm_api(messages, config=None):
         payload = {
             "model": model,
             "messages": messages,
-            "stream": False,
+            "stream": stream,
             "options": {
                 "temperature": 0.3,
                 "num_predict": 4000
@@ -305,6 +2669,7 @@ def call_llm_api(messages, config=None):
             headers["Authorization"] = f"Bearer {api_key}"
 
         response_parser = lambda r: r['message']['content']
+        stream_parser = parse_ollama_stream_chunk
 
     else:
         # OpenAI API 格式 (默认)
@@ -315,32 +2680,80 @@ def call_llm_api(messages, config=None):
             "temperature": 0.3,
             "max_tokens": 4000
         }
+        if stream:
+            payload["stream"] = True
         headers = {
             "Content-Type": "application/json",
             "Authorization": f"Bearer {api_key}"
         }
         response_parser = lambda r: r['choices'][0]['message']['content']
+        stream_parser = lambda r: (r.get('choices') or [{}])[0].get('delta', {}).get('content')
+
+    return {
+        "name": llm_provider_name(llm), "provider": provider, "model": model, "base_url": base_url,
+        "url": url, "headers": headers, "payload": payload,
+        "response_parser": response_parser, "stream_parser": stream_parser,
+        "connect_timeout": llm.get('connect_timeout', 10), "read_timeout": llm.get('read_timeout', 60)
+    }
 
-    # 打印请求信息（隐藏敏感信息）
-    safe_headers = {k: ('***' if 'key' in k.lower() or 'authorization' in k.lower() else v) for k, v in headers.items()}
-    print(f"URL: {url}")
-    print(f"Headers: {json.dumps(safe_headers, indent=2)}")
-    print(f"Payload: {json.dumps(payload, indent=2, ensure_ascii=False)}")
-    print("=" * 50)
 
+def send_llm_request(req, on_token=None, on_response=None, cancel=None):
+    """Send a request built by build_llm_request and return {"success", "content"} or
+    {"success": False, "error"}. ``on_response`` is called once the response headers
+    have arrived, before the body is read. A request stopped through the
+    RequestCanceller ``cancel`` raises LLMAttemptAbandoned. Duration, outcome
+    and token usage are recorded in the metrics."""
+    labels = {"provider": req['name'], "model": req['model']}
+    if logger.isEnabledFor(logging.DEBUG):
+        # 请求详情（隐藏敏感信息）只在调试级别序列化
+        safe_headers = {k: ('***' if 'key' in k.lower() or 'authorization' in k.lower() else v)
+                        for k, v in req['headers'].items()}
+        logger.debug("LLM request", extra=log_fields(**labels, url=re.sub(r'key=[^&]+', 'key=***', req['url']),
+                                                     headers=safe_headers, payload=req['payload']))
+    usage = {}
+    start = time.perf_counter()
     try:
-        data = json.dumps(payload).encode('utf-8')
-        req = urllib.request.Request(url, data=data, headers=headers, method='POST')
+        result = post_llm_request(req, on_token, on_response, usage, cancel)
+        if cancel is not None and cancel.cancelled and not result['success']:
+            raise LLMAttemptAbandoned()
+    except LLMAttemptAbandoned:
+        LLM_REQUESTS.inc(outcome='abandoned', **labels)
+        raise
+    elapsed = time.perf_counter() - start
+    LLM_DURATION.observe(elapsed, **labels)
+    LLM_REQUESTS.inc(outcome='success' if result['success'] else 'error', **labels)
+    for direction, count in usage.items():
+        LLM_TOKENS.inc(count, direction=direction, **labels)
+    logger.info("LLM request finished", extra=log_fields(
+        **labels, stream=bool(on_token), seconds=round(elapsed, 3), success=result['success'],
+        input_tokens=usage.get('input'), output_tokens=usage.get('output')))
+    return result
 
-        with urllib.request.urlopen(req, timeout=60) as response:
-            result = json.loads(response.read().decode('utf-8'))
-            content = response_parser(result)
+
+def post_llm_request(req, on_token, on_response, usage, cancel=None):
+    """The HTTP round trip of send_llm_request; token counts are added to ``usage``"""
+    provider = req['provider']
+    try:
+        data = json.dumps(req['payload']).encode('utf-8')
+
+        with http_request('POST', req['url'], body=data, headers=req['headers'],
+                          connect_timeout=req['connect_timeout'],
+                          read_timeout=req['read_timeout'], cancel=cancel) as response:
+            if on_response:
+                on_response()
+            if on_token:
+                content = read_llm_stream(response, req['stream_parser'], on_token, sse=provider != 'ollama',
+                                          usage=usage)
+            else:
+                result = json.loads(response.read().decode('utf-8'))
+                content = req['response_parser'](result)
+                usage.update(llm_usage(result))
             return {"success": True, "content": content}
     except urllib.error.HTTPError as e:
         error_body = ""
         try:
             error_body = e.read().decode('utf-8')
-            print(f"LLM API Error Response Body: {error_body}")
+            logger.debug("LLM API error response", extra=log_fields(provider=req['name'], body=error_body))
             error_json = json.loads(error_body)
 
             # 尝试提取错误信息（不同提供商格式不同）
@@ -352,20 +2765,166 @@ def call_llm_api(messages, config=None):
                 error_msg = error_json.get('error', {}).get('message', error_body)
         except:
             error_msg = error_body or str(e)
-        print(f"LLM API HTTP error {e.code}: {error_msg}")
+        logger.warning("LLM API HTTP error", extra=log_fields(provider=req['name'], status=e.code, error=error_msg))
         return {"success": False, "error": f"HTTP {e.code}: {error_msg}"}
     except urllib.error.URLError as e:
-        print(f"LLM API URL error: {e.reason}")
+        logger.warning("LLM API connection error", extra=log_fields(provider=req['name'], error=str(e.reason)))
         return {"success": False, "error": f"连接失败: {e.reason}"}
+    except LLMAttemptAbandoned:
+        raise
     except Exception as e:
-        print(f"LLM API error: {e}")
+        logger.warning("LLM API error", extra=log_fields(provider=req['name'], error=str(e)))
         return {"success": False, "error": str(e)}
 
-def llm_translate_and_match(tags_list, categories):
-    """Use LLM to translate tags and match categories"""
+
+@profiled_span('call_llm_api')
+def call_llm_api(messages, config=None, on_token=None, use_cache=True, parse=None):
+    """Call LLM API - supports OpenAI, Claude, Gemini, and Ollama.
+
+    With several providers configured (``llm.providers``), llm_router picks
+    which ones to call according to ``llm.routing`` (see LLMRouter).
+    With ``on_token`` the response is streamed and each text fragment is passed
+    to it as it arrives; the full content is still returned at the end.
+
+    ``parse`` turns the reply text into the value the caller needs and raises
+    ValueError when the reply is unusable; its value is returned as ``parsed``.
+    A reply it rejects fails the call with ``unparsable`` set.
+    Successful responses are cached (see LLMResponseCache) unless ``use_cache``
+    is False. Only replies that ``parse`` accepts are stored, and a cached
+    reply it rejects is evicted and requested again. A cached answer is
+    passed to ``on_token`` in one piece.
+    """
+    if config is None:
+        client = llm_client()
+        providers, routing = client['providers'], client['routing']
+    else:
+        providers = llm_providers(config.get('llm', {}))
+        routing = config.get('llm', {}).get('routing', {})
+    requests_ = [build_llm_request(provider, messages, stream=bool(on_token)) for provider in providers]
+
+    cache_keys = {}
+    if use_cache and llm_cache is not None:
+        for req in requests_:
+            cache_keys[req['name']] = key = LLMResponseCache.make_key(req['provider'], req['base_url'], req['payload'])
+            content = llm_cache.get(key)
+            if content is None:
+                continue
+            result = parse_llm_result({"success": True, "content": content, "cached": True, "provider": req['name']},
+                                      parse)
+            if not result['success']:
+                llm_cache.discard(key)
+                continue
+            logger.info("LLM cache hit", extra=log_fields(provider=req['name'], model=req['model']))
+            if on_token:
+                on_token(content)
+            return result
+    elif llm_cache is not None:
+        llm_cache.record_bypass()
+
+    result = parse_llm_result(llm_router.call(requests_, on_token, routing), parse)
+    if result['success'] and result['provider'] in cache_keys:
+        llm_cache.put(cache_keys[result['provider']], result['content'])
+    return result
+
+def parse_llm_result(result, parse):
+    """Apply call_llm_api's ``parse`` to a successful result"""
+    if not result['success'] or parse is None:
+        return result
+    try:
+        return dict(result, parsed=parse(result['content']))
+    except ValueError as e:
+        logger.warning("Unusable LLM response", extra=log_fields(provider=result.get('provider'), error=str(e)))
+        logger.debug("LLM response", extra=log_fields(content=result['content']))
+        return dict(result, success=False, unparsable=True, error=f"Unusable LLM response: {e}")
+
+def parse_llm_json(content, expected=list):
+    """Parse a JSON reply, tolerating a markdown code block around it.
+    Raises ValueError unless it is valid JSON of the ``expected`` type."""
+    json_str = content.strip()
+    if json_str.startswith('```'):
+        # Remove markdown code blocks
+        lines = json_str.split('\n')
+        json_lines = []
+        in_code = False
+        for line in lines:
+            if line.startswith('```'):
+                in_code = not in_code
+                continue
+            if in_code or not line.startswith('```'):
+                json_lines.append(line)
+        json_str = '\n'.join(json_lines)
+
+    value = json.loads(json_str)
+    if not isinstance(value, expected):
+        raise ValueError(f"expected a JSON {expected.__name__}, got {type(value).__name__}")
+    return value
+
+LLM_TRANSLATE_CHUNK_SIZE = 40        # tags per LLM request
+LLM_TRANSLATE_CHUNK_CHARS = 2000     # characters of tag text per LLM request
+LLM_TRANSLATE_CONCURRENCY = 4
+LLM_TRANSLATE_RETRIES = 1
+
+def chunk_tags(tags_list, max_tags=LLM_TRANSLATE_CHUNK_SIZE, max_chars=LLM_TRANSLATE_CHUNK_CHARS):
+    """Split tags into consecutive chunks of at most ``max_tags`` tags and ``max_chars`` characters"""
+    chunks, chunk, chars = [], [], 0
+    for tag in tags_list:
+        if chunk and (len(chunk) >= max_tags or chars + len(tag) > max_chars):
+            chunks.append(chunk)
+            chunk, chars = [], 0
+        chunk.append(tag)
+        chars += len(tag)
+    if chunk:
+        chunks.append(chunk)
+    return chunks
+
+def llm_translate_and_match(tags_list, categories, use_cache=True):
+    """Use LLM to translate tags and match categories.
+
+    Large inputs are split into chunks that are sent concurrently (``llm``
+    options ``translate_chunk_size``, ``translate_concurrency`` and
+    ``translate_retries`` in config.json); only failed chunks are retried.
+    Results come back in input order. Tags of chunks that still failed are
+    returned as ``{"original": tag, "failed": True}``; None if every chunk failed.
+    """
     if not categories:
         return None
 
+    options = load_config().get('llm', {})
+    chunks = chunk_tags(tags_list, max_tags=options.get('translate_chunk_size', LLM_TRANSLATE_CHUNK_SIZE))
+    if not chunks:
+        return None
+    concurrency = max(1, min(options.get('translate_concurrency', LLM_TRANSLATE_CONCURRENCY), len(chunks)))
+    retries = options.get('translate_retries', LLM_TRANSLATE_RETRIES)
+
+    chunk_results = [None] * len(chunks)
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='llm-chunk') as pool:
+        todo = list(range(len(chunks)))
+        for attempt in range(retries + 1):
+            # A retry must reach the provider, never the cached reply that just failed
+            futures = {i: pool.submit(llm_translate_chunk, chunks[i], categories, use_cache and attempt == 0)
+                       for i in todo}
+            for i, future in futures.items():
+                try:
+                    chunk_results[i] = future.result()
+                except Exception as e:
+                    logger.warning("LLM translation chunk failed",
+                                   extra=log_fields(chunk=i + 1, chunks=len(chunks), error=str(e)))
+            todo = [i for i in todo if chunk_results[i] is None]
+            if not todo:
+                break
+            if attempt < retries:
+                logger.info("Retrying LLM translation chunks", extra=log_fields(retrying=len(todo), chunks=len(chunks)))
+
+    if all(result is None for result in chunk_results):
+        return None
+    merged = []
+    for chunk, result in zip(chunks, chunk_results):
+        merged.extend(result if result is not None else [{'original': tag, 'failed': True} for tag in chunk])
+    return merged
+
+def llm_translate_chunk(tags_list, categories, use_cache=True):
+    """Translate and categorize one chunk of tags with a single LLM request.
+    Returns one result per tag, in order (see align_translations); None on failure"""
     # Build category info for the prompt
     category_info = []
     for cat in categories:
@@ -405,37 +2964,307 @@ Important:
         {"role": "user", "content": prompt}
     ]
 
-    response = call_llm_api(messages)
+    response = call_llm_api(messages, use_cache=use_cache, parse=parse_translation_reply)
 
     if response and response.get('success'):
+        return align_translations(tags_list, response['parsed'])
+    if response and not response.get('unparsable'):
+        logger.warning("LLM API call failed", extra=log_fields(error=response.get('error', 'Unknown error')))
+    return None
+
+def align_translations(tags_list, items):
+    """Line the LLM's tag objects up with the tags it was asked about: one result per
+    tag, in order, with ``original`` set to that tag. When the counts match, items
+    are taken by position; otherwise by their ``original`` text, and tags the reply
+    left out come back as ``{"original": tag, "failed": True}``."""
+    if len(items) == len(tags_list):
+        return [dict(item, original=tag) for tag, item in zip(tags_list, items)]
+    by_original = {}
+    for item in items:
+        by_original.setdefault(str(item.get('original', '')).strip().lower(), []).append(item)
+    results = []
+    for tag in tags_list:
+        matches = by_original.get(tag.strip().lower())
+        results.append(dict(matches.pop(0), original=tag) if matches else {'original': tag, 'failed': True})
+    return results
+
+def parse_translation_reply(content):
+    """The JSON array of tag objects llm_translate_chunk asks for"""
+    result = parse_llm_json(content)
+    if not all(isinstance(item, dict) for item in result):
+        raise ValueError("expected an array of objects")
+    return result
+
+# ============ Background Jobs ============
+
+class JobQueue:
+    """Run slow LLM-backed operations on a bounded thread pool.
+
+    ``submit`` returns a job record right away, so request workers are never
+    held for the length of an LLM call. Job state lives in a small SQLite
+    table, which lets any worker process answer a poll for a job started by
+    another one. Finished jobs are pruned after ``ttl`` seconds.
+
+    Jobs submitted with ``stream=True`` get an ``on_token`` callback; the text
+    streamed so far is published as the job's ``partial`` field, at most every
+    ``progress_interval`` seconds.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS jobs (
+            id TEXT PRIMARY KEY,
+            kind TEXT NOT NULL,
+            status TEXT NOT NULL,
+            revision INTEGER NOT NULL,
+            status_code INTEGER,
+            result TEXT,
+            partial TEXT,
+            created_at TEXT NOT NULL,
+            updated_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_jobs_updated_at ON jobs (updated_at);
+    """
+
+    FINISHED = ('done', 'failed')
+
+    def __init__(self, path, workers=4, max_pending=32, ttl=3600, progress_interval=0.1):
+        self.path = path
+        self.max_pending = max_pending
+        self.ttl = ttl
+        self.progress_interval = progress_interval
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='job')
+        self._local = threading.local()
+        self._pending = 0
+        self._changed = threading.Condition()
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = thread_local_sqlite(self._local, self.path, self.SCHEMA)
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(jobs)")}
+            if 'partial' not in columns:
+                conn.execute("ALTER TABLE jobs ADD COLUMN partial TEXT")
+        return conn
+
+    def submit(self, kind, fn, *args, stream=False):
+        """Queue ``fn(*args)``, which returns (response body, status code); with ``stream``
+        it is also passed ``on_token``. Returns the new job, or None when too many jobs
+        are already waiting."""
+        with self._changed:
+            if self._pending >= self.max_pending:
+                return None
+            self._pending += 1
         try:
-            # Try to extract JSON from the response
-            # Handle cases where LLM might add markdown code blocks
-            json_str = response['content'].strip()
-            if json_str.startswith('```'):
-                # Remove markdown code blocks
-                lines = json_str.split('\n')
-                json_lines = []
-                in_code = False
-                for line in lines:
-                    if line.startswith('```'):
-                        in_code = not in_code
-                        continue
-                    if in_code or not line.startswith('```'):
-                        json_lines.append(line)
-                json_str = '\n'.join(json_lines)
-
-            result = json.loads(json_str)
-            return result
-        except json.JSONDecodeError as e:
-            print(f"Failed to parse LLM response as JSON: {e}")
-            print(f"Response was: {response.get('content', '')}")
+            # Only finished jobs expire; a queued or running job may be older than the TTL
+            self._conn().execute("DELETE FROM jobs WHERE updated_at < ? AND status IN (?, ?)",
+                                 (time.time() - self.ttl, *self.FINISHED))
+            job = {'id': uuid.uuid4().hex, 'kind': kind, 'status': 'queued', 'revision': 0,
+                   'status_code': None, 'result': None, 'partial': None, 'created_at': datetime.now().isoformat()}
+            self._save(job)
+            self._executor.submit(self._run, dict(job), fn, args, stream)
+        except BaseException:
+            # The job never reached a worker, so give its slot back
+            with self._changed:
+                self._pending -= 1
+            raise
+        return job
+
+    def _run(self, job, fn, args, stream):
+        try:
+            self._update(job, status='running')
+            try:
+                if stream:
+                    body, status_code = fn(*args, on_token=self._progress_reporter(job))
+                else:
+                    body, status_code = fn(*args)
+            except Exception as e:
+                logger.exception("Job failed", extra=log_fields(job=job['id'], kind=job['kind']))
+                body, status_code = {"success": False, "error": str(e)}, 500
+            self._update(job, status='done' if status_code < 400 else 'failed',
+                         status_code=status_code, result=body)
+        finally:
+            with self._changed:
+                self._pending -= 1
+
+    def _progress_reporter(self, job):
+        parts = []
+        last_update = [0.0]
+
+        def on_token(text):
+            parts.append(text)
+            now = time.monotonic()
+            if now - last_update[0] >= self.progress_interval:
+                last_update[0] = now
+                self._update(job, partial=''.join(parts))
+        return on_token
+
+    def _save(self, job):
+        self._conn().execute(
+            "INSERT OR REPLACE INTO jobs (id, kind, status, revision, status_code, result, partial, created_at, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (job['id'], job['kind'], job['status'], job['revision'], job['status_code'],
+             json.dumps(job['result'], ensure_ascii=False) if job['result'] is not None else None,
+             job['partial'], job['created_at'], time.time())
+        )
+
+    def _update(self, job, **changes):
+        job.update(changes, revision=job['revision'] + 1)
+        self._save(job)
+        with self._changed:
+            self._changed.notify_all()
+
+    def get(self, job_id):
+        row = self._conn().execute(
+            "SELECT id, kind, status, revision, status_code, result, partial, created_at FROM jobs WHERE id = ?",
+            (job_id,)
+        ).fetchone()
+        if row is None:
             return None
-    elif response:
-        print(f"LLM API call failed: {response.get('error', 'Unknown error')}")
-
+        keys = ('id', 'kind', 'status', 'revision', 'status_code', 'result', 'partial', 'created_at')
+        job = dict(zip(keys, row))
+        job['result'] = json.loads(job['result']) if job['result'] is not None else None
+        return job
+
+    def wait(self, job_id, revision, timeout):
+        """Return the job once its revision is past ``revision``, or unchanged after ``timeout`` seconds"""
+        deadline = time.monotonic() + timeout
+        while True:
+            job = self.get(job_id)
+            remaining = deadline - time.monotonic()
+            if job is None or job['revision'] > revision or remaining <= 0:
+                return job
+            # Local jobs notify; jobs running in another worker are picked up by polling
+            with self._changed:
+                self._changed.wait(min(remaining, 0.5))
+
+
+def create_job_queue():
+    """Create the job queue sized from the optional ``jobs`` section of config.json"""
+    options = load_config().get('jobs', {})
+    return JobQueue(JOBS_DB_FILE, workers=options.get('workers', 4),
+                    max_pending=options.get('max_pending', 32), ttl=options.get('ttl', 3600))
+
+job_queue = create_job_queue()
+
+def submit_llm_job(kind, fn, *args, stream=False):
+    """Queue an LLM-backed operation and answer with its job id"""
+    profile = getattr(_profile_local, 'profile', None)
+    if profile is not None:
+        fn = profiler.wrap_job(fn, kind, profile)
+    job = job_queue.submit(kind, fn, *args, stream=stream)
+    if job is None:
+        return jsonify({"success": False, "error": "AI 任务队列已满，请稍后再试"}), 503
+    return jsonify({"success": True, "job_id": job['id'], "status": job['status']}), 202
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Poll a background job; finished jobs include the operation's response body as ``result``"""
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({"success": False, "error": "Job not found"}), 404
+    return jsonify({"success": True, "job": job})
+
+@app.route('/api/jobs/<job_id>/events', methods=['GET'])
+def job_events(job_id):
+    """Server-Sent Events stream of a job's status changes, ending once it finishes"""
+    if job_queue.get(job_id) is None:
+        return jsonify({"success": False, "error": "Job not found"}), 404
+
+    def stream():
+        revision = -1
+        deadline = time.monotonic() + 300
+        while time.monotonic() < deadline:
+            job = job_queue.wait(job_id, revision, timeout=15)
+            if job is None:
+                return
+            if job['revision'] == revision:
+                yield ": keep-alive\n\n"
+                continue
+            revision = job['revision']
+            yield f"data: {json.dumps(job, ensure_ascii=False)}\n\n"
+            if job['status'] in JobQueue.FINISHED:
+                return
+
+    return Response(stream(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+# ============ Conditional GET & Compression ============
+
+COMPRESS_MIN_SIZE = 1024  # bytes; smaller bodies are not worth compressing
+RESPONSE_CACHE_SIZE = 64
+
+_response_cache = OrderedDict()
+_response_cache_lock = threading.Lock()
+
+def negotiate_encoding(body_size):
+    """Pick the best content encoding the client accepts for a body of ``body_size`` bytes"""
+    if body_size < COMPRESS_MIN_SIZE:
+        return None
+    if brotli is not None and request.accept_encodings['br']:
+        return 'br'
+    if request.accept_encodings['gzip']:
+        return 'gzip'
     return None
 
+def encode_body(body, encoding):
+    if encoding == 'br':
+        return brotli.compress(body)
+    if encoding == 'gzip':
+        return gzip.compress(body, compresslevel=6)
+    return body
+
+def versioned_json_response(version, build):
+    """Serve ``build()`` as JSON with a strong ETag derived from the data ``version``.
+
+    A matching If-None-Match is answered with 304 without building or
+    serializing anything, and encoded bodies are cached per (URL, version,
+    encoding) so repeated polls of unchanged data cost a dictionary lookup.
+    """
+    etag = hashlib.sha1(f"{request.full_path}|{version}".encode('utf-8')).hexdigest()
+    headers = {'Cache-Control': 'no-cache', 'Vary': 'Accept-Encoding'}
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304, headers=headers)
+        response.set_etag(etag)
+        return response
+
+    cache_key = (request.full_path, version)
+    with _response_cache_lock:
+        cached = _response_cache.get(cache_key)
+        if cached is not None:
+            _response_cache.move_to_end(cache_key)
+    if cached is None:
+        cached = {None: app.json.dumps(build()).encode('utf-8')}
+    body = cached[None]
+    encoding = negotiate_encoding(len(body))
+    if encoding not in cached:
+        cached[encoding] = encode_body(body, encoding)
+    with _response_cache_lock:
+        _response_cache[cache_key] = cached
+        while len(_response_cache) > RESPONSE_CACHE_SIZE:
+            _response_cache.popitem(last=False)
+
+    response = Response(cached[encoding], mimetype='application/json', headers=headers)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.set_etag(etag)
+    return response
+
+@app.after_request
+def compress_json_response(response):
+    """Compress large JSON responses that were not already encoded"""
+    if (response.mimetype != 'application/json' or response.is_streamed
+            or response.direct_passthrough or 'Content-Encoding' in response.headers):
+        return response
+    body = response.get_data()
+    encoding = negotiate_encoding(len(body))
+    if encoding:
+        response.set_data(encode_body(body, encoding))
+        response.headers['Content-Encoding'] = encoding
+        response.vary.add('Accept-Encoding')
+    return response
+
+
 @app.route('/')
 def index():
     """Render main page"""
@@ -448,91 +3277,326 @@ def gallery():
 
 @app.route('/api/tags', methods=['GET'])
 def get_tags():
-    """Get all tags"""
-    data = load_data()
-    return jsonify(data)
+    """Get tags and categories.
+
+    Without query parameters the whole library is returned. Otherwise supports
+    ``category`` (ID filter), ``sort`` (created_at, name_en, name_zh; prefix "-"
+    for descending), ``limit`` + ``cursor`` pagination and ``fields`` (comma
+    separated tag fields to return; id is always included).
+    """
+    args = request.args
+    if not any(param in args for param in ('category', 'cursor', 'limit', 'sort', 'fields')):
+        return versioned_json_response(tag_store.version, load_data)
+
+    category_id = args.get('category') or None
+    if category_id == 'all':
+        category_id = None
+    sort = args.get('sort') or None
+    if sort and sort.lstrip('-') not in TAG_SORT_FIELDS:
+        return jsonify({"success": False, "error": f"Invalid sort field: {sort}"}), 400
+    limit = None
+    if args.get('limit'):
+        try:
+            limit = int(args['limit'])
+        except ValueError:
+            limit = 0
+        if limit < 1:
+            return jsonify({"success": False, "error": "limit must be a positive integer"}), 400
+
+    cursor = args.get('cursor')
+    if cursor:
+        try:
+            decode_cursor(cursor)
+        except ValueError as e:
+            return jsonify({"success": False, "error": str(e)}), 400
+    fields = [f.strip() for f in args.get('fields', '').split(',') if f.strip()]
+    if fields:
+        fields = ['id'] + [f for f in fields if f != 'id']
+
+    def build():
+        tags, total, next_cursor = tag_store.query_tags(category_id, sort, cursor, limit)
+        if fields:
+            tags = [{f: tag[f] for f in fields if f in tag} for tag in tags]
+        total_tags, category_counts = tag_store.tag_counts()
+        return {
+            "categories": tag_store.get_categories(),
+            "tags": tags,
+            "total": total,
+            "total_tags": total_tags,
+            "category_counts": category_counts,
+            "next_cursor": next_cursor
+        }
+
+    try:
+        return versioned_json_response(tag_store.version, build)
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
 
 @app.route('/api/tags', methods=['POST'])
 def add_tag():
     """Add a new tag"""
-    data = load_data()
     new_tag = request.json
-    new_tag['id'] = datetime.now().strftime('%Y%m%d%H%M%S%f')
+    new_tag['id'] = new_id()
     new_tag['created_at'] = datetime.now().isoformat()
-    data['tags'].append(new_tag)
-    save_data(data)
+    tag_store.add_tag(new_tag)
+    remember_tag_translations([new_tag])
     return jsonify({"success": True, "tag": new_tag})
 
+@app.route('/api/tags/lookup', methods=['POST'])
+def lookup_tags():
+    """Find library tags by name: for each of ``names`` the first tag whose English
+    name matches case-insensitively or whose Chinese name matches exactly, or null"""
+    names = (request.json or {}).get('names')
+    if not isinstance(names, list) or not all(isinstance(name, str) for name in names):
+        return jsonify({"success": False, "error": "names must be a list of strings"}), 400
+    return jsonify({"success": True, "tags": [tag_store.find_tag(name_en=name, name_zh=name) for name in names]})
+
 @app.route('/api/tags/<tag_id>', methods=['DELETE'])
 def delete_tag(tag_id):
     """Delete a tag by ID"""
-    data = load_data()
-    data['tags'] = [t for t in data['tags'] if t['id'] != tag_id]
-    save_data(data)
+    tag_store.delete_tag(tag_id)
     return jsonify({"success": True})
 
 @app.route('/api/tags/<tag_id>', methods=['PUT'])
 def update_tag(tag_id):
     """Update a tag by ID"""
-    data = load_data()
     updated_tag = request.json
-    for i, tag in enumerate(data['tags']):
-        if tag['id'] == tag_id:
-            updated_tag['id'] = tag_id
-            updated_tag['created_at'] = tag.get('created_at', datetime.now().isoformat())
-            data['tags'][i] = updated_tag
-            break
-    save_data(data)
+    tag = tag_store.get_tag(tag_id)
+    if tag:
+        updated_tag['id'] = tag_id
+        updated_tag['created_at'] = tag.get('created_at', datetime.now().isoformat())
+        tag_store.update_tag(updated_tag)
+        remember_tag_translations([updated_tag])
     return jsonify({"success": True, "tag": updated_tag})
 
 @app.route('/api/categories', methods=['GET'])
 def get_categories():
     """Get all categories"""
-    data = load_data()
-    return jsonify(data.get('categories', []))
+    return versioned_json_response(tag_store.version, tag_store.get_categories)
 
 @app.route('/api/categories', methods=['POST'])
 def add_category():
     """Add a new category"""
-    data = load_data()
     new_category = request.json
-    new_category['id'] = datetime.now().strftime('%Y%m%d%H%M%S%f')
-    if 'categories' not in data:
-        data['categories'] = []
-    data['categories'].append(new_category)
-    save_data(data)
+    new_category['id'] = new_id()
+    tag_store.add_category(new_category)
     return jsonify({"success": True, "category": new_category})
 
 @app.route('/api/categories/<cat_id>', methods=['DELETE'])
 def delete_category(cat_id):
     """Delete a category by ID"""
-    data = load_data()
-    data['categories'] = [c for c in data.get('categories', []) if c['id'] != cat_id]
-    save_data(data)
+    tag_store.delete_category(cat_id)
     return jsonify({"success": True})
 
 
 @app.route('/api/categories/<cat_id>', methods=['PUT'])
 def update_category(cat_id):
     """Update a category by ID"""
-    data = load_data()
     updated_category = request.json
+    updated_category['id'] = cat_id
 
-    for i, cat in enumerate(data.get('categories', [])):
-        if cat['id'] == cat_id:
-            updated_category['id'] = cat_id
-            data['categories'][i] = updated_category
-            save_data(data)
-            return jsonify({"success": True, "category": updated_category})
+    if tag_store.update_category(updated_category):
+        return jsonify({"success": True, "category": updated_category})
 
     return jsonify({"success": False, "error": "Category not found"}), 404
 
+# ============ Uploads ============
+
+# Uploads are stored under the SHA-256 of their content, so re-uploading the
+# same image reuses the existing file. Gallery items referencing a file are
+# counted by the gallery store; the file is removed with its last reference.
+CONTENT_ADDRESSED_NAME = re.compile(r'^[0-9a-f]{64}\.[a-z0-9]+$')
+
+_uploads_thread_lock = threading.RLock()
+_uploads_file_lock = FileLock(UPLOAD_LOCK_FILE)
+
+@contextmanager
+def uploads_lock():
+    """Serialize upload file changes with the gallery writes that reference them, across threads and workers"""
+    with _uploads_thread_lock, _uploads_file_lock:
+        yield
+
+def stage_upload(file):
+    """Stream an upload into a temp file next to the uploads, hashing it on the way.
+    Returns (temp path, content-addressed filename)."""
+    ext = file.filename.rsplit('.', 1)[1].lower()
+    digest = hashlib.sha256()
+    tmp_path = os.path.join(app.config['UPLOAD_FOLDER'], f".{uuid.uuid4().hex}.upload")
+    try:
+        with open(tmp_path, 'wb') as out:
+            for chunk in iter(lambda: file.stream.read(UPLOAD_CHUNK_SIZE), b''):
+                digest.update(chunk)
+                out.write(chunk)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    return tmp_path, f"{digest.hexdigest()}.{ext}"
+
+def store_upload(tmp_path, filename):
+    """Move a staged upload into place unless the same content is already stored.
+    Must be called with uploads_lock held."""
+    filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+    if os.path.exists(filepath):
+        os.remove(tmp_path)
+        return
+    os.replace(tmp_path, filepath)
+    generate_thumbnails_async(filename)
+
+def release_upload(filename):
+    """Delete an upload and its thumbnails once no gallery item references it.
+    Must be called with uploads_lock held."""
+    if not filename or gallery_store.image_refs(filename):
+        return
+    filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+    if os.path.exists(filepath):
+        os.remove(filepath)
+    delete_thumbnails(filename)
+
+@app.after_request
+def cache_content_addressed_files(response):
+    """Content-addressed uploads and their thumbnails never change, so let clients cache them for good"""
+    if (response.status_code == 200 and request.path.startswith(('/static/uploads/', '/thumbs/'))
+            and CONTENT_ADDRESSED_NAME.match(request.path.rsplit('/', 1)[-1])):
+        response.cache_control.no_cache = None
+        response.cache_control.public = True
+        response.cache_control.max_age = 31536000
+        response.cache_control.immutable = True
+    return response
+
+
+# ============ Thumbnails ============
+
+_thumbnail_cache_bytes = None
+_thumbnail_lock = threading.Lock()
+
+def thumbnail_path(filename, width):
+    """Thumbnails are keyed by the full upload name: uploads of the same bytes
+    with different extensions are separate files with separate refcounts"""
+    return os.path.join(THUMBNAIL_FOLDER, f"{filename}_{width}.webp")
+
+def generate_thumbnail(filename, width):
+    """Render a WebP thumbnail of an upload, never upscaling; returns its path or None"""
+    source = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+    if Image is None or not os.path.exists(source):
+        return None
+    target = thumbnail_path(filename, width)
+    os.makedirs(THUMBNAIL_FOLDER, exist_ok=True)
+    with Image.open(source) as img:
+        img = ImageOps.exif_transpose(img)
+        if img.mode not in ('RGB', 'RGBA'):
+            img = img.convert('RGBA' if 'A' in img.getbands() or 'transparency' in img.info else 'RGB')
+        img.thumbnail((width, width * 4))
+        tmp_path = f"{target}.{os.getpid()}.{threading.get_ident()}.tmp"
+        img.save(tmp_path, 'WEBP', quality=80, method=4)
+    os.replace(tmp_path, target)
+    track_thumbnail_cache(os.path.getsize(target))
+    return target
+
+def generate_thumbnails(filename):
+    """Render every thumbnail width for an upload"""
+    for width in THUMBNAIL_WIDTHS:
+        try:
+            generate_thumbnail(filename, width)
+        except Exception as e:
+            logger.warning("Thumbnail error", extra=log_fields(file=filename, width=width, error=str(e)))
+
+def generate_thumbnails_async(filename):
+    if Image is not None:
+        threading.Thread(target=generate_thumbnails, args=(filename,), daemon=True).start()
+
+def delete_thumbnails(filename):
+    for width in THUMBNAIL_WIDTHS:
+        path = thumbnail_path(filename, width)
+        if os.path.exists(path):
+            os.remove(path)
+
+def track_thumbnail_cache(added_bytes):
+    """Account for a new thumbnail and evict the least recently used ones above the size limit"""
+    global _thumbnail_cache_bytes
+    with _thumbnail_lock:
+        if _thumbnail_cache_bytes is None:
+            _thumbnail_cache_bytes = sum(e.stat().st_size for e in os.scandir(THUMBNAIL_FOLDER) if e.is_file())
+        else:
+            _thumbnail_cache_bytes += added_bytes
+        if _thumbnail_cache_bytes <= THUMBNAIL_CACHE_MAX_BYTES:
+            return
+        # Rescan: other workers share the directory. Served thumbnails get
+        # their mtime touched, so mtime order approximates recency.
+        entries = sorted((e for e in os.scandir(THUMBNAIL_FOLDER) if e.is_file()),
+                         key=lambda e: e.stat().st_mtime)
+        total = sum(e.stat().st_size for e in entries)
+        target = THUMBNAIL_CACHE_MAX_BYTES * 0.9
+        for entry in entries:
+            if total <= target:
+                break
+            try:
+                size = entry.stat().st_size
+                os.remove(entry.path)
+                total -= size
+            except FileNotFoundError:
+                pass
+        _thumbnail_cache_bytes = total
+
+@app.route('/thumbs/<int:width>/<filename>')
+def get_thumbnail(width, filename):
+    """Serve a thumbnail, generating it on first request (backfills uploads made before thumbnails existed)"""
+    if width not in THUMBNAIL_WIDTHS or secure_filename(filename) != filename or not allowed_file(filename):
+        return jsonify({"success": False, "error": "Invalid thumbnail"}), 404
+    if not os.path.exists(os.path.join(app.config['UPLOAD_FOLDER'], filename)):
+        return jsonify({"success": False, "error": "Image not found"}), 404
+
+    path = thumbnail_path(filename, width)
+    if not os.path.exists(path):
+        try:
+            path = generate_thumbnail(filename, width)
+        except Exception as e:
+            logger.warning("Thumbnail error", extra=log_fields(file=filename, width=width, error=str(e)))
+            path = None
+        if path is None:
+            # Pillow missing or image unreadable: fall back to the original
+            return redirect(url_for('static', filename=f'uploads/{filename}'))
+    else:
+        os.utime(path)
+    return send_from_directory(THUMBNAIL_FOLDER, os.path.basename(path), max_age=31536000)
+
+
 # Gallery API endpoints
 @app.route('/api/gallery', methods=['GET'])
 def get_gallery():
-    """Get all gallery items"""
-    gallery = load_gallery()
-    return jsonify(gallery)
+    """Get gallery items.
+
+    Without query parameters all items are returned. Otherwise supports
+    ``limit`` + ``cursor`` pagination (newest first) and ``q``, a text filter
+    on title and prompts.
+    """
+    args = request.args
+    if not any(param in args for param in ('cursor', 'limit', 'q')):
+        return versioned_json_response(gallery_store.version, load_gallery)
+
+    limit = None
+    if args.get('limit'):
+        try:
+            limit = int(args['limit'])
+        except ValueError:
+            limit = 0
+        if limit < 1:
+            return jsonify({"success": False, "error": "limit must be a positive integer"}), 400
+    cursor = args.get('cursor')
+    if cursor:
+        try:
+            decode_cursor(cursor)
+        except ValueError as e:
+            return jsonify({"success": False, "error": str(e)}), 400
+    text = args.get('q', '').strip() or None
+
+    def build():
+        items, total, next_cursor = gallery_store.query_items(text, cursor, limit)
+        return {"items": items, "total": total, "next_cursor": next_cursor}
+
+    try:
+        return versioned_json_response(gallery_store.version, build)
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
 
 @app.route('/api/gallery', methods=['POST'])
 def add_gallery_item():
@@ -545,24 +3609,20 @@ def add_gallery_item():
         return jsonify({"success": False, "error": "No selected file"}), 400
 
     if file and allowed_file(file.filename):
-        # Generate unique filename
-        ext = file.filename.rsplit('.', 1)[1].lower()
-        filename = f"{uuid.uuid4().hex}.{ext}"
-        filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        file.save(filepath)
+        tmp_path, filename = stage_upload(file)
 
         # Create gallery item
-        gallery = load_gallery()
         new_item = {
-            "id": datetime.now().strftime('%Y%m%d%H%M%S%f'),
+            "id": new_id(),
             "image": filename,
             "title": request.form.get('title', ''),
             "positive_prompt": request.form.get('positive_prompt', ''),
             "negative_prompt": request.form.get('negative_prompt', ''),
             "created_at": datetime.now().isoformat()
         }
-        gallery['items'].insert(0, new_item)  # Add to beginning
-        save_gallery(gallery)
+        with uploads_lock():
+            store_upload(tmp_path, filename)
+            gallery_store.add_item(new_item)  # Added to the beginning
 
         return jsonify({"success": True, "item": new_item})
 
@@ -571,25 +3631,21 @@ def add_gallery_item():
 @app.route('/api/gallery/<item_id>', methods=['PUT'])
 def update_gallery_item(item_id):
     """Update a gallery item"""
-    gallery = load_gallery()
-
-    for i, item in enumerate(gallery['items']):
-        if item['id'] == item_id:
-            # Handle image update if new image is uploaded
-            if 'image' in request.files:
-                file = request.files['image']
-                if file and file.filename and allowed_file(file.filename):
-                    # Delete old image
-                    old_image_path = os.path.join(app.config['UPLOAD_FOLDER'], item['image'])
-                    if os.path.exists(old_image_path):
-                        os.remove(old_image_path)
-
-                    # Save new image
-                    ext = file.filename.rsplit('.', 1)[1].lower()
-                    filename = f"{uuid.uuid4().hex}.{ext}"
-                    filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-                    file.save(filepath)
-                    item['image'] = filename
+    # Stage a replacement image before taking the lock; it is hashed while streaming
+    staged = None
+    file = request.files.get('image')
+    if file and file.filename and allowed_file(file.filename):
+        staged = stage_upload(file)
+
+    with uploads_lock():
+        item = gallery_store.get_item(item_id)
+
+        if item:
+            item = dict(item)
+            old_image = item.get('image')
+            if staged:
+                store_upload(*staged)
+                item['image'] = staged[1]
 
             # Update text fields
             item['title'] = request.form.get('title', item.get('title', ''))
@@ -597,27 +3653,24 @@ def update_gallery_item(item_id):
             item['negative_prompt'] = request.form.get('negative_prompt', item.get('negative_prompt', ''))
             item['updated_at'] = datetime.now().isoformat()
 
-            gallery['items'][i] = item
-            save_gallery(gallery)
+            gallery_store.update_item(item)
+            # The old image is only deleted when no other item still uses it
+            if old_image != item['image']:
+                release_upload(old_image)
             return jsonify({"success": True, "item": item})
 
+    if staged:
+        os.remove(staged[0])
     return jsonify({"success": False, "error": "Item not found"}), 404
 
 @app.route('/api/gallery/<item_id>', methods=['DELETE'])
 def delete_gallery_item(item_id):
-    """Delete a gallery item and its image"""
-    gallery = load_gallery()
-
-    for item in gallery['items']:
-        if item['id'] == item_id:
-            # Delete image file
-            image_path = os.path.join(app.config['UPLOAD_FOLDER'], item['image'])
-            if os.path.exists(image_path):
-                os.remove(image_path)
-            break
-
-    gallery['items'] = [item for item in gallery['items'] if item['id'] != item_id]
-    save_gallery(gallery)
+    """Delete a gallery item, and its image unless other items still use it"""
+    with uploads_lock():
+        item = gallery_store.delete_item(item_id)
+        if item:
+            release_upload(item.get('image'))
+
     return jsonify({"success": True})
 
 
@@ -698,38 +3751,203 @@ CATEGORY_KEYWORDS = {
     'negative': ['bad', 'worst', 'low', 'error', 'wrong', 'ugly', 'deformed', 'blurry', 'missing', 'extra', 'watermark'],
 }
 
-
-def translate_text(text, source_lang='auto', target_lang='zh'):
-    """Translate text using Google Translate free API"""
+# Reverse lookup for zh -> en; the first English tag wins for shared translations
+TAG_TRANSLATIONS_ZH = {}
+for _en, _zh in TAG_TRANSLATIONS.items():
+    TAG_TRANSLATIONS_ZH.setdefault(_zh, _en)
+
+
+class TranslationMemory:
+    """Persistent en <-> zh translation memory (data/translations.db).
+
+    Every recorded pair is stored in both directions, keyed by the normalized
+    source text, so a lookup is a single primary-key probe however large the
+    memory grows. A pair never overwrites one from a more trusted origin:
+    manual edits beat LLM translations, which beat Google Translate.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS translations (
+            source_lang TEXT NOT NULL,
+            target_lang TEXT NOT NULL,
+            source_key TEXT NOT NULL,
+            target TEXT NOT NULL,
+            origin TEXT NOT NULL,
+            priority INTEGER NOT NULL,
+            updated_at TEXT NOT NULL,
+            PRIMARY KEY (source_lang, target_lang, source_key)
+        ) WITHOUT ROWID;
+    """
+
+    PRIORITIES = {'google': 1, 'llm': 2, 'manual': 3}
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+
+    def _conn(self):
+        return thread_local_sqlite(self._local, self.path, self.SCHEMA)
+
+    @staticmethod
+    def normalize(text):
+        return ' '.join(text.split()).lower()
+
+    def lookup(self, text, source_lang, target_lang):
+        """Remembered translation of ``text``, or None"""
+        row = self._conn().execute(
+            "SELECT target FROM translations WHERE source_lang = ? AND target_lang = ? AND source_key = ?",
+            (source_lang, target_lang, self.normalize(text))
+        ).fetchone()
+        return row[0] if row else None
+
+    def record(self, name_en, name_zh, origin):
+        """Remember an en/zh pair in both directions"""
+        self.record_many([(name_en, name_zh)], origin)
+
+    def record_many(self, pairs, origin):
+        priority = self.PRIORITIES[origin]
+        now = datetime.now().isoformat()
+        rows = []
+        for name_en, name_zh in pairs:
+            name_en, name_zh = (name_en or '').strip(), (name_zh or '').strip()
+            if not name_en or not name_zh or self.normalize(name_en) == self.normalize(name_zh):
+                continue
+            rows.append(('en', 'zh', self.normalize(name_en), name_zh, origin, priority, now))
+            rows.append(('zh', 'en', self.normalize(name_zh), name_en, origin, priority, now))
+        if not rows:
+            return
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.executemany(
+                "INSERT INTO translations (source_lang, target_lang, source_key, target, origin, priority, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (source_lang, target_lang, source_key) DO UPDATE SET "
+                "target = excluded.target, origin = excluded.origin, priority = excluded.priority, "
+                "updated_at = excluded.updated_at WHERE excluded.priority >= translations.priority",
+                rows
+            )
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+
+translation_memory = TranslationMemory(TRANSLATION_MEMORY_FILE)
+
+def remember_tag_translations(tags, origin='manual'):
+    """Feed tags' en/zh names into the translation memory; failures only cost a future lookup"""
     try:
-        # Check if we have a cached translation
-        text_lower = text.lower().strip()
-        if target_lang == 'zh' and text_lower in TAG_TRANSLATIONS:
-            return TAG_TRANSLATIONS[text_lower]
-
-        # Use Google Translate free API
-        url = "https://translate.googleapis.com/translate_a/single"
-        params = {
-            'client': 'gtx',
-            'sl': source_lang,
-            'tl': target_lang,
-            'dt': 't',
-            'q': text
-        }
+        translation_memory.record_many([(tag.get('name_en'), tag.get('name_zh')) for tag in tags], origin)
+    except sqlite3.Error as e:
+        logger.error("Translation memory error", extra=log_fields(error=str(e)))
+
+
+TRANSLATE_TIMEOUT = 5         # seconds per Google Translate request
+TRANSLATE_DEADLINE = 20       # seconds for all translations of one parse request
+TRANSLATE_WORKERS = 8
+# Overridable to send translations to a local stand-in (tools/fake_llm_server.py)
+TRANSLATE_URL = os.environ.get('TRANSLATE_URL') or "https://translate.googleapis.com/translate_a/single"
+
+_translate_pool = ThreadPoolExecutor(max_workers=TRANSLATE_WORKERS, thread_name_prefix='translate')
+
+def lookup_translation(text, source_lang, target_lang):
+    """Translation from the translation memory or the built-in dictionary, or None"""
+    # Remembered translations come first: they include manual edits
+    remembered = translation_memory.lookup(text, source_lang, target_lang)
+    TRANSLATION_LOOKUPS.inc(result='hit' if remembered else 'miss')
+    if remembered:
+        return remembered
+    text_lower = text.lower().strip()
+    if source_lang == 'en' and target_lang == 'zh' and text_lower in TAG_TRANSLATIONS:
+        return TAG_TRANSLATIONS[text_lower]
+    if source_lang == 'zh' and target_lang == 'en' and text.strip() in TAG_TRANSLATIONS_ZH:
+        return TAG_TRANSLATIONS_ZH[text.strip()]
+    return None
 
-        full_url = f"{url}?{urllib.parse.urlencode(params)}"
-        req = urllib.request.Request(full_url, headers={'User-Agent': 'Mozilla/5.0'})
+def fetch_translation(text, source_lang, target_lang, timeout=TRANSLATE_TIMEOUT):
+    """Translate with the Google Translate free API and remember the result.
+    Returns None when there is no translation; network errors propagate."""
+    params = {
+        'client': 'gtx',
+        'sl': source_lang,
+        'tl': target_lang,
+        'dt': 't',
+        'q': text
+    }
 
-        with urllib.request.urlopen(req, timeout=5) as response:
+    full_url = f"{TRANSLATE_URL}?{urllib.parse.urlencode(params)}"
+    req = urllib.request.Request(full_url, headers={'User-Agent': 'Mozilla/5.0'})
+
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as response:
             result = json.loads(response.read().decode('utf-8'))
-            if result and result[0]:
-                translated = ''.join([item[0] for item in result[0] if item[0]])
-                return translated
+    except Exception:
+        TRANSLATION_REQUESTS.inc(outcome='error')
+        raise
+    finally:
+        TRANSLATION_DURATION.observe(time.perf_counter() - start)
+    TRANSLATION_REQUESTS.inc(outcome='success')
+    if not result or not result[0]:
+        return None
+    translated = ''.join([item[0] for item in result[0] if item[0]])
+    if not translated.strip():
+        return None
+    if {source_lang, target_lang} == {'en', 'zh'}:
+        pair = (text, translated) if source_lang == 'en' else (translated, text)
+        translation_memory.record(*pair, origin='google')
+    return translated
+
+@profiled_span('translate_text')
+def translate_text(text, source_lang='auto', target_lang='zh'):
+    """Translate text, preferring the translation memory and the built-in dictionary
+    over the Google Translate free API; network results are remembered"""
+    try:
+        if source_lang == 'auto':
+            source_lang = detect_language(text)
+        translated = lookup_translation(text, source_lang, target_lang) or \
+            fetch_translation(text, source_lang, target_lang)
+        if translated:
+            return translated
     except Exception as e:
-        print(f"Translation error: {e}")
+        logger.warning("Translation error", extra=log_fields(error=str(e)))
 
     return text  # Return original if translation fails
 
+@profiled_span('translate_many')
+def translate_many(triples, deadline=TRANSLATE_DEADLINE):
+    """Translate (text, source_lang, target_lang) triples concurrently.
+
+    Duplicates are translated once and local lookups never touch the network.
+    The rest go through a bounded thread pool; each request has its own
+    timeout, and whatever has not finished by ``deadline`` is given up on.
+    Returns {triple: translation or None when it failed or ran out of time}.
+    """
+    results = {}
+    pending = {}
+    for key in dict.fromkeys(triples):
+        try:
+            results[key] = lookup_translation(*key)
+        except sqlite3.Error as e:
+            logger.error("Translation memory error", extra=log_fields(error=str(e)))
+            results[key] = None
+        if results[key] is None:
+            pending[_translate_pool.submit(fetch_translation, *key)] = key
+
+    if pending:
+        done, not_done = wait(pending, timeout=deadline)
+        for future in done:
+            try:
+                results[pending[future]] = future.result()
+            except Exception as e:
+                logger.warning("Translation error", extra=log_fields(text=pending[future][0], error=str(e)))
+        for future in not_done:
+            future.cancel()
+        if not_done:
+            logger.warning("Translation deadline reached",
+                           extra=log_fields(untranslated=len(not_done), pending=len(pending)))
+    return results
+
 
 def detect_language(text):
     """Simple language detection - check if text contains Chinese characters"""
@@ -739,46 +3957,333 @@ def detect_language(text):
     return 'en'
 
 
-def parse_tags_input(text):
-    """Parse input text into individual tags, supporting various formats"""
-    # Remove common prompt syntax: (tag:weight), {tag}, [tag], <lora:xxx>
-    text = re.sub(r'<[^>]+>', '', text)  # Remove <lora:xxx> etc.
-    text = re.sub(r'\([^)]*:[\d.]+\)', lambda m: m.group(0)[1:m.group(0).rfind(':')], text)  # (tag:1.2) -> tag
-    text = re.sub(r'[{}\[\]]', '', text)  # Remove {} and []
-    text = re.sub(r':[\d.]+', '', text)  # Remove remaining :weight
-
-    # Split by comma, newline, or semicolon
-    tags = re.split(r'[,;\n]+', text)
-
-    # Clean and filter tags
-    result = []
-    for tag in tags:
-        tag = tag.strip()
-        # Skip empty or very short tags
-        if len(tag) >= 2:
-            result.append(tag)
+class PromptTokenizer:
+    r"""Single-pass, incremental tokenizer for prompt text.
+
+    Understands Stable Diffusion emphasis (``(tag)`` x1.1, ``[tag]`` /1.1,
+    ``(tag:1.3)``), NovelAI emphasis (``{tag}`` x1.05, and ``[tag]`` /1.05
+    with ``syntax='nai'``) and plain comma separated lists. Brackets nest and
+    their weights multiply; ``\(`` and ``\)`` are literal parentheses. A colon
+    is only read as a weight right before ``)`` or, with a decimal number, at
+    the end of a bare tag (``tag:1.2``), so ``artist:name`` and ``16:9`` stay
+    intact. Extra network tokens such as ``<lora:name:0.8>`` are not tags;
+    they are collected in ``networks``.
+
+    ``feed`` accepts text in chunks of any size and returns the
+    (tag, weight) pairs completed so far; ``close`` returns the rest. Only
+    the text after the last separator is held back between chunks, plus the
+    tags inside brackets that are still open.
+    """
+    # Text between separators; an escaped separator does not end a piece
+    PIECE = re.compile(r'(?:\\[^\n]|[^\\,;\n])+|\\')
+    SEPARATOR = re.compile(r'[,;\n]+')
+    # A whole piece that is one tag in balanced brackets, like "((tag))" or "(tag:1.2)"
+    SIMPLE = re.compile(r'\s*(?P<open>[(\[{]*)(?P<tag>[^\\<:()\[\]{}]*)'
+                        r'(?::\s*(?P<weight>[+-]?(?:\d+\.?\d*|\.\d+))\s*)?(?P<close>[)\]}]*)\s*')
+    MIRROR = str.maketrans('([{', ')]}')
+    # Tokens within a piece
+    TOKEN = re.compile(r"""
+        (?P<escape>\\.)
+      | (?P<network><[^<>]*>)
+      | (?P<weight>:\s*(?P<value>[+-]?(?:\d+\.?\d*|\.\d+))\s*(?=\)))
+      | (?P<bare_weight>:\s*(?P<bare_value>\d*\.\d+)\s*$)
+      | (?P<open>[(\[{])
+      | (?P<close>[)\]}])
+      | (?P<text>[^\\<()\[\]{}:]+|[\\<:])
+    """, re.VERBOSE)
+    SEPARATORS = ',;\n'
+    CLOSERS = {'(': ')', '[': ']', '{': '}'}
+    SD_EMPHASIS = 1.1
+    NAI_EMPHASIS = 1.05
+
+    def __init__(self, syntax='sd', min_length=2):
+        self.factors = {'(': self.SD_EMPHASIS, '{': self.NAI_EMPHASIS,
+                        '[': 1 / (self.NAI_EMPHASIS if syntax == 'nai' else self.SD_EMPHASIS)}
+        self.min_length = min_length
+        self.buffer = ''
+        self.stack = []    # open brackets as [closing char, weight factor]; (tag:1.3) replaces the factor
+        self.parts = []    # text of the tag being read
+        self.frames = ()   # the brackets it was started in
+        self.pending = []  # (tag, frames) waiting for their brackets to close
+        self.networks = []
+
+    def feed(self, chunk):
+        """Tokenize up to the last separator of the text received so far; returns finished (tag, weight) pairs"""
+        self.buffer += chunk
+        cut = len(self.buffer)
+        while True:
+            cut = max(self.buffer.rfind(sep, 0, cut) for sep in self.SEPARATORS)
+            if cut <= 0 or self.buffer[cut - 1] != '\\':
+                break
+        if cut < 0:
+            return []
+        text, self.buffer = self.buffer[:cut + 1], self.buffer[cut + 1:]
+        return self._scan(text)
+
+    def close(self):
+        """Tokenize whatever is left; brackets never closed still count"""
+        text, self.buffer = self.buffer, ''
+        tags = self._scan(text)
+        self._end_tag()
+        self.stack = []
+        return tags + self._finish()
+
+    def _scan(self, text):
+        done = []
+        stack = self.stack
+        pieces = self.PIECE.findall(text) if '\\' in text else self.SEPARATOR.split(text)
+        simple_match, min_length = self.SIMPLE.fullmatch, self.min_length
+        for piece in pieces:
+            simple = simple_match(piece)
+            if simple:
+                # Most pieces are one tag and skip the token loop
+                opening, tag, value, closing = simple.groups()
+                weight = self._simple_weight(opening, value, closing) if opening or closing or value else 1.0
+                if weight is not None:
+                    tag = tag.strip()
+                    if len(tag) >= min_length:
+                        if stack:
+                            self.pending.append((tag, tuple(stack) + ((None, weight),)))
+                        else:
+                            done.append((tag, round(weight, 3)))
+                    continue
+
+            for match in self.TOKEN.finditer(piece):
+                kind = match.lastgroup
+                if kind == 'text' or kind == 'escape':
+                    if not self.parts:
+                        self.frames = tuple(stack)
+                    self.parts.append(match.group() if kind == 'text' else match.group()[1])
+                    continue
+
+                self._end_tag()
+                if kind == 'open':
+                    char = match.group()
+                    stack.append([self.CLOSERS[char], self.factors[char]])
+                elif kind == 'close':
+                    if stack and stack[-1][0] == match.group():
+                        stack.pop()
+                elif kind == 'weight':
+                    if stack and stack[-1][0] == ')':
+                        stack[-1][1] = float(match.group('value'))
+                elif kind == 'bare_weight' and self.pending:
+                    tag, frames = self.pending[-1]
+                    self.pending[-1] = (tag, frames + ((None, float(match.group('bare_value'))),))
+                elif kind == 'network':
+                    self.networks.append(match.group())
+            self._end_tag()
+            if not stack and self.pending:
+                done.extend(self._finish())
+        return done
+
+    def _simple_weight(self, opening, value, closing):
+        """Weight of a SIMPLE piece, or None when its brackets do not pair up or its colon is no weight"""
+        if closing != opening[::-1].translate(self.MIRROR):
+            return None
+        if value is not None and opening[-1:] != '(' and (opening or '.' not in value):
+            return None
+        weight = 1.0
+        for char in opening:
+            weight *= self.factors[char]
+        if value is not None:
+            weight = weight / self.factors['('] * float(value) if opening else float(value)
+        return weight
+
+    def _end_tag(self):
+        if self.parts:
+            tag = ''.join(self.parts).strip()
+            self.parts = []
+            if len(tag) >= self.min_length:
+                self.pending.append((tag, self.frames))
+
+    def _finish(self):
+        tags = []
+        for tag, frames in self.pending:
+            weight = 1.0
+            for _, factor in frames:
+                weight *= factor
+            tags.append((tag, round(weight, 3)))
+        self.pending = []
+        return tags
+
+
+def tokenize_prompt(text, syntax=None):
+    """(tag, weight) pairs of a whole prompt; NovelAI syntax is assumed when it uses braces"""
+    tokenizer = PromptTokenizer(syntax or ('nai' if '{' in text else 'sd'))
+    return tokenizer.feed(text) + tokenizer.close()
 
-    return result
 
+def parse_tags_input(text):
+    """Parse input text into individual tags, supporting various formats"""
+    return [tag for tag, _ in tokenize_prompt(text)]
+
+
+class KeywordAutomaton:
+    """Aho-Corasick automaton over a fixed set of keywords.
+
+    ``search`` finds every occurrence of every keyword, overlapping ones
+    included, in one pass over the text. Transitions are precomputed for all
+    characters that occur in a keyword, so each character of the text costs
+    one dict lookup; any other character leads back to the root.
+    """
+
+    def __init__(self, keywords):
+        goto = [{}]
+        outputs = [[]]
+        for keyword in keywords:
+            state = 0
+            for char in keyword:
+                if char not in goto[state]:
+                    goto.append({})
+                    outputs.append([])
+                    goto[state][char] = len(goto) - 1
+                state = goto[state][char]
+            outputs[state].append(keyword)
+
+        # Breadth-first, so a state's fallback is complete before its children need it
+        alphabet = {char for keyword in keywords for char in keyword}
+        fail = [0] * len(goto)
+        delta = [dict(goto[0])] + [None] * (len(goto) - 1)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            outputs[state] = outputs[state] + outputs[fail[state]]
+            transitions = {}
+            for char in alphabet:
+                child = goto[state].get(char)
+                if child is None:
+                    target = delta[fail[state]].get(char)
+                    if target:
+                        transitions[char] = target
+                else:
+                    fail[child] = delta[fail[state]].get(char, 0) if state else 0
+                    transitions[char] = child
+                    queue.append(child)
+            delta[state] = transitions
+        self.delta = delta
+        self.outputs = [tuple(keywords) for keywords in outputs]
+
+    def search(self, text):
+        """(end index, keyword) for every keyword occurrence in ``text``"""
+        delta, outputs = self.delta, self.outputs
+        found = []
+        state = 0
+        for end, char in enumerate(text, 1):
+            state = delta[state].get(char, 0)
+            if outputs[state]:
+                found.extend((end, keyword) for keyword in outputs[state])
+        return found
+
+
+class CategoryMatcher:
+    """Keyword scoring of tags against one list of categories.
+
+    A category gets the CATEGORY_KEYWORDS groups whose key appears in its
+    English or Chinese name. Every keyword found in a tag adds its
+    length to the categories it belongs to, doubled when it is a whole word,
+    so "dress" beats the "res" inside it. The best score wins; ties go to the
+    earlier category, and tags without any keyword get the first category.
+
+    Single-word keywords are found with a KeywordAutomaton, run once per
+    distinct word of the tags seen so far; tags share most of their words,
+    so matching a tag is mostly a dict lookup per word. Keywords with spaces
+    or punctuation are searched in the whole tag.
+    """
+    WORD = re.compile(r'[^\W_]+')
+    WORD_CACHE_SIZE = 100000
+
+    def __init__(self, categories):
+        self.ids = [cat['id'] for cat in categories]
+        self.keyword_categories = {}
+        for index, cat in enumerate(categories):
+            name_en = cat.get('name_en', '').lower().strip()
+            name_zh = cat.get('name_zh', '')
+            keywords = set()
+            for keyword_cat, group in CATEGORY_KEYWORDS.items():
+                if keyword_cat in name_en or keyword_cat in name_zh:
+                    keywords.update(group)
+            for keyword in keywords:
+                self.keyword_categories.setdefault(keyword, []).append(index)
+        words = [keyword for keyword in self.keyword_categories if self.WORD.fullmatch(keyword)]
+        self.phrases = [keyword for keyword in self.keyword_categories if not self.WORD.fullmatch(keyword)]
+        self.phrase_pattern = re.compile('|'.join(map(re.escape, self.phrases))) if self.phrases else None
+        self.automaton = KeywordAutomaton(words)
+        self.word_scores = {}
+
+    def _add(self, scores, keyword, whole_word):
+        score = len(keyword) * 2 if whole_word else len(keyword)
+        for index in self.keyword_categories[keyword]:
+            scores[index] = scores.get(index, 0) + score
+
+    def _score_word(self, word):
+        """(category index, score) pairs of one word, remembered for the next tags"""
+        scores = {}
+        for _, keyword in self.automaton.search(word):
+            self._add(scores, keyword, len(keyword) == len(word))
+        if len(self.word_scores) >= self.WORD_CACHE_SIZE:
+            self.word_scores.clear()
+        self.word_scores[word] = result = tuple(scores.items())
+        return result
+
+    def _score_phrases(self, text, scores):
+        for phrase in self.phrases:
+            start = text.find(phrase)
+            while start != -1:
+                end = start + len(phrase)
+                self._add(scores, phrase, (start == 0 or not text[start - 1].isalnum()) and
+                          (end == len(text) or not text[end].isalnum()))
+                start = text.find(phrase, start + 1)
+
+    def match(self, tag_text):
+        """Id of the best matching category, or None when there are no categories"""
+        if not self.ids:
+            return None
+        text = tag_text.lower()
+        scores = {}
+        word_scores = self.word_scores
+        for word in self.WORD.findall(text):
+            word_score = word_scores.get(word)
+            if word_score is None:
+                word_score = self._score_word(word)
+            for index, score in word_score:
+                scores[index] = scores.get(index, 0) + score
+        if self.phrase_pattern is not None and self.phrase_pattern.search(text):
+            self._score_phrases(text, scores)
+        if len(scores) < 2:
+            return self.ids[next(iter(scores), 0)]
+        return self.ids[min(scores, key=lambda index: (-scores[index], index))]
+
+
+CATEGORY_MATCHER_CACHE_SIZE = 8
+
+_category_matchers = OrderedDict()
+_category_matchers_lock = threading.Lock()
+
+def category_matcher(categories):
+    """The compiled CategoryMatcher for a category list, shared while the categories' ids and names stay the same"""
+    key = tuple([(cat['id'], cat.get('name_en', ''), cat.get('name_zh', '')) for cat in categories])
+    with _category_matchers_lock:
+        matcher = _category_matchers.get(key)
+        if matcher is not None:
+            _category_matchers.move_to_end(key)
+            return matcher
+    matcher = CategoryMatcher(categories)
+    with _category_matchers_lock:
+        _category_matchers[key] = matcher
+        while len(_category_matchers) > CATEGORY_MATCHER_CACHE_SIZE:
+            _category_matchers.popitem(last=False)
+    return matcher
 
 def match_category(tag_text, categories):
-    """Match a tag to the most appropriate category based on keywords"""
-    tag_lower = tag_text.lower()
-
-    # First, try to match by category name keywords
-    for cat in categories:
-        cat_name_lower = cat.get('name_en', '').lower()
-        cat_name_zh = cat.get('name_zh', '')
-
-        # Check CATEGORY_KEYWORDS for this category
-        for keyword_cat, keywords in CATEGORY_KEYWORDS.items():
-            if keyword_cat.lower() in cat_name_lower or keyword_cat in cat_name_zh:
-                for keyword in keywords:
-                    if keyword in tag_lower:
-                        return cat['id']
+    """Match a tag to the most appropriate category based on keywords.
+    Looks the matcher up by the categories' ids and names on every call; for
+    many tags use match_categories or hold on to one matcher"""
+    return category_matcher(categories).match(tag_text)
 
-    # If no match found, return the first category as default, or None
-    return categories[0]['id'] if categories else None
+def match_categories(tag_texts, categories):
+    """match_category for many tags, looking up the compiled matcher once"""
+    matcher = category_matcher(categories)
+    return [matcher.match(tag_text) for tag_text in tag_texts]
 
 
 @app.route('/api/tags/parse', methods=['POST'])
@@ -790,42 +4295,62 @@ def parse_tags():
     if not input_text.strip():
         return jsonify({"success": False, "error": "No input text provided"}), 400
 
-    # Load current data for category matching
-    db_data = load_data()
-    categories = db_data.get('categories', [])
-    existing_tags = db_data.get('tags', [])
+    # Parse input text into individual tags and the weights they were written with
+    prompt_tags = tokenize_prompt(input_text)
+    parsed_tags = [tag for tag, _ in prompt_tags]
+    weights = [weight for _, weight in prompt_tags]
 
-    # Parse input text into individual tags
-    parsed_tags = parse_tags_input(input_text)
+    # The LLM path can take up to a minute, so it runs as a background job
+    if is_llm_configured() and tag_store.get_categories():
+        return submit_llm_job('parse', parse_tags_job, parsed_tags, llm_cache_allowed('parse', data), weights)
+
+    body, status = parse_tags_job(parsed_tags, weights=weights)
+    return jsonify(body), status
+
+def parse_tags_job(parsed_tags, use_cache=True, weights=None):
+    """Translate parsed tags and match them to categories; returns (response body, status).
+    Results come back one per tag, in order; ``weights`` lists the weight each tag
+    had in the prompt (default 1.0)"""
+    # Load current categories for matching; existing tags are looked up by name
+    categories = tag_store.get_categories()
+    matcher = tag_store.category_matcher()
 
     results = []
     use_llm = is_llm_configured()
+    method = 'traditional'
 
     # Try LLM-based translation and matching first
     if use_llm and categories:
-        print("Using LLM for translation and category matching...")
-        llm_results = llm_translate_and_match(parsed_tags, categories)
+        logger.info("Using LLM for translation and category matching", extra=log_fields(tags=len(parsed_tags)))
+        llm_results = llm_translate_and_match(parsed_tags, categories, use_cache=use_cache)
 
         if llm_results:
+            method = 'llm'
+            # Tags of chunks the LLM kept failing on are translated the traditional way, in place
+            failed = [llm_tag['original'] for llm_tag in llm_results if llm_tag.get('failed')]
+            if failed:
+                logger.info("LLM failed for some tags, translating them traditionally", extra=log_fields(tags=len(failed)))
+            fallback = iter(traditional_parse_results(failed, matcher))
+
             # Process LLM results
             for llm_tag in llm_results:
+                if llm_tag.get('failed'):
+                    results.append(next(fallback))
+                    continue
+
                 name_en = llm_tag.get('name_en', llm_tag.get('original', ''))
                 name_zh = llm_tag.get('name_zh', '')
                 category_id = llm_tag.get('category_id')
 
                 # Validate category_id exists
-                category = next((c for c in categories if c['id'] == category_id), None)
+                category = tag_store.get_category(category_id)
                 if not category and categories:
                     # Fallback to first category if LLM returned invalid ID
                     category = categories[0]
                     category_id = category['id']
 
                 # Check if tag already exists
-                existing = None
-                for et in existing_tags:
-                    if et['name_en'].lower() == name_en.lower() or et['name_zh'] == name_zh:
-                        existing = et
-                        break
+                existing = tag_store.find_tag(name_en=name_en, name_zh=name_zh)
 
                 results.append({
                     'original': llm_tag.get('original', name_en),
@@ -836,44 +4361,59 @@ def parse_tags():
                     'category_color': category['color'] if category else '#6366f1',
                     'exists': existing is not None,
                     'existing_id': existing['id'] if existing else None,
+                    'existing_category_id': existing.get('category_id') if existing else None,
                     'weight': 1.0,
-                    'translation_source': 'llm'
+                    'translation_source': 'llm',
+                    'translated': True
                 })
 
-            return jsonify({
-                "success": True,
-                "tags": results,
-                "total": len(results),
-                "new_count": len([r for r in results if not r['exists']]),
-                "method": "llm"
-            })
+            remember_tag_translations([r for r in results if r['translation_source'] == 'llm'], origin='llm')
         else:
-            print("LLM failed, falling back to traditional translation...")
+            logger.info("LLM failed, falling back to traditional translation")
+
+    if method == 'traditional':
+        # Fallback: Traditional translation and keyword matching
+        logger.info("Using traditional translation and keyword matching", extra=log_fields(tags=len(parsed_tags)))
+        results = traditional_parse_results(parsed_tags, matcher)
+
+    if weights:
+        for result, weight in zip(results, weights):
+            result['weight'] = weight
 
-    # Fallback: Traditional translation and keyword matching
-    print("Using traditional translation and keyword matching...")
-    for tag_text in parsed_tags:
-        # Detect language
-        lang = detect_language(tag_text)
+    return {
+        "success": True,
+        "tags": results,
+        "total": len(results),
+        "new_count": len([r for r in results if not r['exists']]),
+        "untranslated_count": len([r for r in results if not r['translated']]),
+        "method": method
+    }, 200
+
+def traditional_parse_results(parsed_tags, matcher):
+    """Translate tags with the translation memory / Google Translate and match
+    categories by keyword with ``matcher``; one result per input tag, in order"""
+    results = []
+    # Translate every tag up front, concurrently and within one overall deadline
+    directions = [('zh', 'en') if detect_language(tag_text) == 'zh' else ('en', 'zh') for tag_text in parsed_tags]
+    translations = translate_many([(tag_text, *direction) for tag_text, direction in zip(parsed_tags, directions)])
 
-        # Translate if needed
+    for tag_text, (lang, target_lang) in zip(parsed_tags, directions):
+        translated = translations[(tag_text, lang, target_lang)]
+
+        # Keep the original text when there is no translation; the tag is flagged below
         if lang == 'zh':
             name_zh = tag_text
-            name_en = translate_text(tag_text, 'zh', 'en')
+            name_en = translated or tag_text
         else:
             name_en = tag_text
-            name_zh = translate_text(tag_text, 'en', 'zh')
+            name_zh = translated or tag_text
 
         # Check if tag already exists
-        existing = None
-        for et in existing_tags:
-            if et['name_en'].lower() == name_en.lower() or et['name_zh'] == name_zh:
-                existing = et
-                break
+        existing = tag_store.find_tag(name_en=name_en, name_zh=name_zh)
 
         # Match category
-        category_id = match_category(name_en, categories) if categories else None
-        category = next((c for c in categories if c['id'] == category_id), None)
+        category_id = matcher.match(name_en)
+        category = tag_store.get_category(category_id) if category_id else None
 
         results.append({
             'original': tag_text,
@@ -884,18 +4424,12 @@ def parse_tags():
             'category_color': category['color'] if category else '#6366f1',
             'exists': existing is not None,
             'existing_id': existing['id'] if existing else None,
+            'existing_category_id': existing.get('category_id') if existing else None,
             'weight': 1.0,
-            'translation_source': 'traditional'
+            'translation_source': 'traditional',
+            'translated': translated is not None
         })
-
-    return jsonify({
-        "success": True,
-        "tags": results,
-        "total": len(results),
-        "new_count": len([r for r in results if not r['exists']]),
-        "method": "traditional"
-    })
-
+    return results
 
 @app.route('/api/tags/batch', methods=['POST'])
 def batch_import_tags():
@@ -906,7 +4440,6 @@ def batch_import_tags():
     if not tags_to_import:
         return jsonify({"success": False, "error": "No tags to import"}), 400
 
-    db_data = load_data()
     imported = []
     skipped = []
 
@@ -922,7 +4455,7 @@ def batch_import_tags():
             continue
 
         new_tag = {
-            'id': datetime.now().strftime('%Y%m%d%H%M%S%f'),
+            'id': new_id(),
             'name_en': tag_data['name_en'],
             'name_zh': tag_data['name_zh'],
             'category_id': tag_data['category_id'],
@@ -930,10 +4463,11 @@ def batch_import_tags():
             'created_at': datetime.now().isoformat()
         }
 
-        db_data['tags'].append(new_tag)
         imported.append(new_tag)
 
-    save_data(db_data)
+    if imported:
+        tag_store.add_tags(imported)
+        remember_tag_translations(imported)
 
     return jsonify({
         "success": True,
@@ -948,7 +4482,7 @@ def batch_import_tags():
 @app.route('/api/config', methods=['GET'])
 def get_config():
     """Get current configuration (with API key masked)"""
-    config = load_config()
+    config = copy.deepcopy(load_config())
     # Mask API key for security
     if config.get('llm', {}).get('api_key'):
         api_key = config['llm']['api_key']
@@ -962,29 +4496,31 @@ def get_config():
         config['llm']['has_api_key'] = False
     # Don't send actual API key
     config['llm'].pop('api_key', None)
+    for provider in config['llm'].get('providers', []):
+        provider['has_api_key'] = bool(provider.pop('api_key', ''))
     return jsonify(config)
 
 @app.route('/api/config', methods=['PUT'])
 def update_config():
     """Update configuration"""
     data = request.json
-    config = load_config()
-
-    if 'llm' in data:
-        llm_config = data['llm']
-        if 'enabled' in llm_config:
-            config['llm']['enabled'] = llm_config['enabled']
-        if 'provider' in llm_config:
-            config['llm']['provider'] = llm_config['provider']
-        if 'api_key' in llm_config and llm_config['api_key']:
-            # Only update API key if a new one is provided
-            config['llm']['api_key'] = llm_config['api_key']
-        if 'base_url' in llm_config:
-            config['llm']['base_url'] = llm_config['base_url'].rstrip('/')
-        if 'model' in llm_config:
-            config['llm']['model'] = llm_config['model']
-
-    save_config(config)
+
+    def apply(config):
+        if 'llm' in data:
+            llm_config = data['llm']
+            if 'enabled' in llm_config:
+                config['llm']['enabled'] = llm_config['enabled']
+            if 'provider' in llm_config:
+                config['llm']['provider'] = llm_config['provider']
+            if 'api_key' in llm_config and llm_config['api_key']:
+                # Only update API key if a new one is provided
+                config['llm']['api_key'] = llm_config['api_key']
+            if 'base_url' in llm_config:
+                config['llm']['base_url'] = llm_config['base_url'].rstrip('/')
+            if 'model' in llm_config:
+                config['llm']['model'] = llm_config['model']
+
+    config_store.update(apply)
     return jsonify({"success": True})
 
 @app.route('/api/config/test-llm', methods=['POST'])
@@ -1015,7 +4551,8 @@ def test_llm_connection():
         {"role": "user", "content": "Say 'OK' if you can receive this message."}
     ]
 
-    result = call_llm_api(messages, test_config)
+    # Always a real round trip: this checks the connection
+    result = call_llm_api(messages, test_config, use_cache=False)
 
     if result and result.get('success'):
         content = result.get('content', '')[:100]
@@ -1025,6 +4562,96 @@ def test_llm_connection():
         return jsonify({"success": False, "error": error_msg}), 400
 
 
+@metrics.collect
+def collect_llm_metrics():
+    """LLM cache counters and provider circuit breakers, read at scrape time"""
+    samples = []
+    if llm_cache is not None:
+        stats = llm_cache.info()
+        for result, key in (('memory_hit', 'memory_hits'), ('disk_hit', 'disk_hits'), ('miss', 'misses'),
+                            ('bypassed', 'bypassed'), ('rejected', 'rejected')):
+            samples.append(('llm_cache_lookups_total', 'LLM response cache lookups', 'counter',
+                            {'result': result}, stats[key]))
+        samples.append(('llm_cache_entries', 'Entries in the LLM response cache', 'gauge', {}, stats['disk_entries']))
+        samples.append(('llm_cache_bytes', 'Size of the LLM response cache', 'gauge', {}, stats['disk_bytes']))
+    for name, health in llm_router.info().items():
+        samples.append(('llm_provider_circuit_open', 'Whether the circuit breaker of a provider is open', 'gauge',
+                        {'provider': name}, int(health['circuit'] != 'closed')))
+    return samples
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Prometheus metrics of this worker process"""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+
+@app.route('/api/profiling', methods=['GET'])
+def get_profiling():
+    """Armed routes and stored profiles, newest first"""
+    return jsonify({"success": True, "enabled": PROFILING_ENABLED, "armed": profiler.armed(),
+                    "profiles": profiler.list()})
+
+@app.route('/api/profiling', methods=['POST'])
+def arm_profiling():
+    """Profile the next ``count`` requests to ``route`` (a rule such as /api/tags/parse)"""
+    if not PROFILING_ENABLED:
+        return jsonify({"success": False, "error": "Profiling is disabled in config.json"}), 403
+    data = request.json or {}
+    route = data.get('route', '')
+    if route not in {rule.rule for rule in app.url_map.iter_rules()}:
+        return jsonify({"success": False, "error": f"Unknown route: {route}"}), 400
+    count = max(1, int(data.get('count', 1)))
+    profiler.arm(route, count, memory=bool(data.get('memory')))
+    return jsonify({"success": True, "armed": profiler.armed()})
+
+@app.route('/api/profiling', methods=['DELETE'])
+def disarm_profiling():
+    profiler.disarm()
+    return jsonify({"success": True})
+
+@app.route('/api/profiling/<profile_id>', methods=['GET'])
+def get_profile(profile_id):
+    """Summary of one profile: hottest functions, allocations and timing spans"""
+    summary = profiler.get(profile_id)
+    if summary is None:
+        return jsonify({"success": False, "error": "Profile not found"}), 404
+    return jsonify({"success": True, "profile": summary})
+
+@app.route('/api/profiling/<profile_id>/<any(pstats, tracemalloc):kind>', methods=['GET'])
+def download_profile(profile_id, kind):
+    """Raw results: load with pstats.Stats(path) or tracemalloc.Snapshot.load(path)"""
+    if profiler.path(profile_id, kind) is None:
+        return jsonify({"success": False, "error": "Profile not found"}), 404
+    return send_from_directory(PROFILE_FOLDER, f"{profile_id}.{kind}", as_attachment=True)
+
+
+@app.route('/api/llm-providers', methods=['GET'])
+def get_llm_provider_health():
+    """Routing policy and per-provider latency, error counts and circuit breaker state"""
+    llm = load_config().get('llm', {})
+    return jsonify({
+        "success": True,
+        "policy": llm.get('routing', {}).get('policy', 'failover'),
+        "providers": [llm_provider_name(provider) for provider in llm_providers(llm)],
+        "health": llm_router.info()
+    })
+
+
+@app.route('/api/llm-cache', methods=['GET'])
+def get_llm_cache_stats():
+    """Hit/miss counters and size of the LLM response cache"""
+    if llm_cache is None:
+        return jsonify({"success": True, "enabled": False})
+    return jsonify({"success": True, "enabled": True, "stats": llm_cache.info()})
+
+@app.route('/api/llm-cache', methods=['DELETE'])
+def clear_llm_cache():
+    """Drop every cached LLM response"""
+    if llm_cache is not None:
+        llm_cache.clear()
+    return jsonify({"success": True})
+
+
 @app.route('/api/tags/analyze-relevance', methods=['POST'])
 def analyze_tag_relevance():
     """Analyze relevance of tags to a specific category using LLM"""
@@ -1038,6 +4665,11 @@ def analyze_tag_relevance():
     if not tags_list or not category:
         return jsonify({"success": False, "error": "缺少必要参数"}), 400
 
+    return submit_llm_job('analyze-relevance', analyze_tag_relevance_job, tags_list, category,
+                          llm_cache_allowed('analyze-relevance', data))
+
+def analyze_tag_relevance_job(tags_list, category, use_cache=True):
+    """Ask the LLM which tags belong to a category; returns (response body, status)"""
     # Build the prompt
     tags_text = "\n".join([f"- {tag['name_en']} ({tag.get('name_zh', '')})" for tag in tags_list])
 
@@ -1063,42 +4695,19 @@ If no tags are related to this category, return an empty array: []"""
         {"role": "user", "content": prompt}
     ]
 
-    result = call_llm_api(messages)
+    result = call_llm_api(messages, use_cache=use_cache, parse=parse_llm_json)
 
     if result and result.get('success'):
-        try:
-            # Parse the response
-            json_str = result['content'].strip()
-            # Handle markdown code blocks
-            if json_str.startswith('```'):
-                lines = json_str.split('\n')
-                json_lines = []
-                in_code = False
-                for line in lines:
-                    if line.startswith('```'):
-                        in_code = not in_code
-                        continue
-                    if in_code or not line.startswith('```'):
-                        json_lines.append(line)
-                json_str = '\n'.join(json_lines)
-
-            relevant_tags = json.loads(json_str)
-
-            if not isinstance(relevant_tags, list):
-                relevant_tags = []
-
-            return jsonify({
-                "success": True,
-                "relevant_tags": relevant_tags,
-                "category": category.get('name_en', '')
-            })
-        except json.JSONDecodeError as e:
-            print(f"Failed to parse LLM response: {e}")
-            print(f"Response was: {result.get('content', '')}")
-            return jsonify({"success": False, "error": "解析 AI 响应失败"}), 500
+        return {
+            "success": True,
+            "relevant_tags": result['parsed'],
+            "category": category.get('name_en', '')
+        }, 200
+    elif result and result.get('unparsable'):
+        return {"success": False, "error": "解析 AI 响应失败"}, 500
     else:
         error_msg = result.get('error', '分析失败') if result else '分析失败'
-        return jsonify({"success": False, "error": error_msg}), 500
+        return {"success": False, "error": error_msg}, 500
 
 
 @app.route('/api/tags/optimize-order', methods=['POST'])
@@ -1113,6 +4722,10 @@ def optimize_tag_order():
     if not tags_list:
         return jsonify({"success": False, "error": "没有标签需要优化"}), 400
 
+    return submit_llm_job('optimize-order', optimize_tag_order_job, tags_list, llm_cache_allowed('optimize-order', data))
+
+def optimize_tag_order_job(tags_list, use_cache=True):
+    """Ask the LLM to reorder tags; returns (response body, status)"""
     # Build the prompt
     tags_text = "\n".join([f"- {tag['name_en']} ({tag.get('name_zh', '')})" for tag in tags_list])
 
@@ -1139,41 +4752,18 @@ Response must be valid JSON array only, no explanation or other text."""
         {"role": "user", "content": prompt}
     ]
 
-    result = call_llm_api(messages)
+    result = call_llm_api(messages, use_cache=use_cache, parse=parse_llm_json)
 
     if result and result.get('success'):
-        try:
-            # Parse the response
-            json_str = result['content'].strip()
-            # Handle markdown code blocks
-            if json_str.startswith('```'):
-                lines = json_str.split('\n')
-                json_lines = []
-                in_code = False
-                for line in lines:
-                    if line.startswith('```'):
-                        in_code = not in_code
-                        continue
-                    if in_code or not line.startswith('```'):
-                        json_lines.append(line)
-                json_str = '\n'.join(json_lines)
-
-            optimized_tags = json.loads(json_str)
-
-            if not isinstance(optimized_tags, list):
-                return jsonify({"success": False, "error": "AI 返回格式错误"}), 500
-
-            return jsonify({
-                "success": True,
-                "optimized_tags": optimized_tags
-            })
-        except json.JSONDecodeError as e:
-            print(f"Failed to parse LLM response: {e}")
-            print(f"Response was: {result.get('content', '')}")
-            return jsonify({"success": False, "error": "解析 AI 响应失败"}), 500
+        return {
+            "success": True,
+            "optimized_tags": result['parsed']
+        }, 200
+    elif result and result.get('unparsable'):
+        return {"success": False, "error": "解析 AI 响应失败"}, 500
     else:
         error_msg = result.get('error', '优化失败') if result else '优化失败'
-        return jsonify({"success": False, "error": error_msg}), 500
+        return {"success": False, "error": error_msg}, 500
 
 
 @app.route('/api/tags/convert-to-flux', methods=['POST'])
@@ -1188,6 +4778,11 @@ def convert_to_flux_prompt():
     if not tags_list:
         return jsonify({"success": False, "error": "没有标签需要转换"}), 400
 
+    return submit_llm_job('convert-to-flux', convert_to_flux_prompt_job, tags_list,
+                          llm_cache_allowed('convert-to-flux', data), stream=True)
+
+def convert_to_flux_prompt_job(tags_list, use_cache=True, on_token=None):
+    """Ask the LLM for a natural language Flux prompt, streaming it to ``on_token``; returns (response body, status)"""
     # Build the prompt
     tags_text = "\n".join([f"- {tag['name_en']} ({tag.get('name_zh', '')})" for tag in tags_list])
 
@@ -1221,23 +4816,31 @@ Return ONLY the natural language prompt as plain text. Do not include any JSON f
         {"role": "user", "content": prompt}
     ]
 
-    result = call_llm_api(messages)
+    result = call_llm_api(messages, on_token=on_token, use_cache=use_cache, parse=parse_flux_reply)
 
     if result and result.get('success'):
-        natural_prompt = result['content'].strip()
-        # Remove any quotes if LLM added them
-        if natural_prompt.startswith('"') and natural_prompt.endswith('"'):
-            natural_prompt = natural_prompt[1:-1]
-        if natural_prompt.startswith("'") and natural_prompt.endswith("'"):
-            natural_prompt = natural_prompt[1:-1]
-
-        return jsonify({
+        return {
             "success": True,
-            "natural_prompt": natural_prompt
-        })
+            "natural_prompt": result['parsed']
+        }, 200
+    elif result and result.get('unparsable'):
+        return {"success": False, "error": "AI 返回了空的提示词"}, 500
     else:
         error_msg = result.get('error', '转换失败') if result else '转换失败'
-        return jsonify({"success": False, "error": error_msg}), 500
+        return {"success": False, "error": error_msg}, 500
+
+
+def parse_flux_reply(content):
+    """The plain text prompt, without quotes the LLM may have put around it"""
+    natural_prompt = content.strip()
+    # Remove any quotes if LLM added them
+    if natural_prompt.startswith('"') and natural_prompt.endswith('"'):
+        natural_prompt = natural_prompt[1:-1]
+    if natural_prompt.startswith("'") and natural_prompt.endswith("'"):
+        natural_prompt = natural_prompt[1:-1]
+    if not natural_prompt.strip():
+        raise ValueError("empty prompt")
+    return natural_prompt
 
 
 @app.route('/api/tags/wish', methods=['POST'])
@@ -1254,16 +4857,19 @@ def wish_tags():
     if not user_instruction.strip():
         return jsonify({"success": False, "error": "请输入您的指令"}), 400
 
-    # Load available tags from library for reference
-    db_data = load_data()
-    library_tags = db_data.get('tags', [])
-    categories = db_data.get('categories', [])
+    if mode == 'modify' and not current_tags:
+        return jsonify({"success": False, "error": "没有已选标签可以修改"}), 400
+
+    return submit_llm_job('wish', wish_tags_job, mode, user_instruction, current_tags,
+                          llm_cache_allowed('wish', data), stream=True)
+
+def wish_tags_job(mode, user_instruction, current_tags, use_cache=True, on_token=None):
+    """Ask the LLM to modify or generate a tag list, streaming it to ``on_token``; returns (response body, status)"""
+    # Load categories; library tags are looked up by name
+    categories = tag_store.get_categories()
 
     if mode == 'modify':
         # Modify existing selected tags based on user instruction
-        if not current_tags:
-            return jsonify({"success": False, "error": "没有已选标签可以修改"}), 400
-
         tags_text = ", ".join([tag['name_en'] for tag in current_tags])
 
         prompt = f"""You are an AI art prompt expert. The user has selected these tags:
@@ -1285,7 +4891,7 @@ Keep tags relevant to AI image generation. Be creative but practical."""
 
     else:  # mode == 'generate'
         # Generate new tags based on user instruction and tag library
-        library_examples = [tag['name_en'] for tag in library_tags[:30]]  # Sample of available tags
+        library_examples = [tag['name_en'] for tag in tag_store.list_tags(limit=30)]  # Sample of available tags
         examples_text = ", ".join(library_examples)
 
         prompt = f"""You are an AI art prompt expert. The user wants to generate a set of tags with this instruction:
@@ -1311,65 +4917,45 @@ Make sure tags are relevant to AI image generation and follow common prompt conv
         {"role": "user", "content": prompt}
     ]
 
-    result = call_llm_api(messages)
+    result = call_llm_api(messages, on_token=on_token, use_cache=use_cache, parse=parse_wish_reply)
 
     if result and result.get('success'):
-        try:
-            # Parse the response
-            json_str = result['content'].strip()
-            # Handle markdown code blocks
-            if json_str.startswith('```'):
-                lines = json_str.split('\n')
-                json_lines = []
-                in_code = False
-                for line in lines:
-                    if line.startswith('```'):
-                        in_code = not in_code
-                        continue
-                    if in_code or not line.startswith('```'):
-                        json_lines.append(line)
-                json_str = '\n'.join(json_lines)
-
-            tag_names = json.loads(json_str)
-
-            if not isinstance(tag_names, list):
-                return jsonify({"success": False, "error": "AI 返回格式错误"}), 500
-
-            # Match tags with library and prepare response
-            result_tags = []
-            for tag_name in tag_names:
-                # Find matching tag in library
-                matching_tag = None
-                for lib_tag in library_tags:
-                    if lib_tag['name_en'].lower() == tag_name.lower():
-                        matching_tag = lib_tag
-                        break
+        # Match tags with library and prepare response
+        result_tags = []
+        for tag_name in result['parsed']:
+            # Find matching tag in library
+            matching_tag = tag_store.find_tag(name_en=tag_name)
+
+            if matching_tag:
+                result_tags.append(matching_tag)
+            else:
+                # Create a temporary tag structure for new tags
+                result_tags.append({
+                    'id': f'temp_{tag_name}',
+                    'name_en': tag_name,
+                    'name_zh': tag_name,
+                    'category_id': categories[0]['id'] if categories else None,
+                    'weight': 1.0,
+                    'is_new': True
+                })
 
-                if matching_tag:
-                    result_tags.append(matching_tag)
-                else:
-                    # Create a temporary tag structure for new tags
-                    result_tags.append({
-                        'id': f'temp_{tag_name}',
-                        'name_en': tag_name,
-                        'name_zh': tag_name,
-                        'category_id': categories[0]['id'] if categories else None,
-                        'weight': 1.0,
-                        'is_new': True
-                    })
-
-            return jsonify({
-                "success": True,
-                "tags": result_tags,
-                "mode": mode
-            })
-        except json.JSONDecodeError as e:
-            print(f"Failed to parse LLM response: {e}")
-            print(f"Response was: {result.get('content', '')}")
-            return jsonify({"success": False, "error": "解析 AI 响应失败"}), 500
+        return {
+            "success": True,
+            "tags": result_tags,
+            "mode": mode
+        }, 200
+    elif result and result.get('unparsable'):
+        return {"success": False, "error": "解析 AI 响应失败"}, 500
     else:
         error_msg = result.get('error', '处理失败') if result else '处理失败'
-        return jsonify({"success": False, "error": error_msg}), 500
+        return {"success": False, "error": error_msg}, 500
+
+def parse_wish_reply(content):
+    """The JSON array of tag names wish_tags_job asks for"""
+    tag_names = parse_llm_json(content)
+    if not all(isinstance(name, str) for name in tag_names):
+        raise ValueError("expected an array of strings")
+    return tag_names
 
 
 if __name__ == '__main__':
@@ -0,0 +1,50 @@
+"""Single-tag write latency: full-file rewrite versus the append-only journal.
+
+Usage: python benchmarks/bench_journal.py [sizes...]
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app import TagStore  # noqa: E402
+from synthetic import make_library  # noqa: E402
+
+WRITES = 50
+
+
+def write_ms(store, n):
+    store.get()
+    start = time.perf_counter()
+    for i in range(WRITES):
+        store.add_tag({
+            "id": f"bench{i:06d}",
+            "name_en": f"bench tag {i}",
+            "name_zh": f"基准{i}",
+            "category_id": "cat0000",
+            "weight": 1.0
+        })
+    return (time.perf_counter() - start) * 1000 / WRITES
+
+
+def main():
+    sizes = [int(s) for s in sys.argv[1:]] or [1000, 10000, 100000]
+    print(f"{'tags':>8} {'rewrite (ms/write)':>20} {'journal (ms/write)':>20}")
+    for n in sizes:
+        results = []
+        for journal in (False, True):
+            with tempfile.TemporaryDirectory() as tmp:
+                path = os.path.join(tmp, 'tags.json')
+                with open(path, 'w', encoding='utf-8') as f:
+                    json.dump(make_library(n), f, ensure_ascii=False, indent=2)
+                # Keep compaction out of the measured window
+                store = TagStore(path, journal=journal, compact_threshold=WRITES + 1, compact_interval=3600)
+                results.append(write_ms(store, n))
+        print(f"{n:>8} {results[0]:>20.3f} {results[1]:>20.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""Per-call overhead of urlopen versus the pooled keep-alive client.
+
+Starts tools/fake_llm_server.py behind TLS with a throwaway self-signed
+certificate, then sends N small OpenAI-style requests with a fresh urlopen
+connection per call (how call_llm_api used to work) and through one
+HTTPConnectionPool, sequentially and from several threads.
+
+Usage: python benchmarks/bench_llm_http.py [calls] [threads]
+"""
+import json
+import os
+import ssl
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from http.server import ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'tools'))
+
+from app import HTTPConnectionPool  # noqa: E402
+from fake_llm_server import FakeLLMHandler  # noqa: E402
+
+PATH = '/v1/chat/completions'
+BODY = json.dumps({"model": "bench", "messages": [{"role": "user", "content": "hi"}]}).encode('utf-8')
+HEADERS = {'Content-Type': 'application/json'}
+
+
+def make_certificate(directory):
+    cert, key = os.path.join(directory, 'cert.pem'), os.path.join(directory, 'key.pem')
+    subprocess.run(['openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-days', '1',
+                    '-subj', '/CN=127.0.0.1', '-addext', 'subjectAltName=IP:127.0.0.1',
+                    '-keyout', key, '-out', cert], check=True, capture_output=True)
+    return cert, key
+
+
+def start_server(cert, key):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FakeLLMHandler)
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(cert, key)
+    server.socket = context.wrap_socket(server.socket, server_side=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def timed(label, call, calls, threads):
+    start = time.perf_counter()
+    if threads == 1:
+        for _ in range(calls):
+            call()
+    else:
+        with ThreadPoolExecutor(threads) as pool:
+            list(pool.map(lambda _: call(), range(calls)))
+    elapsed = time.perf_counter() - start
+    print(f"{label:>10} {threads:>8} {calls:>6} {elapsed:>8.2f} {elapsed / calls * 1000:>8.2f}")
+    return elapsed
+
+
+def main():
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cert, key = make_certificate(tmp)
+        server = start_server(cert, key)
+        url = f"https://127.0.0.1:{server.server_port}{PATH}"
+        client_context = ssl.create_default_context(cafile=cert)
+
+        def urlopen_call():
+            req = urllib.request.Request(url, data=BODY, headers=HEADERS, method='POST')
+            with urllib.request.urlopen(req, timeout=60, context=client_context) as response:
+                response.read()
+
+        pool = HTTPConnectionPool('https', '127.0.0.1', server.server_port, ssl_context=client_context)
+
+        def pooled_call():
+            with pool.request('POST', PATH, body=BODY, headers=HEADERS) as response:
+                response.read()
+
+        print(f"{'client':>10} {'threads':>8} {'calls':>6} {'total s':>8} {'ms/call':>8}")
+        for n_threads in (1, threads):
+            before = timed('urlopen', urlopen_call, calls, n_threads)
+            after = timed('pooled', pooled_call, calls, n_threads)
+            print(f"{'saved':>10} {'':>8} {'':>6} {'':>8} {(before - after) / calls * 1000:>8.2f}")
+        pool.close()
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
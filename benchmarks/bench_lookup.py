@@ -0,0 +1,64 @@
+"""Tag name lookups as done by /api/tags/parse and /api/tags/wish.
+
+Matches K parsed tags against an N-tag library, once with the hash indexes
+kept by TagStore and once with the linear scan the routes used to do.
+
+Usage: python benchmarks/bench_lookup.py [library_size]
+"""
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app import TagStore  # noqa: E402
+from synthetic import make_library  # noqa: E402
+
+INPUT_SIZES = [250, 500, 1000, 2000]
+SCAN_LIMIT = 500  # the scan is quadratic; only time it for small inputs
+
+
+def scan(tags, name_en, name_zh):
+    for tag in tags:
+        if tag['name_en'].lower() == name_en.lower() or tag['name_zh'] == name_zh:
+            return tag
+    return None
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    library = make_library(n)
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'tags.json')
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(library, f, ensure_ascii=False)
+        store = TagStore(path)
+        store.get()
+
+        print(f"library: {n} tags")
+        print(f"{'input tags':>10} {'indexed (ms)':>14} {'scan (ms)':>12}")
+        for k in INPUT_SIZES:
+            # Half the inputs exist in the library, half are new
+            inputs = [(t['name_en'].title(), t['name_zh']) for t in rng.sample(library['tags'], k // 2)]
+            inputs += [(f"new tag {i}", f"新标签{i}") for i in range(k - k // 2)]
+
+            start = time.perf_counter()
+            for name_en, name_zh in inputs:
+                store.find_tag(name_en=name_en, name_zh=name_zh)
+            indexed_ms = (time.perf_counter() - start) * 1000
+
+            scan_ms = float('nan')
+            if k <= SCAN_LIMIT:
+                start = time.perf_counter()
+                for name_en, name_zh in inputs:
+                    scan(library['tags'], name_en, name_zh)
+                scan_ms = (time.perf_counter() - start) * 1000
+            print(f"{k:>10} {indexed_ms:>14.2f} {scan_ms:>12.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""Keyword category matching: the compiled CategoryMatcher against the loop match_category used before.
+
+Classifies the English names of N synthetic tags against the 12 default
+categories with the old categories x keyword groups x keywords loop, with
+a freshly compiled matcher (cold word cache), with the tag store's matcher
+as the parse route gets it (built once per category change) and with
+match_category, which looks the compiled matcher up on every call. Also
+reports how often the old first-match answer and the new best-score answer
+agree.
+
+Usage: python benchmarks/bench_match_category.py [tags]
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app import CATEGORY_KEYWORDS, CategoryMatcher, TagStore, match_category  # noqa: E402
+from synthetic import make_library  # noqa: E402
+
+
+def first_match(tag_text, categories):
+    """match_category before the matcher: first keyword hit in category order wins"""
+    tag_lower = tag_text.lower()
+    for cat in categories:
+        cat_name_lower = cat.get('name_en', '').lower()
+        cat_name_zh = cat.get('name_zh', '')
+        for keyword_cat, keywords in CATEGORY_KEYWORDS.items():
+            if keyword_cat.lower() in cat_name_lower or keyword_cat in cat_name_zh:
+                for keyword in keywords:
+                    if keyword in tag_lower:
+                        return cat['id']
+    return categories[0]['id'] if categories else None
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return (time.perf_counter() - start) * 1000, result
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    library = make_library(n, mixed=True)
+    categories = library['categories']
+    names = [tag['name_en'] for tag in library['tags']]
+
+    def compiled():
+        matcher = CategoryMatcher(categories)
+        return [matcher.match(name) for name in names]
+
+    tmp = tempfile.TemporaryDirectory()
+    store = TagStore(os.path.join(tmp.name, 'tags.json'))
+    store.save({'categories': categories, 'tags': []})
+
+    def per_batch():
+        matcher = store.category_matcher()
+        return [matcher.match(name) for name in names]
+
+    print(f"{'matcher':>16} {'tags':>8} {'total ms':>10} {'us/tag':>8}")
+    results = {}
+    for label, fn in (('first match', lambda: [first_match(name, categories) for name in names]),
+                      ('compiled', compiled),
+                      ('store matcher', per_batch),
+                      ('match_category', lambda: [match_category(name, categories) for name in names])):
+        ms, results[label] = timed(fn)
+        print(f"{label:>16} {n:>8} {ms:>10.1f} {ms * 1000 / n:>8.2f}")
+
+    same = sum(old == new for old, new in zip(results['first match'], results['compiled']))
+    print(f"\nsame category as first match: {same / n * 100:.1f}%")
+    tmp.cleanup()
+
+
+if __name__ == '__main__':
+    main()
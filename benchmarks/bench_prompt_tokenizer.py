@@ -0,0 +1,63 @@
+"""PromptTokenizer against the regex chain parse_tags_input used before it.
+
+Times a single prompt and a multi-megabyte prompt dump, parsed whole and
+(tokenizer only) fed in 64 KiB chunks the way a streamed upload would be.
+
+Usage: python benchmarks/bench_prompt_tokenizer.py [dump_tags]
+"""
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app import PromptTokenizer, tokenize_prompt  # noqa: E402
+from synthetic import make_library, make_prompt  # noqa: E402
+
+CHUNK = 64 * 1024
+
+
+def regex_chain(text):
+    """parse_tags_input before the tokenizer: four substitutions, then a split"""
+    text = re.sub(r'<[^>]+>', '', text)
+    text = re.sub(r'\([^)]*:[\d.]+\)', lambda m: m.group(0)[1:m.group(0).rfind(':')], text)
+    text = re.sub(r'[{}\[\]]', '', text)
+    text = re.sub(r':[\d.]+', '', text)
+    return [tag.strip() for tag in re.split(r'[,;\n]+', text) if len(tag.strip()) >= 2]
+
+
+def chunked(text):
+    tokenizer = PromptTokenizer('nai' if '{' in text else 'sd')
+    tags = []
+    for start in range(0, len(text), CHUNK):
+        tags.extend(tokenizer.feed(text[start:start + CHUNK]))
+    return tags + tokenizer.close()
+
+
+def best_of(fn, text, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        tags = fn(text)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000, len(tags)
+
+
+def main():
+    dump_tags = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    library = make_library(dump_tags, mixed=True)
+    cases = [
+        ('200 tags', make_prompt(library, 200), 200),
+        (f"{dump_tags} tags", make_prompt(library, dump_tags), 3),
+    ]
+    print(f"{'prompt':>14} {'MB':>6} {'parser':>12} {'ms':>9} {'tags':>8}")
+    for label, text, repeat in cases:
+        size = len(text.encode('utf-8')) / 1024 / 1024
+        for name, fn in (('regex chain', regex_chain), ('tokenizer', tokenize_prompt), ('chunked', chunked)):
+            ms, count = best_of(fn, text, repeat)
+            print(f"{label:>14} {size:>6.2f} {name:>12} {ms:>9.2f} {count:>8}")
+
+
+if __name__ == '__main__':
+    main()
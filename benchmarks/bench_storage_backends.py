@@ -0,0 +1,67 @@
+"""Compare the JSON and SQLite storage backends.
+
+Measures a cold load of the whole library, tag lookups by name (as done by
+/api/tags/parse and /api/tags/wish), category lookups and single-tag writes.
+
+Usage: python benchmarks/bench_storage_backends.py [sizes...]
+"""
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app import SqliteTagStore, TagStore  # noqa: E402
+from synthetic import make_library  # noqa: E402
+
+LOOKUPS = 1000
+WRITES = 5
+
+
+def timed_ms(fn, repeat=1):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) * 1000 / repeat
+
+
+def run(store, library, rng):
+    results = {'load_ms': timed_ms(store.get)}
+    names = [t['name_en'].upper() for t in rng.sample(library['tags'], LOOKUPS)]
+    start = time.perf_counter()
+    for name in names:
+        store.find_tag(name_en=name)
+    results['find_tag_us'] = (time.perf_counter() - start) * 1e6 / LOOKUPS
+    cat_id = library['categories'][-1]['id']
+    results['get_category_us'] = timed_ms(lambda: store.get_category(cat_id), LOOKUPS) * 1000
+    counter = iter(range(WRITES))
+    results['add_tag_ms'] = timed_ms(lambda: store.add_tag({
+        "id": f"bench{next(counter)}", "name_en": "bench", "name_zh": "基准",
+        "category_id": cat_id, "weight": 1.0
+    }), WRITES)
+    return results
+
+
+def main():
+    sizes = [int(s) for s in sys.argv[1:]] or [10000, 100000, 1000000]
+    columns = ['load_ms', 'find_tag_us', 'get_category_us', 'add_tag_ms']
+    print(f"{'tags':>8} {'backend':>8} " + ' '.join(f"{c:>16}" for c in columns))
+    for n in sizes:
+        library = make_library(n)
+        with tempfile.TemporaryDirectory() as tmp:
+            json_path = os.path.join(tmp, 'tags.json')
+            with open(json_path, 'w', encoding='utf-8') as f:
+                json.dump(library, f, ensure_ascii=False, indent=2)
+            db_path = os.path.join(tmp, 'library.db')
+            SqliteTagStore(db_path).save(library)
+
+            for name, store in (('json', TagStore(json_path)), ('sqlite', SqliteTagStore(db_path))):
+                results = run(store, library, random.Random(0))
+                print(f"{n:>8} {name:>8} " + ' '.join(f"{results[c]:>16.3f}" for c in columns))
+
+
+if __name__ == '__main__':
+    main()
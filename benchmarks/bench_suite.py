@@ -0,0 +1,196 @@
+"""Benchmark suite for the data paths and routes the app depends on, at several library sizes.
+
+For each size a synthetic library of mixed zh/en tags (see synthetic.py) and
+a gallery of size/10 items are written to a temporary directory and the app
+is pointed at them. The translation memory is seeded with the prompt tags and
+the LLM is left unconfigured, so no request leaves the machine.
+
+Timed, in milliseconds (median of several runs unless noted):
+  load_data          cold load of the tag store from disk
+  save_data          replacing the whole tag document
+  parse_tags_input   splitting a 200-tag prompt
+  match_category     one tag against the store's category matcher (microseconds per tag)
+  parse_route        POST /api/tags/parse with a 200-tag prompt
+  batch_import_route POST /api/tags/batch with 200 new tags
+  gallery_page       GET /api/gallery?limit=50, response cache cleared
+  gallery_search     GET /api/gallery?q=...&limit=50, response cache cleared
+  gallery_full       GET /api/gallery (everything), response cache cleared
+
+Results are written as JSON (default benchmarks/results/<commit>.json) so runs
+on two commits can be compared with --compare.
+
+Usage: python benchmarks/bench_suite.py [--sizes 1000 10000 ...] [--backend json|sqlite]
+                                        [--output FILE] [--compare FILE]
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import app  # noqa: E402
+from synthetic import make_gallery, make_library, make_prompt  # noqa: E402
+
+ROOT = os.path.join(os.path.dirname(__file__), '..')
+DEFAULT_SIZES = [1000, 10000, 100000, 1000000]
+PROMPT_TAGS = 200
+CATEGORY_MATCHES = 5000
+UNITS = {'match_category': 'us'}
+
+
+def median_ms(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times)
+
+
+def git_commit():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=ROOT,
+                                    capture_output=True, text=True).stdout.strip())
+        return commit, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown', False
+
+
+def open_stores(tmp, backend, library, gallery):
+    if backend == 'sqlite':
+        db_path = os.path.join(tmp, 'library.db')
+        tag_store, gallery_store = app.SqliteTagStore(db_path), app.SqliteGalleryStore(db_path)
+        tag_store.save(library)
+        gallery_store.save(gallery)
+        return tag_store, gallery_store, lambda: app.SqliteTagStore(db_path)
+    tags_path, gallery_path = os.path.join(tmp, 'tags.json'), os.path.join(tmp, 'gallery.json')
+    for path, document in ((tags_path, library), (gallery_path, gallery)):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(document, f, ensure_ascii=False, indent=2)
+    return app.TagStore(tags_path), app.GalleryStore(gallery_path), lambda: app.TagStore(tags_path)
+
+
+def run_size(n, backend):
+    library = make_library(n, mixed=True)
+    gallery = make_gallery(max(1, n // 10), library)
+    prompt = make_prompt(library, PROMPT_TAGS)
+    repeat = 5 if n <= 100000 else 1
+    results = {}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tag_store, gallery_store, reopen = open_stores(tmp, backend, library, gallery)
+        app.tag_store, app.gallery_store = tag_store, gallery_store
+        app.config_store = app.ConfigStore(os.path.join(tmp, 'config.json'))
+        app.translation_memory = app.TranslationMemory(os.path.join(tmp, 'translations.db'))
+        parsed = app.parse_tags_input(prompt)
+        app.translation_memory.record_many(
+            [(t['name_en'], t['name_zh']) for t in library['tags']
+             if t['name_en'] in parsed or t['name_zh'] in parsed], 'google')
+        client = app.app.test_client()
+
+        results['load_data'] = median_ms(lambda: reopen().get(), repeat)
+        results['save_data'] = median_ms(lambda: tag_store.save(library), max(1, repeat // 2))
+        results['parse_tags_input'] = median_ms(lambda: app.parse_tags_input(prompt), 50)
+
+        names = [t['name_en'] for t in library['tags'][:CATEGORY_MATCHES]]
+        start = time.perf_counter()
+        matcher = tag_store.category_matcher()
+        for name in names:
+            matcher.match(name)
+        results['match_category'] = (time.perf_counter() - start) * 1e6 / len(names)
+
+        parse_body = {}
+
+        def parse_route():
+            response = client.post('/api/tags/parse', json={'text': prompt})
+            assert response.status_code == 200, response.get_data(as_text=True)
+            parse_body.update(response.get_json())
+        results['parse_route'] = median_ms(parse_route, repeat)
+        results['untranslated'] = parse_body['untranslated_count']
+
+        batches = iter(range(1000))
+
+        def batch_import_route():
+            batch = next(batches)
+            tags = [dict(tag, name_en=f"{tag['name_en']} new{batch}", name_zh=f"{tag['name_zh']}新{batch}",
+                         exists=False) for tag in parse_body['tags']]
+            response = client.post('/api/tags/batch', json={'tags': tags})
+            assert response.status_code == 200, response.get_data(as_text=True)
+        results['batch_import_route'] = median_ms(batch_import_route, repeat)
+
+        for name, url in (('gallery_page', '/api/gallery?limit=50'),
+                          ('gallery_search', '/api/gallery?q=ponytail&limit=50'),
+                          ('gallery_full', '/api/gallery')):
+            def list_gallery():
+                app._response_cache.clear()
+                response = client.get(url)
+                assert response.status_code == 200
+            results[name] = median_ms(list_gallery, repeat)
+    return results
+
+
+def compare(current, baseline_path):
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    print(f"\ncompared with {baseline['commit']} ({baseline_path})")
+    print(f"{'tags':>8} {'metric':>20} {'before':>10} {'after':>10} {'change':>8}")
+    for size, metrics in current['results'].items():
+        for metric, after in metrics.items():
+            before = baseline['results'].get(size, {}).get(metric)
+            if before is None or metric == 'untranslated':
+                continue
+            change = f"{(after - before) / before * 100:+.0f}%" if before else ''
+            print(f"{size:>8} {metric:>20} {before:>10.3f} {after:>10.3f} {change:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES)
+    parser.add_argument('--backend', choices=('json', 'sqlite'), default='json')
+    parser.add_argument('--output', help='result file (default benchmarks/results/<commit>.json)')
+    parser.add_argument('--compare', help='earlier result file to compare against')
+    args = parser.parse_args()
+
+    commit, dirty = git_commit()
+    report = {
+        'commit': commit,
+        'dirty': dirty,
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'backend': args.backend,
+        'units': {'default': 'ms', **UNITS},
+        'results': {}
+    }
+    # Keep the app's own log lines out of the table
+    app.logger.setLevel('WARNING')
+
+    columns = ['load_data', 'save_data', 'parse_tags_input', 'match_category', 'parse_route',
+               'batch_import_route', 'gallery_page', 'gallery_search', 'gallery_full']
+    print(f"{'tags':>8} " + ' '.join(f"{c:>18}" for c in columns))
+    for n in args.sizes:
+        results = run_size(n, args.backend)
+        report['results'][str(n)] = results
+        print(f"{n:>8} " + ' '.join(f"{results[c]:>18.3f}" for c in columns))
+
+    output = args.output or os.path.join(os.path.dirname(__file__), 'results',
+                                         f"{commit}{'-dirty' if dirty else ''}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nresults written to {output}")
+    if args.compare:
+        compare(report, args.compare)
+
+
+if __name__ == '__main__':
+    main()
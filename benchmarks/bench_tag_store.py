@@ -0,0 +1,46 @@
+"""Read latency of TagStore.get() versus re-parsing tags.json per request.
+
+Usage: python benchmarks/bench_tag_store.py [sizes...]
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app import TagStore  # noqa: E402
+from synthetic import make_library  # noqa: E402
+
+
+def per_call_ms(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) * 1000 / repeat
+
+
+def json_load(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def main():
+    sizes = [int(s) for s in sys.argv[1:]] or [1000, 10000, 40000, 100000]
+    print(f"{'tags':>8} {'json.load (ms)':>16} {'TagStore.get (ms)':>18}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in sizes:
+            path = os.path.join(tmp, f'tags_{n}.json')
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(make_library(n), f, ensure_ascii=False, indent=2)
+
+            store = TagStore(path)
+            store.get()  # warm the cache
+            load_ms = per_call_ms(lambda: json_load(path), 5)
+            get_ms = per_call_ms(store.get, 2000)
+            print(f"{n:>8} {load_ms:>16.3f} {get_ms:>18.4f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+"""Translation memory lookups as done by translate_text before any network call.
+
+Fills a TranslationMemory with N en/zh pairs, then times en->zh and zh->en
+lookups for remembered and unknown strings.
+
+Usage: python benchmarks/bench_translation_memory.py [pairs]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app import TranslationMemory  # noqa: E402
+from synthetic import make_library  # noqa: E402
+
+LOOKUPS = 10000
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 300000
+    tags = make_library(n)['tags']
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        memory = TranslationMemory(os.path.join(tmp, 'translations.db'))
+
+        start = time.perf_counter()
+        memory.record_many([(t['name_en'], t['name_zh']) for t in tags], 'google')
+        print(f"record {n} pairs: {time.perf_counter() - start:.2f} s")
+        print(f"db size: {os.path.getsize(memory.path) / 1024 / 1024:.1f} MB")
+
+        sample = rng.sample(tags, LOOKUPS // 2)
+        cases = {
+            'en->zh': [(t['name_en'].upper(), 'en', 'zh') for t in sample]
+                      + [(f"unknown {i}", 'en', 'zh') for i in range(LOOKUPS // 2)],
+            'zh->en': [(t['name_zh'], 'zh', 'en') for t in sample]
+                      + [(f"未知{i}", 'zh', 'en') for i in range(LOOKUPS // 2)],
+        }
+        print(f"{'direction':>10} {'lookups':>8} {'hits':>6} {'us/lookup':>10}")
+        for direction, lookups in cases.items():
+            start = time.perf_counter()
+            hits = sum(memory.lookup(text, src, dst) is not None for text, src, dst in lookups)
+            per_lookup = (time.perf_counter() - start) / len(lookups) * 1e6
+            print(f"{direction:>10} {len(lookups):>8} {hits:>6} {per_lookup:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
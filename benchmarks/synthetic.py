@@ -0,0 +1,135 @@
+"""Synthetic tag libraries, gallery items and prompts for the benchmark scripts."""
+import hashlib
+import random
+from datetime import datetime, timedelta
+
+# (en, zh) tag names per category, named so that match_category's keywords apply
+VOCABULARY = {
+    "Quality": [("masterpiece", "杰作"), ("best quality", "最佳质量"), ("highly detailed", "高细节"),
+                ("8k wallpaper", "8k壁纸"), ("high resolution", "高分辨率"), ("hd", "高清")],
+    "Style": [("anime style", "动漫风格"), ("watercolor", "水彩"), ("oil painting", "油画"),
+              ("sketch", "素描"), ("realistic", "写实"), ("illustration", "插画")],
+    "Character": [("1girl", "1女孩"), ("1boy", "1男孩"), ("solo", "单人"), ("couple", "情侣"),
+                  ("woman", "女人"), ("group", "群像")],
+    "Face": [("smile", "微笑"), ("blue eyes", "蓝色眼睛"), ("blush", "脸红"), ("closed mouth", "闭嘴"),
+             ("looking at viewer", "看向观众"), ("expressionless", "面无表情")],
+    "Hair": [("long hair", "长发"), ("short hair", "短发"), ("ponytail", "马尾"), ("twintails", "双马尾"),
+             ("braid", "辫子"), ("bangs", "刘海")],
+    "Dress": [("school uniform", "校服"), ("white dress", "白色连衣裙"), ("kimono", "和服"),
+              ("maid outfit", "女仆装"), ("armor", "盔甲"), ("pleated skirt", "百褶裙")],
+    "Scene": [("outdoors", "户外"), ("city street", "城市街道"), ("forest", "森林"), ("beach", "海滩"),
+              ("night sky", "夜空"), ("classroom", "教室")],
+    "Lighting": [("sunlight", "阳光"), ("moonlight", "月光"), ("soft lighting", "柔和光线"),
+                 ("rim light", "轮廓光"), ("dark", "昏暗"), ("glowing", "发光")],
+    "Composition": [("upper body", "上半身"), ("full body", "全身"), ("portrait", "肖像"),
+                    ("close-up shot", "特写"), ("cowboy shot", "七分身"), ("wide angle", "广角")],
+    "Action": [("standing", "站立"), ("sitting", "坐着"), ("walking", "行走"), ("running", "奔跑"),
+               ("dancing", "跳舞"), ("lying", "躺着")],
+    "View": [("from above", "俯视"), ("from below", "仰视"), ("from side", "侧面"), ("pov", "第一人称视角"),
+             ("dutch angle", "倾斜视角"), ("perspective", "透视")],
+    "Negative": [("worst quality", "最差质量"), ("low quality", "低质量"), ("blurry", "模糊"),
+                 ("bad hands", "糟糕的手"), ("watermark", "水印"), ("extra fingers", "多余的手指")],
+}
+CATEGORY_NAMES_ZH = {"Quality": "画质", "Style": "风格", "Character": "角色", "Face": "面部", "Hair": "发型",
+                     "Dress": "服装", "Scene": "场景", "Lighting": "光照", "Composition": "构图",
+                     "Action": "动作", "View": "视角", "Negative": "负面"}
+MODIFIERS = [("", ""), ("red", "红色"), ("blue", "蓝色"), ("white", "白色"), ("black", "黑色"),
+             ("golden", "金色"), ("small", "小"), ("large", "大"), ("soft", "柔和"), ("shiny", "闪亮")]
+
+
+def mixed_names(category_name, index):
+    """The ``index``-th (en, zh) tag name of a category; unique per category"""
+    words = VOCABULARY[category_name]
+    en, zh = words[(index // len(MODIFIERS)) % len(words)]
+    modifier_en, modifier_zh = MODIFIERS[index % len(MODIFIERS)]
+    variant = index // (len(MODIFIERS) * len(words))
+    if modifier_en:
+        en, zh = f"{modifier_en} {en}", f"{modifier_zh}{zh}"
+    if variant:
+        en, zh = f"{en} v{variant}", f"{zh}{variant}号"
+    return en, zh
+
+
+def make_library(n_tags, n_categories=12, seed=0, mixed=False):
+    """Build a tags.json-shaped document with ``n_tags`` tags spread over ``n_categories``.
+
+    By default tags are named ``tag <i>`` / ``标签<i>``. With ``mixed=True``
+    they are realistic prompt tags in English and Chinese, and the categories
+    are named after the keyword groups used by match_category.
+    """
+    rng = random.Random(seed)
+    vocabulary = list(VOCABULARY)
+    categories = []
+    for i in range(n_categories):
+        if mixed:
+            base = vocabulary[i % len(vocabulary)]
+            suffix = f" {i // len(vocabulary) + 1}" if i >= len(vocabulary) else ''
+            names = (f"{base}{suffix}", f"{CATEGORY_NAMES_ZH[base]}{suffix.strip()}")
+        else:
+            names = (f"Category {i}", f"分类{i}")
+        categories.append({"id": f"cat{i:04d}", "name_en": names[0], "name_zh": names[1], "color": "#667eea"})
+
+    start = datetime(2024, 1, 1)
+    tags = []
+    per_category = [0] * n_categories
+    for i in range(n_tags):
+        category = rng.choice(categories)
+        if mixed:
+            c = int(category['id'][3:])
+            name_en, name_zh = mixed_names(vocabulary[c % len(vocabulary)], per_category[c])
+            per_category[c] += 1
+            if c >= len(vocabulary):
+                # Categories past the vocabulary reuse its words; keep the names unique
+                name_en, name_zh = f"{name_en} {c}", f"{name_zh}{c}"
+        else:
+            name_en, name_zh = f"tag {i}", f"标签{i}"
+        tags.append({
+            "id": f"tag{i:08d}",
+            "name_en": name_en,
+            "name_zh": name_zh,
+            "category_id": category["id"],
+            "weight": 1.0,
+            "created_at": (start + timedelta(seconds=i)).isoformat()
+        })
+    return {"categories": categories, "tags": tags}
+
+
+def make_prompt(library, n_tags, seed=0):
+    """A prompt of ``n_tags`` library tags in mixed zh/en and mixed prompt syntax:
+    ``(tag:1.2)``, ``[tag]``, ``{tag}``, LoRA tokens and plain tags"""
+    rng = random.Random(seed)
+    parts = []
+    for tag in rng.sample(library['tags'], min(n_tags, len(library['tags']))):
+        name = tag['name_zh'] if rng.random() < 0.3 else tag['name_en']
+        roll = rng.random()
+        if roll < 0.2:
+            name = f"({name}:{rng.choice(['0.8', '1.1', '1.2', '1.4'])})"
+        elif roll < 0.3:
+            name = f"[{name}]"
+        elif roll < 0.4:
+            name = f"{{{name}}}"
+        parts.append(name)
+        if rng.random() < 0.02:
+            parts.append(f"<lora:style_{rng.randint(1, 9)}:0.{rng.randint(5, 9)}>")
+    return ''.join(part + (',\n' if rng.random() < 0.1 else ', ') for part in parts).rstrip(', \n')
+
+
+def make_gallery(n_items, library, seed=0):
+    """Build a gallery.json-shaped document with prompts made from ``library`` tags"""
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1)
+    items = []
+    for i in range(n_items):
+        created = (start + timedelta(minutes=i)).isoformat()
+        items.append({
+            "id": f"{20240101000000000000 + i}",
+            "title": f"作品 {i}" if i % 2 else f"Artwork {i}",
+            "image": hashlib.sha256(str(i).encode('ascii')).hexdigest() + '.png',
+            "positive_prompt": make_prompt(library, rng.randint(8, 30), seed=seed + i),
+            "negative_prompt": "worst quality, low quality, blurry",
+            "created_at": created,
+            "updated_at": created
+        })
+    # Newest first, like the app stores them
+    items.reverse()
+    return {"items": items}
@@ -4,37 +4,110 @@
 let galleryItems = [];
 let currentViewingItem = null;
 
+// Pagination State
+const GALLERY_PAGE_SIZE = 30;
+let galleryNextCursor = null;
+let galleryLoading = false;
+let galleryRequestId = 0;
+let gallerySearchQuery = '';
+let gallerySearchTimer = null;
+
 // Initialize
 document.addEventListener('DOMContentLoaded', () => {
     loadGallery();
     setupDragAndDrop();
+    setupInfiniteScroll();
 });
 
-// Load Gallery Data
-async function loadGallery() {
+// Load Gallery Data (first page)
+function loadGallery() {
+    galleryNextCursor = null;
+    return loadGalleryPage(true);
+}
+
+// Load one page of gallery items; reset starts over from the newest item
+async function loadGalleryPage(reset = false) {
+    if (!reset && (galleryLoading || !galleryNextCursor)) return;
+
+    const requestId = ++galleryRequestId;
+    galleryLoading = true;
     try {
-        const response = await fetch('/api/gallery');
+        const params = new URLSearchParams({ limit: GALLERY_PAGE_SIZE });
+        if (!reset) params.set('cursor', galleryNextCursor);
+        if (gallerySearchQuery) params.set('q', gallerySearchQuery);
+
+        const response = await fetch(`/api/gallery?${params}`);
         const data = await response.json();
-        galleryItems = data.items || [];
-        renderGallery();
+        if (requestId !== galleryRequestId) return; // superseded by a newer search
+
+        const items = data.items || [];
+        galleryNextCursor = data.next_cursor || null;
+        if (reset) {
+            galleryItems = items;
+            renderGallery();
+        } else {
+            galleryItems = galleryItems.concat(items);
+            appendGalleryItems(items);
+        }
     } catch (error) {
         console.error('Failed to load gallery:', error);
         showToast('加载画廊失败', 'error');
+    } finally {
+        if (requestId === galleryRequestId) {
+            galleryLoading = false;
+            loadMoreIfVisible();
+        }
     }
 }
 
-// Render Gallery Grid
-function renderGallery() {
-    const container = document.getElementById('galleryGrid');
+// Fetch further pages when the sentinel below the grid scrolls into view
+function setupInfiniteScroll() {
+    const sentinel = document.getElementById('gallerySentinel');
+    if (!sentinel || !('IntersectionObserver' in window)) return;
 
-    if (galleryItems.length === 0) {
-        container.innerHTML = '<p class="empty-hint">暂无作品，点击上方按钮上传</p>';
-        return;
+    const observer = new IntersectionObserver(entries => {
+        if (entries.some(entry => entry.isIntersecting)) {
+            loadGalleryPage();
+        }
+    }, { rootMargin: '400px 0px' });
+    observer.observe(sentinel);
+}
+
+// The observer only fires on changes, so keep loading while a short page leaves the sentinel visible
+function loadMoreIfVisible() {
+    const sentinel = document.getElementById('gallerySentinel');
+    if (!sentinel || !galleryNextCursor) return;
+    if (sentinel.getBoundingClientRect().top < window.innerHeight + 400) {
+        loadGalleryPage();
     }
+}
 
-    container.innerHTML = galleryItems.map(item => `
+// Search Gallery (debounced)
+function searchGallery(query) {
+    clearTimeout(gallerySearchTimer);
+    gallerySearchTimer = setTimeout(() => {
+        gallerySearchQuery = query.trim();
+        loadGallery();
+    }, 300);
+}
+
+// Thumbnail widths served by /thumbs/<width>/<image>
+const THUMBNAIL_WIDTHS = [320, 640, 960];
+
+function thumbnailUrl(image, width) {
+    return `/thumbs/${width}/${image}`;
+}
+
+function thumbnailSrcset(image) {
+    return THUMBNAIL_WIDTHS.map(w => `${thumbnailUrl(image, w)} ${w}w`).join(', ');
+}
+
+// Gallery Card HTML
+function galleryItemHtml(item) {
+    return `
         <div class="gallery-item" onclick="viewGalleryItem('${item.id}')">
-            <img src="/static/uploads/${item.image}" alt="${item.title || 'Artwork'}" loading="lazy">
+            <img src="${thumbnailUrl(item.image, 320)}" srcset="${thumbnailSrcset(item.image)}"
+                 sizes="(max-width: 768px) 50vw, 300px" alt="${item.title || 'Artwork'}" loading="lazy" decoding="async">
             <div class="gallery-item-overlay">
                 <span class="gallery-item-title">${item.title || '未命名作品'}</span>
             </div>
@@ -42,7 +115,28 @@ function renderGallery() {
                 ✎
             </button>
         </div>
-    `).join('');
+    `;
+}
+
+// Render Gallery Grid
+function renderGallery() {
+    const container = document.getElementById('galleryGrid');
+
+    if (galleryItems.length === 0) {
+        container.innerHTML = gallerySearchQuery
+            ? '<p class="empty-hint">没有匹配的作品</p>'
+            : '<p class="empty-hint">暂无作品，点击上方按钮上传</p>';
+        return;
+    }
+
+    container.innerHTML = galleryItems.map(galleryItemHtml).join('');
+}
+
+// Append a newly loaded page to the grid without re-rendering existing cards
+function appendGalleryItems(items) {
+    if (items.length === 0) return;
+    const container = document.getElementById('galleryGrid');
+    container.insertAdjacentHTML('beforeend', items.map(galleryItemHtml).join(''));
 }
 
 // Setup Drag and Drop for Upload
@@ -125,7 +219,7 @@ function openEditGalleryModal(itemId) {
     document.getElementById('editGalleryTitle').value = item.title || '';
     document.getElementById('editGalleryPositive').value = item.positive_prompt || '';
     document.getElementById('editGalleryNegative').value = item.negative_prompt || '';
-    document.getElementById('editGalleryPreview').src = `/static/uploads/${item.image}`;
+    document.getElementById('editGalleryPreview').src = thumbnailUrl(item.image, 640);
     document.getElementById('editGalleryImageInput').value = '';
 
     openModal('editGalleryModal');
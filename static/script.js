@@ -13,19 +13,24 @@ let promptFormats = {
 };
 let currentPromptFormat = 'sd'; // 'sd' or 'flux'
 
+// Tag pagination state: one page list per filter ('all' or a category ID).
+// `tags` holds every tag loaded so far, for lookups by ID and name.
+const TAG_PAGE_SIZE = 200;
+let tagPages = {};
+
 // Initialize
 document.addEventListener('DOMContentLoaded', () => {
     loadData();
     setupEventListeners();
+    setupTagScroll();
 });
 
-// Load Data from API
+// Load Data from API (categories and the first page of the current filter)
 async function loadData() {
+    tags = [];
+    tagPages = {};
     try {
-        const response = await fetch('/api/tags');
-        const data = await response.json();
-        tags = data.tags || [];
-        categories = data.categories || [];
+        await loadTagPage(currentFilter);
         renderCategoryFilter();
         renderTags();
         renderCategoriesList();
@@ -35,6 +40,109 @@ async function loadData() {
     }
 }
 
+// Fetch the next page of tags for a filter; the first call also fetches its first page
+async function loadTagPage(filter) {
+    const page = tagPages[filter] || (tagPages[filter] = { tags: [], nextCursor: null, total: 0, loaded: false, loading: false });
+    if (page.loading || (page.loaded && !page.nextCursor)) return;
+
+    page.loading = true;
+    try {
+        // Only request the tag fields the UI renders
+        const params = new URLSearchParams({ fields: 'name_en,name_zh,category_id,weight', limit: TAG_PAGE_SIZE });
+        if (filter !== 'all') params.set('category', filter);
+        if (page.nextCursor) params.set('cursor', page.nextCursor);
+
+        const response = await fetch(`/api/tags?${params}`);
+        const data = await response.json();
+        if (!response.ok) throw new Error(data.error || `HTTP ${response.status}`);
+
+        categories = data.categories || categories;
+        const known = new Set(page.tags.map(t => t.id));
+        const fresh = (data.tags || []).filter(t => !known.has(t.id));
+        page.tags = page.tags.concat(fresh);
+        page.nextCursor = data.next_cursor || null;
+        page.total = data.total;
+        page.loaded = true;
+        rememberTags(fresh);
+    } finally {
+        page.loading = false;
+    }
+}
+
+// Load and render the next page of the current filter
+async function loadMoreTags() {
+    const filter = currentFilter;
+    try {
+        await loadTagPage(filter);
+    } catch (error) {
+        showToast('Failed to load tags', 'error');
+        console.error(error);
+    }
+    if (filter === currentFilter) renderTags();
+}
+
+// Fetch the next page when the tag list is scrolled near its end
+function setupTagScroll() {
+    const container = document.getElementById('tagsContainer');
+    container.addEventListener('scroll', () => {
+        const page = tagPages[currentFilter];
+        if (page && page.nextCursor && !page.loading &&
+            container.scrollTop + container.clientHeight >= container.scrollHeight - 200) {
+            loadMoreTags();
+        }
+    });
+}
+
+// Add tags to the lookup list, skipping ones already there
+function rememberTags(newTags) {
+    const known = new Set(tags.map(t => t.id));
+    newTags.forEach(tag => {
+        if (!known.has(tag.id)) {
+            tags.push(tag);
+            known.add(tag.id);
+        }
+    });
+}
+
+// Add newly created tags to the loaded pages. Pages that still have a next
+// cursor are left alone: new tags sort last, so they arrive with the last page.
+function addLoadedTags(newTags) {
+    rememberTags(newTags);
+    Object.entries(tagPages).forEach(([filter, page]) => {
+        const matching = newTags.filter(t => filter === 'all' || t.category_id === filter);
+        page.total += matching.length;
+        if (page.loaded && !page.nextCursor) {
+            page.tags = page.tags.concat(matching);
+        }
+    });
+}
+
+// Replace an edited tag everywhere it is loaded
+function replaceLoadedTag(tag, previous) {
+    const index = tags.findIndex(t => t.id === tag.id);
+    if (index > -1) {
+        tags[index] = tag;
+    }
+    if (previous && previous.category_id !== tag.category_id) {
+        // The tag moved between categories; refetch those lists when next shown
+        delete tagPages[previous.category_id];
+        delete tagPages[tag.category_id];
+    }
+    Object.values(tagPages).forEach(page => {
+        page.tags = page.tags.map(t => t.id === tag.id ? tag : t);
+    });
+}
+
+// Drop a deleted tag from the lookup list and every loaded page
+function forgetTag(tagId) {
+    tags = tags.filter(t => t.id !== tagId);
+    Object.values(tagPages).forEach(page => {
+        const count = page.tags.length;
+        page.tags = page.tags.filter(t => t.id !== tagId);
+        if (page.tags.length < count) page.total -= 1;
+    });
+}
+
 // Setup Event Listeners
 function setupEventListeners() {
     // Weight format change
@@ -70,21 +178,26 @@ function filterByCategory(categoryId) {
     currentFilter = categoryId;
     renderCategoryFilter();
     renderTags();
+    if (!tagPages[categoryId]) {
+        loadMoreTags();
+    }
 }
 
-// Render Tags
+// Render Tags (the pages loaded so far for the current filter)
 function renderTags() {
     const container = document.getElementById('tagsContainer');
-    const filteredTags = currentFilter === 'all'
-        ? tags
-        : tags.filter(t => t.category_id === currentFilter);
+    const page = tagPages[currentFilter];
 
-    if (filteredTags.length === 0) {
+    if (!page || !page.loaded) {
+        container.innerHTML = '<p class="empty-hint">加载中... / Loading...</p>';
+        return;
+    }
+    if (page.tags.length === 0) {
         container.innerHTML = '<p class="empty-hint">暂无标签 / No tags yet</p>';
         return;
     }
 
-    container.innerHTML = filteredTags.map(tag => {
+    container.innerHTML = page.tags.map(tag => {
         const category = categories.find(c => c.id === tag.category_id);
         const isSelected = selectedTags.some(t => t.id === tag.id);
         const catColor = category ? category.color : '#6366f1';
@@ -103,7 +216,11 @@ function renderTags() {
                 <span class="tag-category-dot" style="background: ${catColor}"></span>
             </div>
         `;
-    }).join('');
+    }).join('') + (page.nextCursor ? `
+        <button class="btn btn-secondary load-more-btn" onclick="loadMoreTags()">
+            加载更多 / Load more (${page.tags.length}/${page.total})
+        </button>
+    ` : '');
 }
 
 // Toggle Tag Selection
@@ -299,6 +416,68 @@ async function copyPrompt() {
     }
 }
 
+// Background Jobs
+// LLM-backed endpoints answer 202 with a job id; follow the job's event stream
+// (falling back to polling) and resolve with the operation's response body.
+// onProgress, if given, receives the text the LLM has streamed so far.
+const JOB_POLL_INTERVAL = 1000;
+
+async function jobResult(response, onProgress) {
+    const data = await response.json();
+    if (response.status !== 202 || !data.job_id) {
+        return data;
+    }
+    const job = await waitForJob(data.job_id, onProgress);
+    return job.result || { success: false, error: job.error || 'AI 任务失败' };
+}
+
+function reportJobProgress(job, onProgress) {
+    if (onProgress && job.status === 'running' && job.partial) {
+        onProgress(job.partial);
+    }
+}
+
+function waitForJob(jobId, onProgress) {
+    return new Promise((resolve) => {
+        if (!window.EventSource) {
+            pollJob(jobId, onProgress).then(resolve);
+            return;
+        }
+        const source = new EventSource(`/api/jobs/${jobId}/events`);
+        source.onmessage = (event) => {
+            const job = JSON.parse(event.data);
+            reportJobProgress(job, onProgress);
+            if (job.status === 'done' || job.status === 'failed') {
+                source.close();
+                resolve(job);
+            }
+        };
+        source.onerror = () => {
+            source.close();
+            pollJob(jobId, onProgress).then(resolve);
+        };
+    });
+}
+
+async function pollJob(jobId, onProgress) {
+    while (true) {
+        try {
+            const response = await fetch(`/api/jobs/${jobId}`);
+            const data = await response.json();
+            if (!data.success) {
+                return { status: 'failed', error: data.error };
+            }
+            reportJobProgress(data.job, onProgress);
+            if (data.job.status === 'done' || data.job.status === 'failed') {
+                return data.job;
+            }
+        } catch (error) {
+            console.error(error);
+        }
+        await new Promise(resolve => setTimeout(resolve, JOB_POLL_INTERVAL));
+    }
+}
+
 // Optimize Prompt Order with AI
 async function optimizePromptOrder() {
     if (selectedTags.length === 0) {
@@ -327,7 +506,7 @@ async function optimizePromptOrder() {
             })
         });
 
-        const result = await response.json();
+        const result = await jobResult(response);
 
         if (result.success) {
             // Reorder selectedTags based on AI optimization
@@ -400,7 +579,11 @@ async function convertToFluxPrompt() {
             })
         });
 
-        const result = await response.json();
+        // Show the natural language prompt as the AI writes it
+        const output = document.getElementById('promptOutput');
+        const result = await jobResult(response, (partial) => {
+            output.textContent = partial;
+        });
 
         if (result.success) {
             // Save flux format and switch to it
@@ -408,7 +591,6 @@ async function convertToFluxPrompt() {
             currentPromptFormat = 'flux';
 
             // Update prompt output with natural language
-            const output = document.getElementById('promptOutput');
             output.textContent = promptFormats.flux;
 
             // Update toggle button visibility
@@ -416,6 +598,7 @@ async function convertToFluxPrompt() {
 
             showToast('已转换为 Flux 自然语言提示词!', 'success');
         } else {
+            output.textContent = promptFormats[currentPromptFormat];
             showToast(result.error || '转换失败', 'error');
         }
     } catch (error) {
@@ -578,7 +761,7 @@ async function submitAddTag(event) {
 
         const result = await response.json();
         if (result.success) {
-            tags.push(result.tag);
+            addLoadedTags([result.tag]);
             renderTags();
             closeModal('addTagModal');
             showToast('标签添加成功!', 'success');
@@ -608,9 +791,9 @@ async function submitEditTag(event) {
 
         const result = await response.json();
         if (result.success) {
-            const index = tags.findIndex(t => t.id === tagId);
-            if (index > -1) {
-                tags[index] = result.tag;
+            replaceLoadedTag(result.tag, tags.find(t => t.id === tagId));
+            if (!tagPages[currentFilter]) {
+                loadMoreTags();
             }
 
             // Update selected tags if modified
@@ -642,7 +825,7 @@ async function deleteCurrentTag() {
 
         const result = await response.json();
         if (result.success) {
-            tags = tags.filter(t => t.id !== tagId);
+            forgetTag(tagId);
             selectedTags = selectedTags.filter(t => t.id !== tagId);
             renderTags();
             renderSelectedTags();
@@ -749,9 +932,13 @@ async function deleteCurrentCategory() {
             if (currentFilter === categoryId) {
                 currentFilter = 'all';
             }
+            delete tagPages[categoryId];
             renderCategoryFilter();
             renderCategoriesList();
             renderTags();
+            if (!tagPages[currentFilter]) {
+                loadMoreTags();
+            }
             closeModal('editCategoryModal');
             showToast('分类已删除', 'success');
         }
@@ -813,7 +1000,7 @@ async function parseImportTags() {
             body: JSON.stringify({ text: input })
         });
 
-        const result = await response.json();
+        const result = await jobResult(response);
 
         if (result.success) {
             parsedImportTags = result.tags;
@@ -832,7 +1019,8 @@ async function parseImportTags() {
 
             // Update summary
             document.getElementById('importSummary').textContent =
-                `共解析 ${result.total} 个标签，其中 ${result.new_count} 个为新标签`;
+                `共解析 ${result.total} 个标签，其中 ${result.new_count} 个为新标签` +
+                (result.untranslated_count ? `，${result.untranslated_count} 个未能翻译` : '');
 
             // Render preview
             renderImportPreview();
@@ -862,6 +1050,7 @@ function renderImportPreview() {
             <div class="preview-col tag-names">
                 <span class="tag-en">${tag.name_en}</span>
                 ${tag.exists ? '<span class="tag-exists-badge">已存在</span>' : ''}
+                ${tag.translated === false ? '<span class="tag-untranslated-badge">未翻译</span>' : ''}
             </div>
             <div class="preview-col">
                 <input type="text" class="import-translation-input"
@@ -948,7 +1137,7 @@ async function confirmImport() {
 
         if (result.success) {
             // Add imported tags to local state
-            result.tags.forEach(tag => tags.push(tag));
+            addLoadedTags(result.tags);
 
             // Check if we should also add to selected tags
             const includeSelected = document.getElementById('importIncludeSelected').checked;
@@ -1285,7 +1474,12 @@ async function executeWish() {
             })
         });
 
-        const result = await response.json();
+        // Show the AI's answer as it streams in
+        const resultDiv = document.getElementById('wishResult');
+        const result = await jobResult(response, (partial) => {
+            resultDiv.style.display = 'block';
+            resultDiv.textContent = partial;
+        });
 
         if (result.success) {
             // Replace selected tags with AI-generated tags
@@ -1298,7 +1492,6 @@ async function executeWish() {
             generatePrompt();
 
             // Show result message
-            const resultDiv = document.getElementById('wishResult');
             resultDiv.style.display = 'block';
             resultDiv.innerHTML = `<span style="color: var(--success);">✓ AI 已${mode === 'modify' ? '修改' : '生成'}标签，共 ${result.tags.length} 个</span>`;
 
@@ -1309,6 +1502,7 @@ async function executeWish() {
                 closeModal('wishingMachineModal');
             }, 2000);
         } else {
+            resultDiv.style.display = 'none';
             showToast(result.error || '处理失败', 'error');
         }
     } catch (error) {
@@ -1371,7 +1565,7 @@ function loadSelectedTagsToEditor() {
 }
 
 // 本地匹配解析 - 从已有标签库中匹配，不调用 LLM
-function localMatchTags() {
+async function localMatchTags() {
     const input = document.getElementById('promptEditorInput').value.trim();
     if (!input) {
         showToast('请输入 Prompt', 'error');
@@ -1391,14 +1585,23 @@ function localMatchTags() {
         // 解析输入文本为单独的标签
         const parsedTagStrings = parseInputText(input);
 
-        // 从本地标签库匹配
-        editorTags = parsedTagStrings.map(tagStr => {
+        // 按名称精确匹配在服务端查找整个标签库（本地 tags 只包含已加载的分页）
+        const response = await fetch('/api/tags/lookup', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ names: parsedTagStrings })
+        });
+        const lookup = await response.json();
+        if (!lookup.success) {
+            throw new Error(lookup.error);
+        }
+
+        // 从标签库匹配
+        editorTags = parsedTagStrings.map((tagStr, index) => {
             const normalizedTag = tagStr.toLowerCase().trim();
 
-            // 尝试从标签库中精确匹配或模糊匹配
-            const existingTag = tags.find(t =>
-                t.name_en.toLowerCase() === normalizedTag ||
-                t.name_zh === tagStr ||
+            // 精确匹配来自服务端，模糊匹配只在已加载的标签中进行
+            const existingTag = lookup.tags[index] || tags.find(t =>
                 t.name_en.toLowerCase().includes(normalizedTag) ||
                 normalizedTag.includes(t.name_en.toLowerCase())
             );
@@ -1412,7 +1615,8 @@ function localMatchTags() {
                     weight: existingTag.weight || 1,
                     checked: false,
                     fromLibrary: true,
-                    isNew: false
+                    isNew: false,
+                    libraryTag: existingTag
                 };
             } else {
                 // 未匹配到的标签
@@ -1488,25 +1692,23 @@ async function smartParseTags() {
             body: JSON.stringify({ text: input })
         });
 
-        const result = await response.json();
+        const result = await jobResult(response);
 
         if (result.success) {
             // Convert parsed tags to editor format
             editorTags = result.tags.map(tag => {
-                // Check if tag exists in library
-                const existingTag = tags.find(t =>
-                    t.name_en.toLowerCase() === tag.name_en.toLowerCase()
-                );
+                // The server looked the tag up in the whole library; the local tags only hold loaded pages
+                const exists = tag.exists && !!tag.existing_id;
 
                 return {
-                    id: existingTag ? existingTag.id : `temp_${Date.now()}_${Math.random().toString(36).substr(2, 9)}`,
+                    id: exists ? tag.existing_id : `temp_${Date.now()}_${Math.random().toString(36).substr(2, 9)}`,
                     name_en: tag.name_en,
                     name_zh: tag.name_zh || tag.name_en,
-                    category_id: existingTag ? existingTag.category_id : tag.category_id,
+                    category_id: exists ? tag.existing_category_id : tag.category_id,
                     weight: tag.weight || 1,
                     checked: false,
-                    fromLibrary: !!existingTag,
-                    isNew: !existingTag
+                    fromLibrary: exists,
+                    isNew: !exists
                 };
             });
 
@@ -1680,7 +1882,7 @@ async function smartSelectByCategory() {
             })
         });
 
-        const result = await response.json();
+        const result = await jobResult(response);
 
         if (result.success) {
             // Update checked state based on relevance
@@ -1711,9 +1913,9 @@ async function smartSelectByCategory() {
 function applyEditorChanges() {
     // Update selectedTags based on remaining editorTags
     selectedTags = editorTags.map(tag => {
-        // If tag is from library, find the original
+        // If tag is from library, find the original (it may not be on a loaded page)
         if (tag.fromLibrary) {
-            const originalTag = tags.find(t => t.id === tag.id);
+            const originalTag = tags.find(t => t.id === tag.id) || tag.libraryTag;
             if (originalTag) {
                 return originalTag;
             }
@@ -0,0 +1,77 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import app as app_module  # noqa: E402
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    """The app module with its stores, caches, job queue and folders pointed at a
+    temporary directory, so tests never write into the working tree"""
+    monkeypatch.setattr(app_module, 'tag_store', app_module.TagStore(str(tmp_path / 'tags.json')))
+    monkeypatch.setattr(app_module, 'gallery_store', app_module.GalleryStore(str(tmp_path / 'gallery.json')))
+    monkeypatch.setattr(app_module, 'config_store', app_module.ConfigStore(str(tmp_path / 'config.json')))
+    monkeypatch.setattr(app_module, 'translation_memory',
+                        app_module.TranslationMemory(str(tmp_path / 'translations.db')))
+    monkeypatch.setattr(app_module, 'llm_cache', app_module.LLMResponseCache(str(tmp_path / 'llm_cache.db')))
+    jobs_db = str(tmp_path / 'jobs.db')
+    monkeypatch.setattr(app_module, 'JOBS_DB_FILE', jobs_db)
+    job_queue = app_module.JobQueue(jobs_db)
+    monkeypatch.setattr(app_module, 'job_queue', job_queue)
+    upload_lock = str(tmp_path / 'uploads.lock')
+    monkeypatch.setattr(app_module, 'UPLOAD_LOCK_FILE', upload_lock)
+    monkeypatch.setattr(app_module, '_uploads_file_lock', app_module.FileLock(upload_lock))
+    (tmp_path / 'uploads').mkdir()
+    monkeypatch.setitem(app_module.app.config, 'UPLOAD_FOLDER', str(tmp_path / 'uploads'))
+    monkeypatch.setattr(app_module, 'THUMBNAIL_FOLDER', str(tmp_path / 'thumbs'))
+    monkeypatch.setattr(app_module, 'PROFILE_FOLDER', str(tmp_path / 'profiles'))
+    monkeypatch.setattr(app_module, 'profiler', app_module.Profiler(str(tmp_path / 'profiles')))
+    app_module._response_cache.clear()
+    yield app_module
+    job_queue._executor.shutdown(wait=True)
+
+
+@pytest.fixture
+def client(app):
+    return app.app.test_client()
+
+
+@pytest.fixture
+def fake_llm(app, tmp_path, monkeypatch):
+    """An OpenAI-compatible tools/fake_llm_server.py configured as the only provider.
+
+    Returns its handler class: queue replies in ``replies`` (the prompt-based
+    default answers once they run out); ``requests`` counts the LLM calls.
+    """
+    import json
+    import threading
+    from http.server import ThreadingHTTPServer
+
+    sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'tools'))
+    from fake_llm_server import FakeLLMHandler
+
+    class Handler(FakeLLMHandler):
+        token_delay = 0
+        replies = []
+        requests = 0
+
+        def reply_text(self, body):
+            type(self).requests += 1
+            return self.replies.pop(0) if self.replies else super().reply_text(body)
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, kwargs={'poll_interval': 0.05}, daemon=True).start()
+    config_path = tmp_path / 'config.json'
+    config_path.write_text(json.dumps({'llm': {
+        'enabled': True, 'provider': 'openai', 'api_key': 'test', 'model': 'fake',
+        'base_url': f"http://127.0.0.1:{server.server_address[1]}/v1"
+    }}), encoding='utf-8')
+    monkeypatch.setattr(app, 'config_store', app.ConfigStore(str(config_path)))
+    monkeypatch.setattr(app, 'llm_router', app.LLMRouter())
+    yield Handler
+    server.shutdown()
+    server.server_close()
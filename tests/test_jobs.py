@@ -0,0 +1,36 @@
+import threading
+
+import pytest
+
+
+def ok():
+    return {"success": True}, 200
+
+
+def test_failed_submit_gives_its_slot_back(app, tmp_path):
+    queue = app.JobQueue(str(tmp_path / 'jobs.db'), workers=1, max_pending=1)
+    queue._executor.shutdown()
+    with pytest.raises(RuntimeError):
+        queue.submit('parse', ok)
+    assert queue._pending == 0
+
+
+def test_pruning_keeps_unfinished_jobs(app, tmp_path):
+    queue = app.JobQueue(str(tmp_path / 'jobs.db'), workers=1, ttl=60)
+    release = threading.Event()
+    blocked = queue.submit('parse', lambda: (release.wait(5), ({"success": True}, 200))[1])
+    waiting = queue.submit('parse', ok)
+    finished = app.JobQueue(str(tmp_path / 'jobs.db'))._conn()
+    finished.execute("INSERT INTO jobs (id, kind, status, revision, created_at, updated_at) "
+                     "VALUES ('old', 'parse', 'done', 1, '', 0)")
+    # Make the unfinished jobs look older than the TTL too
+    finished.execute("UPDATE jobs SET updated_at = 0")
+
+    queue.submit('parse', ok)
+
+    assert queue.get('old') is None
+    assert queue.get(blocked['id'])['status'] in ('queued', 'running')
+    assert queue.get(waiting['id'])['status'] == 'queued'
+    release.set()
+    queue._executor.shutdown(wait=True)
+    assert queue.get(waiting['id'])['status'] == 'done'
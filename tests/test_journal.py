@@ -0,0 +1,92 @@
+import json
+import os
+
+import pytest
+
+
+@pytest.fixture
+def open_store(app, tmp_path):
+    path = str(tmp_path / 'tags.json')
+
+    def open_store():
+        # Compaction only runs when a test asks for it
+        return app.TagStore(path, journal=True, compact_threshold=10 ** 6, compact_interval=3600)
+    return open_store
+
+
+def make_tag(app, name):
+    return {'id': app.new_id(), 'name_en': name, 'name_zh': name, 'category_id': 'c1'}
+
+
+def names(store):
+    return [tag['name_en'] for tag in store.get()['tags']]
+
+
+def test_mutations_are_appended_and_replayed(app, open_store):
+    store = open_store()
+    store.save({'categories': [], 'tags': [make_tag(app, 'a')]})
+    snapshot = open(store.path, 'rb').read()
+    b = store.add_tag(make_tag(app, 'b'))
+    store.add_tag(make_tag(app, 'c'))
+    store.update_tag(dict(b, name_en='b2'))
+    store.delete_tag(store.get()['tags'][0]['id'])
+
+    assert open(store.path, 'rb').read() == snapshot
+    with open(store.journal_path, encoding='utf-8') as f:
+        assert [json.loads(line)['op'] for line in f] == ['add_tags', 'add_tags', 'update_tag', 'delete_tag']
+    assert names(open_store()) == ['b2', 'c']
+
+
+def test_compaction_folds_the_journal_into_the_snapshot(app, open_store):
+    store = open_store()
+    for name in 'abc':
+        store.add_tag(make_tag(app, name))
+    store.compact()
+
+    assert not os.path.exists(store.journal_path)
+    assert not os.path.exists(store._compacting_path)
+    with open(store.path, encoding='utf-8') as f:
+        assert [tag['name_en'] for tag in json.load(f)['tags']] == ['a', 'b', 'c']
+    store.add_tag(make_tag(app, 'd'))
+    assert names(store) == names(open_store()) == ['a', 'b', 'c', 'd']
+
+
+def test_interrupted_compaction_replays_without_duplicates(app, open_store):
+    store = open_store()
+    for name in 'ab':
+        store.add_tag(make_tag(app, name))
+    # Crash after the snapshot was written but before the .compacting journal was removed
+    store._write_snapshot(store.get())
+    os.replace(store.journal_path, store._compacting_path)
+
+    reopened = open_store()
+    assert names(reopened) == ['a', 'b']
+    reopened.add_tag(make_tag(app, 'c'))
+    reopened.compact()
+    assert not os.path.exists(reopened._compacting_path)
+    assert names(open_store()) == ['a', 'b', 'c']
+
+
+def test_torn_journal_line_is_dropped_and_cut_off_on_the_next_write(app, open_store):
+    store = open_store()
+    store.add_tag(make_tag(app, 'a'))
+    with open(store.journal_path, 'ab') as f:
+        f.write(b'{"op": "add_tags", "tags": [{"id": "x"')
+
+    reopened = open_store()
+    assert names(reopened) == ['a']
+    reopened.add_tag(make_tag(app, 'b'))
+    with open(store.journal_path, encoding='utf-8') as f:
+        assert all(json.loads(line) for line in f)
+    assert names(open_store()) == ['a', 'b']
+
+
+def test_other_workers_appends_survive_compaction(app, open_store):
+    first, second = open_store(), open_store()
+    first.add_tag(make_tag(app, 'a'))
+    second.add_tag(make_tag(app, 'b'))
+    assert names(first) == ['a', 'b']
+
+    first.compact()
+    second.add_tag(make_tag(app, 'c'))
+    assert names(first) == names(second) == names(open_store()) == ['a', 'b', 'c']
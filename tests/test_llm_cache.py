@@ -0,0 +1,70 @@
+import pytest
+
+TAGS = [{'name_en': 'sunset', 'name_zh': '日落'}, {'name_en': '1girl', 'name_zh': '1女孩'}]
+MESSAGES = [{'role': 'user', 'content': 'List some tags'}]
+
+
+def cache_entries(app):
+    return app.llm_cache.info()['disk_entries']
+
+
+def test_unparsable_reply_is_not_cached(app, fake_llm):
+    fake_llm.replies = ['["sunset", "1gi']
+
+    body, status = app.optimize_tag_order_job(TAGS)
+    assert status == 500 and body['success'] is False
+    assert cache_entries(app) == 0
+
+    body, status = app.optimize_tag_order_job(TAGS)
+    assert status == 200 and body['optimized_tags']
+    assert cache_entries(app) == 1
+    assert app.optimize_tag_order_job(TAGS) == (body, status)
+    assert fake_llm.requests == 2
+
+
+def test_cached_reply_that_does_not_parse_is_evicted(app, fake_llm):
+    fake_llm.replies = ['Sure! Here are some tags.', '["sunset"]']
+    assert app.call_llm_api(MESSAGES)['content'] == 'Sure! Here are some tags.'
+
+    result = app.call_llm_api(MESSAGES, parse=app.parse_llm_json)
+    assert result['success'] and not result.get('cached')
+    assert result['parsed'] == ['sunset']
+    assert app.llm_cache.info()['rejected'] == 1
+
+    result = app.call_llm_api(MESSAGES, parse=app.parse_llm_json)
+    assert result['cached'] and result['parsed'] == ['sunset']
+    assert fake_llm.requests == 2
+
+
+def test_rejected_cached_reply_is_not_streamed(app, fake_llm):
+    fake_llm.replies = ['not json', '["sunset"]']
+    app.call_llm_api(MESSAGES)
+    tokens = []
+    result = app.call_llm_api(MESSAGES, on_token=tokens.append, parse=app.parse_llm_json)
+    assert result['parsed'] == ['sunset']
+    assert 'not json' not in ''.join(tokens)
+
+
+@pytest.mark.parametrize('job, args', [
+    ('analyze_tag_relevance_job', (TAGS, {'name_en': 'Scene', 'name_zh': '场景'})),
+    ('wish_tags_job', ('generate', 'a night scene', [])),
+])
+def test_jobs_do_not_cache_replies_of_the_wrong_shape(app, fake_llm, job, args):
+    fake_llm.replies = ['{"tags": ["sunset"]}']
+    body, status = getattr(app, job)(*args)
+    assert status == 500 and body['success'] is False
+    assert cache_entries(app) == 0
+
+
+def test_empty_flux_prompt_is_not_cached(app, fake_llm):
+    fake_llm.replies = ['""']
+    body, status = app.convert_to_flux_prompt_job(TAGS)
+    assert status == 500
+    assert cache_entries(app) == 0
+
+
+def test_fenced_json_is_accepted():
+    import app
+    assert app.parse_llm_json('```json\n["a", "b"]\n```') == ['a', 'b']
+    with pytest.raises(ValueError):
+        app.parse_llm_json('{"a": 1}')
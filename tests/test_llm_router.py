@@ -0,0 +1,144 @@
+import threading
+import time
+
+import pytest
+
+ROUTING = {'failure_threshold': 1, 'cooldown': 0.2}
+
+
+def request(name):
+    return {'name': name, 'model': 'fake'}
+
+
+@pytest.fixture
+def router(app, monkeypatch):
+    """An LLMRouter whose provider calls go to ``calls``; ``replies[name]`` is an Event to wait for
+    (or a result dict) before answering"""
+    router = app.LLMRouter()
+    router.calls, router.replies = [], {}
+
+    def send(req, on_token=None, on_response=None, cancel=None):
+        router.calls.append(req['name'])
+        reply = router.replies.get(req['name'], {'success': True, 'content': 'ok'})
+        if isinstance(reply, threading.Event):
+            reply.wait(5)
+            reply = {'success': True, 'content': 'ok'}
+        return dict(reply)
+    monkeypatch.setattr(app, 'send_llm_request', send)
+    return router
+
+
+def open_breaker(router, name):
+    router.record_failure(name, ROUTING['failure_threshold'])
+    time.sleep(ROUTING['cooldown'] + 0.05)
+
+
+def test_half_open_breaker_lets_one_trial_through(router):
+    open_breaker(router, 'a')
+    router.replies['a'] = trial_done = threading.Event()
+    trial = threading.Thread(target=router.call, args=([request('a'), request('b')], None, ROUTING))
+    trial.start()
+    while router.calls != ['a']:
+        time.sleep(0.01)
+
+    # While the trial runs, other callers skip the provider
+    assert router.call([request('a'), request('b')], None, ROUTING)['provider'] == 'b'
+    assert router.info()['a']['circuit'] == 'half-open'
+
+    trial_done.set()
+    trial.join()
+    assert router.info()['a']['circuit'] == 'closed'
+    assert router.call([request('a'), request('b')], None, ROUTING)['provider'] == 'a'
+    assert router.calls == ['a', 'b', 'a']
+
+
+def test_failed_trial_opens_the_breaker_again(router):
+    open_breaker(router, 'a')
+    router.replies['a'] = {'success': False, 'error': 'down'}
+    assert router.call([request('a'), request('b')], None, ROUTING)['provider'] == 'b'
+    assert router.info()['a']['circuit'] == 'open'
+
+    router.replies.pop('a')
+    assert router.call([request('a'), request('b')], None, ROUTING)['provider'] == 'b'
+    assert router.calls == ['a', 'b', 'b']
+
+
+def test_callers_during_an_early_trial_fail_fast(router):
+    router.record_failure('a', 1)
+    router.replies['a'] = trial_done = threading.Event()
+    trial = threading.Thread(target=router.call, args=([request('a')], None, ROUTING))
+    trial.start()
+    while router.calls != ['a']:
+        time.sleep(0.01)
+
+    result = router.call([request('a')], None, ROUTING)
+    assert result['success'] is False
+    assert router.calls == ['a']
+    trial_done.set()
+    trial.join()
+
+
+def test_abandoned_trial_is_released(app, router, monkeypatch):
+    open_breaker(router, 'a')
+
+    def abandon(*args, **kwargs):
+        raise app.LLMAttemptAbandoned()
+    monkeypatch.setattr(app, 'send_llm_request', abandon)
+    assert router._attempt(request('a'), None, ROUTING)['abandoned']
+    assert router.admit('a', ROUTING) == 'trial'
+
+
+def test_hedge_loser_is_cancelled(app, fake_llm):
+    from http.server import ThreadingHTTPServer
+
+    class Slow(fake_llm):
+        latency = 3
+
+    slow = ThreadingHTTPServer(('127.0.0.1', 0), Slow)
+    threading.Thread(target=slow.serve_forever, kwargs={'poll_interval': 0.05}, daemon=True).start()
+    fast_url = app.load_config()['llm']['base_url']
+    providers = [
+        {'name': 'slow', 'provider': 'openai', 'api_key': 'x', 'model': 'fake',
+         'base_url': f"http://127.0.0.1:{slow.server_address[1]}/v1", 'read_timeout': 10},
+        {'name': 'fast', 'provider': 'openai', 'api_key': 'x', 'model': 'fake', 'base_url': fast_url},
+    ]
+    requests_ = [app.build_llm_request(provider, [{'role': 'user', 'content': 'hi'}]) for provider in providers]
+    try:
+        start = time.perf_counter()
+        result = app.llm_router.call(requests_, None, {'policy': 'hedge', 'hedge_delay': 0.1})
+        assert result['success'] and result['provider'] == 'fast'
+
+        # The slow attempt gives up well before its server would have answered
+        deadline = time.perf_counter() + 1.5
+        while 'provider="slow"' not in abandoned_lines(app) and time.perf_counter() < deadline:
+            time.sleep(0.02)
+        assert 'provider="slow"' in abandoned_lines(app)
+        assert time.perf_counter() - start < 2
+        assert app.llm_router.info()['slow']['errors'] == 0
+    finally:
+        slow.shutdown()
+        slow.server_close()
+
+
+def abandoned_lines(app):
+    return '\n'.join(line for line in app.LLM_REQUESTS.render().splitlines() if 'outcome="abandoned"' in line)
+
+
+def test_hedge_cancels_the_loser_when_providers_share_a_name(app, router, monkeypatch):
+    slow_cancelled = threading.Event()
+
+    def send(req, on_token=None, on_response=None, cancel=None):
+        if req['model'] == 'slow':
+            deadline = time.monotonic() + 3
+            while not cancel.cancelled and time.monotonic() < deadline:
+                time.sleep(0.01)
+            if cancel.cancelled:
+                slow_cancelled.set()
+            raise app.LLMAttemptAbandoned()
+        return {'success': True, 'content': 'ok'}
+    monkeypatch.setattr(app, 'send_llm_request', send)
+
+    result = router.call([{'name': 'same', 'model': 'slow'}, {'name': 'same', 'model': 'fast'}], None,
+                         {'policy': 'hedge', 'hedge_delay': 0.05})
+    assert result['success']
+    assert slow_cancelled.wait(1)
@@ -0,0 +1,58 @@
+CATEGORIES = [{'id': 'c1', 'name_en': 'Scene', 'name_zh': '场景'}]
+
+
+def test_failed_chunk_is_retried_without_the_cache(app, fake_llm):
+    fake_llm.replies = ['[{"original": "sunset", "name_en": "sun']
+
+    results = app.llm_translate_and_match(['sunset', 'night'], CATEGORIES)
+
+    assert [result['original'] for result in results] == ['sunset', 'night']
+    assert not any(result.get('failed') for result in results)
+    assert fake_llm.requests == 2
+    assert app.llm_cache.info()['bypassed'] == 1
+
+
+def test_only_failed_chunks_are_retried(app, fake_llm, monkeypatch):
+    monkeypatch.setattr(app, 'LLM_TRANSLATE_CHUNK_SIZE', 2)
+    monkeypatch.setattr(app, 'LLM_TRANSLATE_CONCURRENCY', 1)
+    fake_llm.replies = ['not json']
+    tags = ['sunset', 'night', 'forest', 'rain']
+
+    results = app.llm_translate_and_match(tags, CATEGORIES)
+
+    assert [result['original'] for result in results] == tags
+    assert fake_llm.requests == 3
+
+
+def test_input_whose_chunks_keep_failing_gives_none(app, fake_llm):
+    fake_llm.replies = ['not json', 'still not json']
+    assert app.llm_translate_and_match(['sunset'], CATEGORIES) is None
+    assert app.llm_cache.info()['disk_entries'] == 0
+
+
+def test_replies_are_aligned_with_the_chunk():
+    from app import align_translations
+
+    items = [{'original': 'Red', 'name_en': 'red'}, {'original': 'sky', 'name_en': 'blue sky'}]
+    assert [r['original'] for r in align_translations(['(red)', 'blue sky'], items)] == ['(red)', 'blue sky']
+    short = align_translations(['blue sky', 'red', 'rain'], items)
+    assert [(r['original'], r.get('name_en'), r.get('failed', False)) for r in short] == [
+        ('blue sky', None, True), ('red', 'red', False), ('rain', None, True)]
+
+
+def test_parse_weights_follow_tag_positions(app, fake_llm):
+    app.tag_store.save({'categories': [dict(CATEGORIES[0], color='#000')], 'tags': []})
+    fake_llm.replies = ['[{"original": "RED", "name_en": "red", "name_zh": "红", "category_id": "c1"},'
+                        ' {"original": "sky", "name_en": "blue sky", "name_zh": "蓝天", "category_id": "c1"},'
+                        ' {"original": "red", "name_en": "red", "name_zh": "红", "category_id": "c1"}]']
+
+    body, status = app.parse_tags_job(['red', 'blue sky', 'red'], weights=[1.5, 0.7, 1.0])
+
+    assert status == 200 and body['method'] == 'llm'
+    assert [(tag['original'], tag['weight']) for tag in body['tags']] == [('red', 1.5), ('blue sky', 0.7), ('red', 1.0)]
+
+
+def test_repeated_tags_keep_their_own_weights(app, client):
+    response = client.post('/api/tags/parse', json={'text': '(masterpiece:1.5), masterpiece, [masterpiece]'})
+    tags = response.get_json()['tags']
+    assert [tag['weight'] for tag in tags] == [1.5, 1.0, 0.909]
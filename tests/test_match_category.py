@@ -0,0 +1,68 @@
+import pytest
+
+from app import CategoryMatcher, SqliteTagStore, TagStore, match_categories, match_category
+
+CATEGORIES = [
+    {'id': 'quality', 'name_en': 'Quality', 'name_zh': '画质', 'color': '#f00'},
+    {'id': 'hair', 'name_en': 'Hair', 'name_zh': '发型', 'color': '#0f0'},
+    {'id': 'dress', 'name_en': 'Dress', 'name_zh': '服装', 'color': '#00f'},
+    {'id': 'misc', 'name_en': 'Misc', 'name_zh': '其他', 'color': '#888'},
+]
+
+
+@pytest.mark.parametrize('tag, expected', [
+    ('long hair', 'hair'),
+    ('red dress', 'dress'),
+    ('high resolution', 'quality'),
+    # "dress" as a whole word outweighs the "res" inside it
+    ('dress', 'dress'),
+    ('something unrelated', 'quality'),
+])
+def test_best_keyword_score_wins(tag, expected):
+    assert match_category(tag, CATEGORIES) == expected
+
+
+def test_category_name_is_not_a_keyword():
+    # "misc" has no keyword group, so naming a tag after it does not select it
+    assert match_category('misc', CATEGORIES) == 'quality'
+
+
+def test_chinese_category_name_selects_keywords():
+    categories = [{'id': 'other', 'name_en': 'Other', 'name_zh': '其他'},
+                  {'id': 'h', 'name_en': 'Styling', 'name_zh': '头发 hair'}]
+    assert match_category('ponytail', categories) == 'h'
+
+
+def test_no_categories():
+    assert CategoryMatcher([]).match('long hair') is None
+    assert match_categories(['long hair', 'red dress'], []) == [None, None]
+
+
+def test_match_categories_agrees_with_match_category():
+    tags = ['long hair', 'red dress', 'blue eyes', 'masterpiece']
+    assert match_categories(tags, CATEGORIES) == [match_category(tag, CATEGORIES) for tag in tags]
+
+
+@pytest.mark.parametrize('backend', ['json', 'sqlite'])
+def test_store_matcher_is_rebuilt_only_after_a_change(tmp_path, backend):
+    store = TagStore(str(tmp_path / 'tags.json')) if backend == 'json' else SqliteTagStore(str(tmp_path / 'tags.db'))
+    store.save({'categories': CATEGORIES[1:], 'tags': []})
+
+    matcher = store.category_matcher()
+    assert store.category_matcher() is matcher
+    assert matcher.match('high resolution') == 'hair'
+
+    store.add_category(CATEGORIES[0])
+    rebuilt = store.category_matcher()
+    assert rebuilt is not matcher
+    assert rebuilt.match('high resolution') == 'quality'
+
+
+def test_parse_route_uses_new_categories(client, app):
+    app.tag_store.save({'categories': CATEGORIES[1:], 'tags': []})
+    first = client.post('/api/tags/parse', json={'text': 'masterpiece'}).get_json()
+    assert first['tags'][0]['category_id'] == 'hair'
+
+    app.tag_store.add_category(CATEGORIES[0])
+    second = client.post('/api/tags/parse', json={'text': 'masterpiece'}).get_json()
+    assert second['tags'][0]['category_id'] == 'quality'
@@ -0,0 +1,36 @@
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'tools'))
+
+import migrate_to_sqlite  # noqa: E402
+
+
+def test_duplicate_ids_are_renumbered_after_the_first(app):
+    tags = [{'id': 'a', 'name_en': 'first'}, {'id': 'b', 'name_en': 'other'}, {'id': 'a', 'name_en': 'second'}]
+    renumbered = migrate_to_sqlite.renumber_duplicates(tags)
+    assert [tag['id'] for tag in tags[:2]] == ['a', 'b']
+    assert renumbered == [('a', tags[2]['id'])] and tags[2]['id'] not in ('a', 'b')
+
+
+def test_migration_with_duplicate_ids(app, tmp_path, monkeypatch, capsys):
+    tags_file, gallery_file, db = tmp_path / 'tags.json', tmp_path / 'gallery.json', tmp_path / 'library.db'
+    tags_file.write_text(json.dumps({
+        'categories': [{'id': 'c', 'name_en': 'Hair'}, {'id': 'c', 'name_en': 'Hair again'}],
+        'tags': [{'id': 't', 'name_en': 'long hair', 'category_id': 'c'}, {'id': 't', 'name_en': 'short hair'}]
+    }), encoding='utf-8')
+    gallery_file.write_text(json.dumps({'items': [{'id': 'g', 'image': '1.png'}, {'id': 'g', 'image': '2.png'}]}),
+                            encoding='utf-8')
+    monkeypatch.setattr(migrate_to_sqlite, 'DATA_FILE', str(tags_file))
+    monkeypatch.setattr(migrate_to_sqlite, 'GALLERY_FILE', str(gallery_file))
+    monkeypatch.setattr(sys, 'argv', ['migrate_to_sqlite.py', '--db', str(db)])
+
+    migrate_to_sqlite.main()
+
+    assert capsys.readouterr().out.count('renumbered') == 3
+    tag_store = app.SqliteTagStore(str(db))
+    assert [tag['name_en'] for tag in tag_store.list_tags()] == ['long hair', 'short hair']
+    assert tag_store.get_tag('t')['name_en'] == 'long hair'
+    assert tag_store.get_category('c')['name_en'] == 'Hair'
+    assert len(app.SqliteGalleryStore(str(db)).get()['items']) == 2
@@ -0,0 +1,108 @@
+import pytest
+
+
+def make_tag(app, name, category_id='c1'):
+    return {'id': app.new_id(), 'name_en': name, 'name_zh': name, 'category_id': category_id,
+            'created_at': '2024-01-01T00:00:00'}
+
+
+def make_item(app, title):
+    return {'id': app.new_id(), 'title': title, 'image': f"{title}.png", 'created_at': app.new_id()}
+
+
+@pytest.fixture(params=['json', 'sqlite'])
+def tag_store(request, app, tmp_path, monkeypatch):
+    if request.param == 'sqlite':
+        monkeypatch.setattr(app, 'tag_store', app.SqliteTagStore(str(tmp_path / 'library.db')))
+    return app.tag_store
+
+
+def page_names(client, query):
+    response = client.get(f"/api/tags?{query}")
+    assert response.status_code == 200, response.get_data(as_text=True)
+    body = response.get_json()
+    return [tag['name_en'] for tag in body['tags']], body['next_cursor']
+
+
+@pytest.mark.parametrize('sort', ['', 'name_en', '-name_en', 'created_at'])
+def test_cursor_survives_deletes_before_it(app, client, tag_store, sort):
+    tags = [make_tag(app, f"tag {i:02d}") for i in range(10)]
+    tag_store.add_tags(tags)
+    first, cursor = page_names(client, f"limit=4&sort={sort}")
+
+    # Deleting records already returned must not shift the next page
+    for tag in tags:
+        if tag['name_en'] in first[:3]:
+            tag_store.delete_tag(tag['id'])
+    second, _ = page_names(client, f"limit=4&sort={sort}&cursor={cursor}")
+
+    expected = sorted((t['name_en'] for t in tags), reverse=sort.startswith('-'))
+    assert first == expected[:4]
+    assert second == expected[4:8]
+
+
+def test_cursor_pages_see_inserts_after_them(app, client, tag_store):
+    tag_store.add_tags([make_tag(app, f"tag {i:02d}") for i in range(6)])
+    first, cursor = page_names(client, 'limit=3')
+    tag_store.add_tag(make_tag(app, 'tag 99'))
+    rest, next_cursor = page_names(client, f"limit=10&cursor={cursor}")
+
+    assert first == ['tag 00', 'tag 01', 'tag 02']
+    assert rest == ['tag 03', 'tag 04', 'tag 05', 'tag 99']
+    assert next_cursor is None
+
+
+def test_category_pages_cover_the_category(app, client, tag_store):
+    tag_store.add_tags([make_tag(app, f"tag {i:02d}", 'c1' if i % 2 else 'c2') for i in range(9)])
+    names, cursor = page_names(client, 'category=c1&limit=3')
+    while cursor:
+        more, cursor = page_names(client, f"category=c1&limit=3&cursor={cursor}")
+        names += more
+    assert names == ['tag 01', 'tag 03', 'tag 05', 'tag 07']
+
+
+@pytest.mark.parametrize('sort, key', [
+    ('', [['x']]),
+    ('', [1, 2]),
+    ('name_en', [1, 'x']),
+    ('name_en', ['x']),
+    ('-name_zh', [None, None]),
+    ('', [True]),
+])
+def test_cursor_for_another_sort_is_rejected(app, client, tag_store, sort, key):
+    tag_store.add_tags([make_tag(app, f"tag {i}") for i in range(3)])
+    response = client.get(f"/api/tags?limit=2&sort={sort}&cursor={app.encode_cursor(key)}")
+    assert response.status_code == 400
+    assert response.get_json()['success'] is False
+
+
+def test_malformed_cursor_is_rejected(client):
+    assert client.get('/api/tags?limit=2&cursor=not-base64!').status_code == 400
+
+
+@pytest.fixture(params=['json', 'sqlite'])
+def gallery_store(request, app, tmp_path, monkeypatch):
+    if request.param == 'sqlite':
+        monkeypatch.setattr(app, 'gallery_store', app.SqliteGalleryStore(str(tmp_path / 'library.db')))
+    return app.gallery_store
+
+
+def test_gallery_pages_newest_first(app, client, gallery_store):
+    for i in range(5):
+        gallery_store.add_item(make_item(app, f"item {i}"))
+    titles, cursor = [], None
+    while True:
+        query = 'limit=2' + (f"&cursor={cursor}" if cursor else '')
+        body = client.get(f"/api/gallery?{query}").get_json()
+        titles += [item['title'] for item in body['items']]
+        cursor = body['next_cursor']
+        if not cursor:
+            break
+    assert titles == [f"item {i}" for i in reversed(range(5))]
+
+
+@pytest.mark.parametrize('key', [[1, 2], ['x'], ['a', 'b', 'c']])
+def test_gallery_cursor_of_wrong_shape_is_rejected(app, client, gallery_store, key):
+    gallery_store.add_item(make_item(app, 'item'))
+    response = client.get(f"/api/gallery?limit=2&cursor={app.encode_cursor(key)}")
+    assert response.status_code == 400
@@ -0,0 +1,89 @@
+import random
+
+import pytest
+
+from app import PromptTokenizer, parse_tags_input, tokenize_prompt
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('red, blue; green\nyellow', [('red', 1.0), ('blue', 1.0), ('green', 1.0), ('yellow', 1.0)]),
+    ('(red), ((red)), (((red)))', [('red', 1.1), ('red', 1.21), ('red', 1.331)]),
+    ('[blue], [[blue]]', [('blue', 0.909), ('blue', 0.826)]),
+    ('([red])', [('red', 1.0)]),
+    ('(red:1.5), (blue:0.7)', [('red', 1.5), ('blue', 0.7)]),
+    ('((red:1.2), blue)', [('red', 1.32), ('blue', 1.1)]),
+    ('red:0.5', [('red', 0.5)]),
+    ('red (blue) green', [('red', 1.0), ('blue', 1.1), ('green', 1.0)]),
+    ('红色, (蓝色:1.3)', [('红色', 1.0), ('蓝色', 1.3)]),
+])
+def test_weights(text, expected):
+    assert tokenize_prompt(text) == expected
+
+
+def test_weight_applies_to_every_tag_in_the_group():
+    assert tokenize_prompt('(red, blue:1.2)') == [('red', 1.2), ('blue', 1.2)]
+    assert tokenize_prompt('[red, (blue), green]') == [('red', 0.909), ('blue', 1.0), ('green', 0.909)]
+
+
+def test_stray_closers_and_unclosed_openers():
+    assert tokenize_prompt('red), blue]') == [('red', 1.0), ('blue', 1.0)]
+    assert tokenize_prompt('(red, blue') == [('red', 1.1), ('blue', 1.1)]
+    assert tokenize_prompt('red}, (blue)), green') == [('red', 1.0), ('blue', 1.1), ('green', 1.0)]
+
+
+def test_escaped_brackets_are_literal():
+    assert tokenize_prompt(r'smile \(happy\), \[x\]y') == [('smile (happy)', 1.0), ('[x]y', 1.0)]
+    assert tokenize_prompt(r'(smile \(happy\):1.2)') == [('smile (happy)', 1.2)]
+
+
+def test_colons_that_are_not_weights_stay_in_the_tag():
+    assert tokenize_prompt('artist:name, 16:9, score:1') == [('artist:name', 1.0), ('16:9', 1.0), ('score:1', 1.0)]
+
+
+def test_extra_networks_are_not_tags():
+    tokenizer = PromptTokenizer()
+    tags = tokenizer.feed('masterpiece, <lora:style:0.8>, (cat:1.2)') + tokenizer.close()
+    assert tags == [('masterpiece', 1.0), ('cat', 1.2)]
+    assert tokenizer.networks == ['<lora:style:0.8>']
+
+
+def test_short_and_empty_pieces_are_dropped():
+    assert tokenize_prompt('a, , (b), red') == [('red', 1.0)]
+
+
+def test_nai_syntax_is_detected_from_curly_braces():
+    assert tokenize_prompt('[blurry]') == [('blurry', 0.909)]
+    assert tokenize_prompt('{best quality}, [blurry]') == [('best quality', 1.05), ('blurry', 0.952)]
+    assert tokenize_prompt('{{red}}') == [('red', 1.103)]
+    assert tokenize_prompt('[blurry]', syntax='nai') == [('blurry', 0.952)]
+
+
+def test_parse_tags_input_returns_names():
+    assert parse_tags_input('(red:1.2), [blue], <lora:x:1>') == ['red', 'blue']
+
+
+PROMPT = (r'masterpiece, (best quality:1.2), ((1girl)), [blurry], smile \(happy\), '
+          '<lora:style:0.8>, (red, blue:1.3), artist:name; 16:9\n'
+          '(((nested [deep] tags))), stray), [unclosed, cat:0.5, 红色, (蓝色:1.3)')
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_chunked_feed_matches_a_single_pass(seed):
+    rng = random.Random(seed)
+    text = ', '.join([PROMPT] * 3)
+    tokenizer = PromptTokenizer()
+    tags, start = [], 0
+    while start < len(text):
+        size = rng.randint(1, 12)
+        tags += tokenizer.feed(text[start:start + size])
+        start += size
+    tags += tokenizer.close()
+    assert tags == tokenize_prompt(text, syntax='sd')
+
+
+def test_feed_holds_back_only_the_unfinished_piece():
+    tokenizer = PromptTokenizer()
+    assert tokenizer.feed('red, blu') == [('red', 1.0)]
+    assert tokenizer.feed('e, (gre') == [('blue', 1.0)]
+    assert tokenizer.feed('en:1.2)') == []
+    assert tokenizer.close() == [('green', 1.2)]
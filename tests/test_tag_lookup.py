@@ -0,0 +1,50 @@
+def seed(app, count):
+    app.tag_store.save({
+        'categories': [{'id': 'c1', 'name_en': 'Hair', 'name_zh': '发型', 'color': '#0f0'}],
+        'tags': [{'id': f"t{i}", 'name_en': f"Tag {i}", 'name_zh': f"标签{i}", 'category_id': 'c1'}
+                 for i in range(count)]
+    })
+
+
+def test_lookup_finds_tags_past_the_first_page(app, client):
+    seed(app, 500)
+    response = client.post('/api/tags/lookup', json={'names': ['tag 450', '标签3', 'missing']})
+    tags = response.get_json()['tags']
+    assert [tag and tag['id'] for tag in tags] == ['t450', 't3', None]
+
+
+def test_lookup_rejects_bad_names(client):
+    assert client.post('/api/tags/lookup', json={'names': 'tag'}).status_code == 400
+    assert client.post('/api/tags/lookup', json={'names': [1]}).status_code == 400
+
+
+def test_parse_reports_the_existing_tag(app, client):
+    seed(app, 500)
+    tags = client.post('/api/tags/parse', json={'text': 'Tag 450, brand new'}).get_json()['tags']
+    assert (tags[0]['exists'], tags[0]['existing_id'], tags[0]['existing_category_id']) == (True, 't450', 'c1')
+    assert (tags[1]['exists'], tags[1]['existing_id'], tags[1]['existing_category_id']) == (False, None, None)
+
+
+def test_replace_never_exposes_half_built_indexes(app):
+    import threading
+
+    document = {'categories': [{'id': 'c1', 'name_en': 'Hair'}],
+                'tags': [{'id': f"t{i}", 'name_en': f"Tag {i}", 'name_zh': ''} for i in range(5000)]}
+    app.tag_store.save(document)
+    misses = []
+    done = threading.Event()
+
+    def read():
+        while not done.is_set():
+            if app.tag_store.find_tag(name_en='tag 4999') is None or app.tag_store.get_category('c1') is None:
+                misses.append(1)
+
+    reader = threading.Thread(target=read)
+    reader.start()
+    try:
+        for _ in range(3):
+            app.tag_store.save(document)
+    finally:
+        done.set()
+        reader.join()
+    assert not misses
@@ -0,0 +1,80 @@
+import io
+import os
+
+import pytest
+from PIL import Image
+
+
+@pytest.fixture
+def folders(app, tmp_path, monkeypatch):
+    uploads, thumbs = tmp_path / 'uploads', tmp_path / 'thumbs'
+    # Render thumbnails inline so the test sees them
+    monkeypatch.setattr(app, 'generate_thumbnails_async', app.generate_thumbnails)
+    return uploads, thumbs
+
+
+def png_bytes(color='red'):
+    buffer = io.BytesIO()
+    Image.new('RGB', (400, 300), color).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+def upload(client, data, filename, title=''):
+    response = client.post('/api/gallery', data={'image': (io.BytesIO(data), filename), 'title': title},
+                           content_type='multipart/form-data')
+    assert response.status_code == 200, response.get_data(as_text=True)
+    return response.get_json()['item']
+
+
+def thumbnails(app, filename):
+    return [app.thumbnail_path(filename, width) for width in app.THUMBNAIL_WIDTHS]
+
+
+def test_identical_uploads_share_one_file(app, client, folders):
+    uploads, _ = folders
+    first = upload(client, png_bytes(), 'a.png')
+    second = upload(client, png_bytes(), 'b.png')
+
+    assert first['image'] == second['image']
+    assert os.listdir(uploads) == [first['image']]
+
+
+def test_file_is_deleted_with_its_last_reference(app, client, folders):
+    uploads, _ = folders
+    first = upload(client, png_bytes(), 'a.png')
+    second = upload(client, png_bytes(), 'b.png')
+    image = first['image']
+
+    client.delete(f"/api/gallery/{first['id']}")
+    assert (uploads / image).exists()
+    assert all(os.path.exists(path) for path in thumbnails(app, image))
+
+    client.delete(f"/api/gallery/{second['id']}")
+    assert not (uploads / image).exists()
+    assert not any(os.path.exists(path) for path in thumbnails(app, image))
+
+
+def test_replacing_an_image_releases_the_old_one(app, client, folders):
+    uploads, _ = folders
+    item = upload(client, png_bytes('red'), 'a.png')
+    response = client.put(f"/api/gallery/{item['id']}",
+                          data={'image': (io.BytesIO(png_bytes('blue')), 'b.png')},
+                          content_type='multipart/form-data')
+    new_image = response.get_json()['item']['image']
+
+    assert new_image != item['image']
+    assert os.listdir(uploads) == [new_image]
+
+
+def test_same_bytes_with_another_extension_keep_their_own_thumbnails(app, client, folders):
+    uploads, _ = folders
+    as_png = upload(client, png_bytes(), 'a.png')
+    as_jpg = upload(client, png_bytes(), 'a.jpg')
+    assert as_png['image'] != as_jpg['image']
+    assert set(thumbnails(app, as_png['image'])).isdisjoint(thumbnails(app, as_jpg['image']))
+
+    client.delete(f"/api/gallery/{as_png['id']}")
+    assert not (uploads / as_png['image']).exists()
+    assert (uploads / as_jpg['image']).exists()
+    assert all(os.path.exists(path) for path in thumbnails(app, as_jpg['image']))
+    assert client.get(f"/thumbs/320/{as_jpg['image']}").status_code == 200
@@ -0,0 +1,291 @@
+"""Local stand-in for the LLM providers and Google Translate, for trying or load-testing the app offline.
+
+Usage: python tools/fake_llm_server.py [--port 8765] [--reply TEXT] [--token-delay 0.05]
+                                       [--latency 0] [--jitter 0] [--error-rate 0] [--rate-limit 0]
+                                       [--fenced-rate 0] [--malformed-rate 0] [--seed N]
+
+Point the app at it with base URL http://127.0.0.1:8765/v1 (OpenAI, Claude),
+http://127.0.0.1:8765/v1beta (Gemini) or http://127.0.0.1:8765 (Ollama) and
+any API key, and send translations to it by starting the app with
+TRANSLATE_URL=http://127.0.0.1:8765/translate_a/single.
+
+Replies are split into word-sized tokens. Streaming requests get each
+provider's streaming format: SSE for OpenAI, Claude and Gemini, NDJSON for
+Ollama. Without --reply, tag translation prompts are answered with a JSON
+array covering every tag in the prompt and everything else with a short tag
+list. Translations echo the text with the target language appended.
+
+Faults, applied to every request:
+  --latency/--jitter   seconds to wait before answering (plus up to jitter more)
+  --error-rate         fraction answered with HTTP 500
+  --rate-limit         requests per second allowed; the excess gets HTTP 429
+  --fenced-rate        fraction of replies wrapped in a ```json markdown fence
+  --malformed-rate     fraction of replies cut off halfway, so they are not valid JSON
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+DEFAULT_REPLY = '["masterpiece", "best quality", "1girl", "long hair", "sunset"]'
+TAG_LINE = re.compile(r'^- (.+)$', re.MULTILINE)
+CATEGORY_ID = re.compile(r'^- ID: (\S+),', re.MULTILINE)
+
+
+def split_tokens(text):
+    """Split the reply into word-sized pieces, keeping whitespace so they join back losslessly"""
+    return re.findall(r'\S+\s*|\s+', text)
+
+
+def prompt_text(body):
+    """All message text of an OpenAI, Claude, Gemini or Ollama request body"""
+    parts = [body.get('system') or '']
+    for message in body.get('messages') or []:
+        content = message.get('content')
+        if isinstance(content, list):
+            parts.extend(block.get('text', '') for block in content if isinstance(block, dict))
+        else:
+            parts.append(content or '')
+    for content in body.get('contents') or []:
+        parts.extend(part.get('text', '') for part in content.get('parts') or [])
+    system = body.get('systemInstruction') or body.get('system_instruction') or {}
+    if isinstance(system, dict):
+        parts.extend(part.get('text', '') for part in system.get('parts') or [])
+    return '\n'.join(parts)
+
+
+def auto_reply(text):
+    """A reply in the shape the app expects: tag translation prompts get one entry per tag"""
+    if 'Tags to process:' not in text:
+        return DEFAULT_REPLY
+    categories = CATEGORY_ID.findall(text)
+    tags = TAG_LINE.findall(text.split('Tags to process:', 1)[1].split('For each tag', 1)[0])
+    return json.dumps([{"original": tag, "name_en": tag.lower(), "name_zh": f"{tag}（译）",
+                        "category_id": categories[i % len(categories)] if categories else None}
+                       for i, tag in enumerate(tags)], ensure_ascii=False)
+
+
+class RateLimiter:
+    """Token bucket shared by all handler threads; ``rate`` 0 means unlimited"""
+
+    def __init__(self, rate):
+        self.rate = rate
+        self.tokens = rate
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def allow(self):
+        if not self.rate:
+            return True
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+
+class FakeLLMHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True  # headers and body are separate writes; avoid delayed-ACK stalls on keep-alive
+    reply = None  # None: answer according to the prompt, see auto_reply
+    token_delay = 0.05
+    latency = 0.0
+    jitter = 0.0
+    error_rate = 0.0
+    fenced_rate = 0.0
+    malformed_rate = 0.0
+    rate_limiter = RateLimiter(0)
+    rng = random.Random()
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = json.loads(self.rfile.read(length) or b'{}')
+        path = self.path.split('?', 1)[0]
+        if self.inject_fault(path):
+            return
+        self.text = self.reply_text(body)
+
+        if path.endswith('/chat/completions'):
+            self.openai(body)
+        elif path.endswith('/messages'):
+            self.claude(body)
+        elif path.endswith(':streamGenerateContent'):
+            self.stream_events(self.gemini_chunk(token) for token in self.tokens())
+        elif path.endswith(':generateContent'):
+            self.send_json(self.gemini_chunk(self.text))
+        elif path.endswith('/api/chat'):
+            self.ollama(body)
+        else:
+            self.send_json({"error": {"message": f"Unknown endpoint {path}"}}, status=404)
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path != '/translate_a/single':
+            self.send_json({"error": {"message": f"Unknown endpoint {url.path}"}}, status=404)
+            return
+        if self.inject_fault(url.path):
+            return
+        params = parse_qs(url.query)
+        text, source, target = (params.get(key, [''])[0] for key in ('q', 'sl', 'tl'))
+        # Same shape as the free endpoint with dt=t: sentence segments, then the detected source language
+        self.send_json([[[f"{text} ({target})", text, None, None, 10]], None, source if source != 'auto' else 'en'])
+
+    def inject_fault(self, path):
+        """Wait out the configured latency, then answer with 429 or 500 when it is their turn; True if answered"""
+        delay = self.latency + self.rng.uniform(0, self.jitter)
+        if delay:
+            time.sleep(delay)
+        if not self.rate_limiter.allow():
+            self.send_error_body(path, 429, 'rate_limit_error', 'Rate limit exceeded, retry later',
+                                 headers={'Retry-After': '1'})
+            return True
+        if self.rng.random() < self.error_rate:
+            self.send_error_body(path, 500, 'api_error', 'Injected server error')
+            return True
+        return False
+
+    def reply_text(self, body):
+        text = self.reply if self.reply is not None else auto_reply(prompt_text(body))
+        if self.rng.random() < self.fenced_rate:
+            text = f"```json\n{text}\n```"
+        if self.rng.random() < self.malformed_rate:
+            text = text[:len(text) // 2]
+        return text
+
+    def tokens(self):
+        for token in split_tokens(self.text):
+            time.sleep(self.token_delay)
+            yield token
+
+    # Providers
+
+    def openai(self, body):
+        if not body.get('stream'):
+            self.send_json({"choices": [{"index": 0, "message": {"role": "assistant", "content": self.text},
+                                         "finish_reason": "stop"}]})
+            return
+        events = ({"choices": [{"index": 0, "delta": {"content": token}}]} for token in self.tokens())
+        self.stream_events(events, done_marker=True)
+
+    def claude(self, body):
+        if not body.get('stream'):
+            self.send_json({"type": "message", "role": "assistant",
+                            "content": [{"type": "text", "text": self.text}], "stop_reason": "end_turn"})
+            return
+
+        def events():
+            yield {"type": "message_start", "message": {"role": "assistant", "content": []}}
+            yield {"type": "content_block_start", "index": 0, "content_block": {"type": "text", "text": ""}}
+            for token in self.tokens():
+                yield {"type": "content_block_delta", "index": 0, "delta": {"type": "text_delta", "text": token}}
+            yield {"type": "content_block_stop", "index": 0}
+            yield {"type": "message_stop"}
+        self.stream_events(events(), named=True)
+
+    @staticmethod
+    def gemini_chunk(text):
+        return {"candidates": [{"content": {"role": "model", "parts": [{"text": text}]}}]}
+
+    def ollama(self, body):
+        if not body.get('stream', True):
+            self.send_json({"message": {"role": "assistant", "content": self.text}, "done": True})
+            return
+        self.start_stream('application/x-ndjson')
+        for token in self.tokens():
+            self.write_chunk(json.dumps({"message": {"role": "assistant", "content": token}, "done": False}) + '\n')
+        self.write_chunk(json.dumps({"message": {"role": "assistant", "content": ""}, "done": True}) + '\n')
+        self.write_chunk('')
+
+    # Response helpers
+
+    def send_json(self, payload, status=200, headers=None):
+        data = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def send_error_body(self, path, status, kind, message, headers=None):
+        """An error in the format of the provider the path belongs to"""
+        if path.endswith('/messages'):
+            payload = {"type": "error", "error": {"type": kind, "message": message}}
+        elif 'generateContent' in path:
+            payload = {"error": {"code": status, "message": message,
+                                 "status": 'RESOURCE_EXHAUSTED' if status == 429 else 'INTERNAL'}}
+        elif path.endswith('/api/chat'):
+            payload = {"error": message}
+        else:
+            payload = {"error": {"message": message, "type": kind}}
+        self.send_json(payload, status=status, headers=headers)
+
+    def start_stream(self, content_type):
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+
+    def write_chunk(self, text):
+        data = text.encode('utf-8')
+        self.wfile.write(f"{len(data):x}\r\n".encode('ascii') + data + b"\r\n")
+        self.wfile.flush()
+
+    def stream_events(self, events, named=False, done_marker=False):
+        self.start_stream('text/event-stream')
+        for event in events:
+            prefix = f"event: {event['type']}\n" if named else ''
+            self.write_chunk(f"{prefix}data: {json.dumps(event)}\n\n")
+        if done_marker:
+            self.write_chunk("data: [DONE]\n\n")
+        self.write_chunk('')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--reply', help='text returned for every LLM request (default: depends on the prompt)')
+    parser.add_argument('--token-delay', type=float, default=0.05, help='seconds between streamed tokens')
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds before every response')
+    parser.add_argument('--jitter', type=float, default=0.0, help='up to this many extra seconds of latency')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of requests answered with HTTP 500')
+    parser.add_argument('--rate-limit', type=float, default=0.0,
+                        help='requests per second before answering HTTP 429 (0: unlimited)')
+    parser.add_argument('--fenced-rate', type=float, default=0.0,
+                        help='fraction of replies wrapped in a ```json fence')
+    parser.add_argument('--malformed-rate', type=float, default=0.0,
+                        help='fraction of replies truncated to invalid JSON')
+    parser.add_argument('--seed', type=int, help='seed for the injected faults')
+    args = parser.parse_args()
+
+    FakeLLMHandler.reply = args.reply
+    FakeLLMHandler.token_delay = args.token_delay
+    FakeLLMHandler.latency = args.latency
+    FakeLLMHandler.jitter = args.jitter
+    FakeLLMHandler.error_rate = args.error_rate
+    FakeLLMHandler.rate_limiter = RateLimiter(args.rate_limit)
+    FakeLLMHandler.fenced_rate = args.fenced_rate
+    FakeLLMHandler.malformed_rate = args.malformed_rate
+    FakeLLMHandler.rng = random.Random(args.seed)
+    server = ThreadingHTTPServer((args.host, args.port), FakeLLMHandler)
+    print(f"Fake LLM server listening on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,244 @@
+"""Drive the app's endpoints with concurrent clients and report throughput and latency percentiles.
+
+Usage: python tools/load_test.py [--app http://127.0.0.1:5000] [--scenario parse] [--concurrency 8]
+                                 [--duration 30 | --requests N] [--unique] [--no-cache] [--json FILE]
+
+Meant to run against an app whose LLM provider and translations point at
+tools/fake_llm_server.py, so results depend on the app and not on a remote
+service:
+
+    python tools/fake_llm_server.py --latency 0.3 --jitter 0.2 --error-rate 0.02
+    TRANSLATE_URL=http://127.0.0.1:8765/translate_a/single python app.py
+    # LLM settings: provider openai, base URL http://127.0.0.1:8765/v1, any API key
+    python tools/load_test.py --scenario mixed --concurrency 16 --duration 60
+
+Scenarios: parse, wish, flux, optimize, gallery, mixed. Routes that answer
+with a background job are timed until the job finishes, following its
+/api/jobs/<id>/events stream. A request counts as an error when the HTTP
+status is not 2xx, the job failed, or the body reports success false.
+"""
+import argparse
+import http.client
+import itertools
+import json
+import random
+import statistics
+import sys
+import threading
+import time
+from collections import Counter
+from urllib.parse import quote, urlsplit
+
+TAGS = ['masterpiece', 'best quality', '1girl', 'solo', 'long hair', 'blue eyes', 'smile', 'school uniform',
+        'outdoors', 'cherry blossoms', 'sunset', 'cinematic lighting', 'depth of field', 'from side',
+        '杰作', '最高质量', '长发', '微笑', '樱花', '夕阳']
+PROMPT_TAGS = 12
+MIXED = [('parse', 5), ('gallery', 3), ('wish', 1), ('flux', 1), ('optimize', 1)]
+
+
+class Client:
+    """One keep-alive connection to the app, reopened after errors"""
+
+    def __init__(self, base_url, timeout):
+        url = urlsplit(base_url)
+        self.host, self.port = url.hostname, url.port or (443 if url.scheme == 'https' else 80)
+        self.connection_class = http.client.HTTPSConnection if url.scheme == 'https' else http.client.HTTPConnection
+        self.prefix = url.path.rstrip('/')
+        self.timeout = timeout
+        self.connection = None
+
+    def request(self, method, path, body=None):
+        """Returns (status, parsed JSON body or None)"""
+        if self.connection is None:
+            self.connection = self.connection_class(self.host, self.port, timeout=self.timeout)
+        headers = {'Content-Type': 'application/json'} if body is not None else {}
+        try:
+            self.connection.request(method, self.prefix + path,
+                                    body=json.dumps(body).encode('utf-8') if body is not None else None,
+                                    headers=headers)
+            response = self.connection.getresponse()
+            data = response.read()
+        except (OSError, http.client.HTTPException):
+            self.close()
+            raise
+        try:
+            return response.status, json.loads(data)
+        except ValueError:
+            return response.status, None
+
+    def wait_for_job(self, job_id):
+        """Follow a job's event stream on a separate connection; returns the finished job"""
+        connection = self.connection_class(self.host, self.port, timeout=self.timeout)
+        try:
+            connection.request('GET', f"{self.prefix}/api/jobs/{job_id}/events")
+            response = connection.getresponse()
+            job = None
+            for line in response:
+                if line.startswith(b'data: '):
+                    job = json.loads(line[6:])
+                    if job['status'] in ('done', 'failed'):
+                        return job
+            return job
+        finally:
+            connection.close()
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+
+class Scenario:
+    """Request bodies for each scenario; ``unique`` varies the tags so caches do not answer"""
+
+    def __init__(self, name, unique, no_cache, seed):
+        self.name = name
+        self.unique = unique
+        self.no_cache = no_cache
+        self.rng = random.Random(seed)
+        self.counter = itertools.count()
+        self.lock = threading.Lock()
+
+    def pick(self):
+        with self.lock:
+            if self.name == 'mixed':
+                names, weights = zip(*MIXED)
+                return self.rng.choices(names, weights)[0], self.rng.sample(TAGS, PROMPT_TAGS), next(self.counter)
+            return self.name, self.rng.sample(TAGS, PROMPT_TAGS), next(self.counter)
+
+    def request(self):
+        """(label, method, path, body) for the next request"""
+        name, tags, n = self.pick()
+        if self.unique:
+            tags = [f"{tag} {n}" if i % 3 == 0 else tag for i, tag in enumerate(tags)]
+        tag_objects = [{'name_en': tag, 'name_zh': ''} for tag in tags]
+        extra = {'no_cache': True} if self.no_cache else {}
+        if name == 'parse':
+            return name, 'POST', '/api/tags/parse', {'text': ', '.join(tags), **extra}
+        if name == 'wish':
+            return name, 'POST', '/api/tags/wish', {'mode': 'modify', 'instruction': f"make it a night scene {n}",
+                                                     'tags': tag_objects, **extra}
+        if name == 'flux':
+            return name, 'POST', '/api/tags/convert-to-flux', {'tags': tag_objects, **extra}
+        if name == 'optimize':
+            return name, 'POST', '/api/tags/optimize-order', {'tags': tag_objects, **extra}
+        query = f"&q={quote(tags[0].split()[0])}" if n % 2 else ''
+        return name, 'GET', f"/api/gallery?limit=50{query}", None
+
+
+def run_one(client, scenario):
+    """Send one scenario request, waiting for its job if it started one; returns (label, outcome)"""
+    label, method, path, body = scenario.request()
+    try:
+        status, result = client.request(method, path, body)
+    except (OSError, http.client.HTTPException) as e:
+        return label, f"connection: {type(e).__name__}"
+    if status == 202 and result and result.get('job_id'):
+        try:
+            job = client.wait_for_job(result['job_id'])
+        except (OSError, http.client.HTTPException, ValueError) as e:
+            return label, f"job stream: {type(e).__name__}"
+        if job is None or job['status'] != 'done':
+            return label, f"job {job['status'] if job else 'lost'}"
+        status, result = job.get('status_code') or 200, job.get('result')
+    if not 200 <= status < 300:
+        return label, f"HTTP {status}"
+    if isinstance(result, dict) and result.get('success') is False:
+        return label, 'success false'
+    return label, 'ok'
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+def summarize(samples, elapsed):
+    """Per-label and overall stats from (label, outcome, seconds) samples"""
+    groups = {'all': samples}
+    for label in sorted({label for label, _, _ in samples}):
+        groups[label] = [sample for sample in samples if sample[0] == label]
+    summary = {}
+    for label, group in groups.items():
+        latencies = sorted(seconds * 1000 for _, _, seconds in group)
+        outcomes = Counter(outcome for _, outcome, _ in group)
+        summary[label] = {
+            'requests': len(group),
+            'errors': len(group) - outcomes['ok'],
+            'throughput': len(group) / elapsed if elapsed else 0.0,
+            'mean_ms': statistics.fmean(latencies) if latencies else 0.0,
+            'p50_ms': percentile(latencies, 0.50),
+            'p90_ms': percentile(latencies, 0.90),
+            'p95_ms': percentile(latencies, 0.95),
+            'p99_ms': percentile(latencies, 0.99),
+            'max_ms': latencies[-1] if latencies else 0.0,
+            'outcomes': dict(outcomes)
+        }
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--app', default='http://127.0.0.1:5000', help='base URL of the running app')
+    parser.add_argument('--scenario', default='parse', choices=['parse', 'wish', 'flux', 'optimize', 'gallery', 'mixed'])
+    parser.add_argument('--concurrency', type=int, default=8, help='simultaneous clients')
+    parser.add_argument('--duration', type=float, default=30, help='seconds to run (ignored with --requests)')
+    parser.add_argument('--requests', type=int, help='stop after this many requests instead')
+    parser.add_argument('--unique', action='store_true', help='vary tags between requests so caches miss')
+    parser.add_argument('--no-cache', action='store_true', help='send no_cache with LLM requests')
+    parser.add_argument('--timeout', type=float, default=120, help='seconds per HTTP request')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', help='also write the summary to this file')
+    args = parser.parse_args()
+
+    scenario = Scenario(args.scenario, args.unique, args.no_cache, args.seed)
+    samples = []
+    samples_lock = threading.Lock()
+    remaining = itertools.count() if args.requests else None
+    deadline = time.monotonic() + args.duration
+
+    def worker():
+        client = Client(args.app, args.timeout)
+        try:
+            while True:
+                if remaining is not None:
+                    if next(remaining) >= args.requests:
+                        return
+                elif time.monotonic() >= deadline:
+                    return
+                start = time.perf_counter()
+                label, outcome = run_one(client, scenario)
+                with samples_lock:
+                    samples.append((label, outcome, time.perf_counter() - start))
+        finally:
+            client.close()
+
+    print(f"{args.scenario}: {args.concurrency} clients against {args.app}", file=sys.stderr)
+    start = time.perf_counter()
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(args.concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    summary = summarize(samples, elapsed)
+    print(f"{'route':>10} {'requests':>9} {'errors':>7} {'req/s':>8} {'p50 ms':>9} {'p90 ms':>9} "
+          f"{'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    for label, stats in summary.items():
+        print(f"{label:>10} {stats['requests']:>9} {stats['errors']:>7} {stats['throughput']:>8.1f} "
+              f"{stats['p50_ms']:>9.1f} {stats['p90_ms']:>9.1f} {stats['p95_ms']:>9.1f} "
+              f"{stats['p99_ms']:>9.1f} {stats['max_ms']:>9.1f}")
+    for outcome, count in Counter(summary['all']['outcomes']).most_common():
+        if outcome != 'ok':
+            print(f"  {count:>6} × {outcome}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'app': args.app, 'scenario': args.scenario, 'concurrency': args.concurrency,
+                       'elapsed': elapsed, 'summary': summary}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
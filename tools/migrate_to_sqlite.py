@@ -0,0 +1,64 @@
+"""Import data/tags.json and data/gallery.json into the SQLite backend.
+
+Usage: python tools/migrate_to_sqlite.py [--db data/library.db] [--force]
+
+Pending journal entries (storage backend "journal") are replayed before the
+import. The SQLite tables require unique IDs, so records that repeat an
+earlier record's ID get a new one and are listed; the first record with an
+ID keeps it, since that is the one the JSON store resolves the ID to.
+Afterwards set "storage": {"backend": "sqlite"} in data/config.json
+and restart the app.
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app import (  # noqa: E402
+    DATA_FILE, DB_FILE, GALLERY_FILE,
+    GalleryStore, SqliteGalleryStore, SqliteTagStore, TagStore, new_id
+)
+
+
+def renumber_duplicates(records):
+    """Give every record whose ID was already used by an earlier one a new ID;
+    returns (old ID, new ID) pairs"""
+    seen = set()
+    renumbered = []
+    for record in records:
+        if record['id'] in seen:
+            old_id, record['id'] = record['id'], new_id()
+            renumbered.append((old_id, record['id']))
+        seen.add(record['id'])
+    return renumbered
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--db', default=DB_FILE, help='SQLite database to create')
+    parser.add_argument('--force', action='store_true', help='overwrite an existing database')
+    args = parser.parse_args()
+
+    if os.path.exists(args.db) and not args.force:
+        sys.exit(f"{args.db} already exists, use --force to overwrite it")
+
+    # journal=True replays a pending journal if there is one; compaction is
+    # pushed out so the source files are left untouched.
+    tags = TagStore(DATA_FILE, journal=True, compact_interval=3600).get()
+    gallery = GalleryStore(GALLERY_FILE, journal=True, compact_interval=3600).get()
+
+    for label, records in (('category', tags['categories']), ('tag', tags['tags']), ('gallery item', gallery['items'])):
+        for old_id, renumbered_id in renumber_duplicates(records):
+            print(f"! Duplicate {label} ID {old_id} renumbered to {renumbered_id}")
+
+    SqliteTagStore(args.db).save(tags)
+    SqliteGalleryStore(args.db).save(gallery)
+
+    print(f"✓ Imported {len(tags['categories'])} categories, {len(tags['tags'])} tags "
+          f"and {len(gallery['items'])} gallery items into {args.db}")
+    print('Set "storage": {"backend": "sqlite"} in data/config.json and restart the app.')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,7 @@
+"""WSGI entry point for running several worker processes, e.g.
+
+    gunicorn -w 4 -b 0.0.0.0:5000 wsgi:app
+"""
+from app import app, init_app_data
+
+init_app_data()